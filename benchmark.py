@@ -0,0 +1,848 @@
+"""
+性能基准测试
+对比各处理环节的耗时和数据量，用法见 python benchmark.py -h
+"""
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import cv2
+import numpy as np
+
+
+# 常见图片尺寸 (宽, 高)：电商主图、竖版模特图、4K、1200万像素
+DEFAULT_SIZES = [(1080, 1080), (1080, 1350), (3840, 2160), (4000, 3000)]
+
+
+def time_call(fn: Callable, repeat: int = 5) -> float:
+    """多次调用取最小耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def make_test_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """生成接近照片统计特性的测试图（平滑渐变 + 轻微噪声）"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 64 + 2, width // 64 + 2, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 4, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def load_sample_photos(limit: int = 3) -> List[np.ndarray]:
+    """读取仓库自带的模特图样例（cache/target，按文件大小取最大的几张），没有时返回空列表"""
+    import glob
+    import os
+
+    sample_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'target')
+    paths = sorted(glob.glob(os.path.join(sample_dir, '*.png')) + glob.glob(os.path.join(sample_dir, '*.jpg')),
+                   key=os.path.getsize, reverse=True)
+    photos = []
+    for path in paths[:limit]:
+        img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            photos.append(img)
+    return photos
+
+
+def fit_photo(photo: np.ndarray, width: int, height: int) -> np.ndarray:
+    """按目标宽高比居中裁剪后缩放到 width x height"""
+    h, w = photo.shape[:2]
+    scale = min(w / width, h / height)
+    cw, ch = int(width * scale), int(height * scale)
+    x, y = (w - cw) // 2, (h - ch) // 2
+    crop = photo[y:y + ch, x:x + cw]
+    interpolation = cv2.INTER_AREA if cw >= width else cv2.INTER_CUBIC
+    return cv2.resize(crop, (width, height), interpolation=interpolation)
+
+
+def make_test_eyes(width: int, height: int) -> List[Tuple[Tuple[int, int], float]]:
+    """按人脸比例估计双眼位置和虹膜半径"""
+    radius = max(8.0, min(width, height) * 0.025)
+    cy = int(height * 0.42)
+    return [((int(width * 0.40), cy), radius), ((int(width * 0.60), cy), radius)]
+
+
+def make_test_ring_mask(width: int, height: int) -> np.ndarray:
+    """生成与SD环形蒙版相近的测试蒙版"""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for center, radius in make_test_eyes(width, height):
+        cv2.circle(mask, center, int(radius + 5), 255, -1)
+        cv2.circle(mask, center, int(radius * 0.65), 0, -1)
+    return cv2.GaussianBlur(mask, (7, 7), 0)
+
+
+def bench_codec(sizes, repeat):
+    """SD请求载荷编码：耗时与传输字节数（图像用仓库中的模特图样例，多张取平均）"""
+    from sd_refiner import SDInpaintingRefiner
+
+    photos = load_sample_photos()
+    if not photos:
+        print("[WARN] 没有找到 cache/target 中的样例图片，改用合成测试图（接近不可压缩，仅供参考）")
+    refiner = SDInpaintingRefiner()
+    print(f"{'size':>11} {'target':>6} {'codec':>9} {'encode ms':>10} {'wire KB':>9}")
+    for w, h in sizes:
+        images = [fit_photo(p, w, h) for p in photos] or [make_test_image(w, h)]
+        masks = [make_test_ring_mask(w, h)]
+        for target, samples, codecs in [
+            ('image', images, ['png', 'webp']),
+            ('mask', masks, ['png', 'webp', 'bits']),
+        ]:
+            for codec in codecs:
+                ms = np.mean([time_call(lambda: refiner._image_to_base64(d, codec), repeat) for d in samples])
+                wire = np.mean([len(refiner._image_to_base64(d, codec)) for d in samples])
+                print(f"{w:>5}x{h:<5} {target:>6} {codec:>9} {ms:>10.1f} {wire / 1024:>9.1f}")
+    refiner.close()
+
+
+def make_test_eye_data(center: Tuple[int, int], radius: float):
+    """构造只含位置信息的EyeData（其余字段用默认值）"""
+    from iris_detector import EyeData
+
+    return EyeData(
+        center=np.zeros(3),
+        center_px=center,
+        radius=radius,
+        rotation_matrix=np.eye(3),
+        normal_vector=np.array([0, 0, -1]),
+        iris_points_px=np.zeros((4, 2)),
+        euler_angles=(0.0, 0.0, 0.0)
+    )
+
+
+def make_test_detection(width: int, height: int):
+    """构造测试用双眼检测结果"""
+    from iris_detector import EyeDetectionResult
+
+    left, right = [make_test_eye_data(c, r) for c, r in make_test_eyes(width, height)]
+    return EyeDetectionResult(left, right, True, (width, height))
+
+
+def make_test_composite(image: np.ndarray, feather: float) -> np.ndarray:
+    """在测试眼睛位置贴一层纯色"美瞳"，feather为边缘羽化宽度"""
+    h, w = image.shape[:2]
+    result = image.astype(np.float32)
+    y_coords, x_coords = np.ogrid[:h, :w]
+    for (cx, cy), radius in make_test_eyes(w, h):
+        dist = np.sqrt((x_coords - cx) ** 2 + (y_coords - cy) ** 2)
+        alpha = np.clip((radius + 3 - dist) / max(feather, 1e-3), 0, 1)[:, :, np.newaxis]
+        result = alpha * np.array([150, 100, 200], np.float32) + (1 - alpha) * result
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+def bench_seam(sizes, repeat):
+    """接缝门控：每只眼的度量耗时与不同羽化宽度下的分数"""
+    from sd_refiner import SDInpaintingRefiner
+
+    refiner = SDInpaintingRefiner()
+    print(f"{'size':>11} {'feather':>8} {'ms/eye':>8} {'grad':>7} {'color':>7} {'score':>7}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        eye = make_test_detection(w, h).left_eye
+        for feather in [0.5, 3, 8, 20]:
+            composite = make_test_composite(image, feather)
+            ms = time_call(lambda: refiner.measure_seam(composite, image, eye), repeat)
+            m = refiner.measure_seam(composite, image, eye)
+            print(f"{w:>5}x{h:<5} {feather:>8} {ms:>8.2f} {m.gradient_energy:>7.2f} "
+                  f"{m.color_discontinuity:>7.2f} {m.score:>7.2f}")
+    refiner.close()
+
+
+def bench_local(sizes, repeat):
+    """本地边缘修复：各模式耗时与接缝分数对比"""
+    from sd_refiner import LocalInpaintRefiner, SDInpaintingRefiner
+
+    scorer = SDInpaintingRefiner()
+    print(f"{'size':>11} {'mode':>10} {'ms':>8} {'seam':>6} {'center PSNR':>12}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        composite = make_test_composite(image, 0.5)
+        detection = make_test_detection(w, h)
+        eyes = [detection.left_eye, detection.right_eye]
+
+        def full_frame_telea():
+            # 改造前的做法：整图蒙版 + 整图inpaint
+            mask = np.zeros((h, w), dtype=np.uint8)
+            for eye in eyes:
+                cv2.circle(mask, eye.center_px, int(eye.radius) + 3, 255, 3)
+            return cv2.inpaint(composite, mask, 3, cv2.INPAINT_TELEA)
+
+        runs = [('telea_full', full_frame_telea)]
+        for mode in LocalInpaintRefiner.MODES:
+            refiner = LocalInpaintRefiner(mode)
+            runs.append((mode, lambda r=refiner: r.refine(composite, detection, reference=image)))
+
+        for name, fn in runs:
+            ms = time_call(fn, repeat)
+            out = fn()
+            seam = max(scorer.measure_seam(out, image, eye, 3).score for eye in eyes)
+            # 中心纹理保留程度：半径一半以内的圆盘相对合成图的PSNR
+            inner = np.zeros((h, w), dtype=np.uint8)
+            cv2.circle(inner, eyes[0].center_px, int(eyes[0].radius * 0.5), 255, -1)
+            a = out[inner > 0].astype(np.float64)
+            b = composite[inner > 0].astype(np.float64)
+            mse = np.mean((a - b) ** 2)
+            psnr = 99.0 if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+            print(f"{w:>5}x{h:<5} {name:>10} {ms:>8.2f} {seam:>6.2f} {psnr:>12.1f}")
+    scorer.close()
+
+
+def bench_mask(sizes, repeat):
+    """SD蒙版生成：整图绘制+模糊 与 局部蒙版 的耗时及一致性"""
+    from sd_refiner import SDInpaintingRefiner, compose_mask
+
+    refiner = SDInpaintingRefiner()
+    print(f"{'size':>11} {'full ms':>8} {'roi ms':>7} {'compose ms':>11} "
+          f"{'preview ms':>11} {'equal':>6}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        detection = make_test_detection(w, h)
+        rois = refiner.generate_edge_mask_rois(image.shape, detection)
+
+        full = time_call(lambda: make_test_ring_mask(w, h), repeat)
+        roi = time_call(lambda: refiner.generate_edge_mask_rois(image.shape, detection), repeat)
+        compose = time_call(lambda: compose_mask(rois, image.shape), repeat)
+        preview = time_call(lambda: refiner.preview_mask(image, rois), repeat)
+        equal = np.array_equal(make_test_ring_mask(w, h), compose_mask(rois, image.shape))
+        print(f"{w:>5}x{h:<5} {full:>8.2f} {roi:>7.3f} {compose:>11.2f} "
+              f"{preview:>11.2f} {str(equal):>6}")
+    refiner.close()
+
+
+def legacy_apply_color_to_iris(model_image, eye_center, eye_radius, target_color,
+                               intensity=0.4, feather=15):
+    """改造前的 apply_color_to_iris：逐像素蒙版 + 整图逐像素LAB混合（仅作对照）"""
+    h, w = model_image.shape[:2]
+    mask = np.zeros((h, w), dtype=np.float32)
+    cx, cy = eye_center
+    for y in range(max(0, cy - int(eye_radius) - feather),
+                   min(h, cy + int(eye_radius) + feather)):
+        for x in range(max(0, cx - int(eye_radius) - feather),
+                       min(w, cx + int(eye_radius) + feather)):
+            dist = np.sqrt((x - cx)**2 + (y - cy)**2)
+            if dist < eye_radius - feather:
+                mask[y, x] = 1.0
+            elif dist < eye_radius + feather:
+                mask[y, x] = 1.0 - (dist - (eye_radius - feather)) / (2 * feather)
+    color_layer = np.zeros_like(model_image, dtype=np.float32)
+    color_layer[:, :] = target_color
+    lab_original = cv2.cvtColor(model_image, cv2.COLOR_BGR2LAB).astype(np.float32)
+    lab_color = cv2.cvtColor(color_layer.astype(np.uint8), cv2.COLOR_BGR2LAB).astype(np.float32)
+    lab_result = lab_original.copy()
+    for i in range(h):
+        for j in range(w):
+            if mask[i, j] > 0:
+                blend = mask[i, j] * intensity
+                lab_result[i, j, 1] = lab_original[i, j, 1] * (1 - blend) + lab_color[i, j, 1] * blend
+                lab_result[i, j, 2] = lab_original[i, j, 2] * (1 - blend) + lab_color[i, j, 2] * blend
+    return cv2.cvtColor(lab_result.astype(np.uint8), cv2.COLOR_LAB2BGR), mask
+
+
+def bench_color(sizes, repeat):
+    """虹膜LAB色度混合：逐像素旧实现 与 局部向量化实现 的耗时及一致性"""
+    from color_blend import apply_color_to_iris
+    from radial_mask import feather_mask
+
+    color = (130, 155, 185)
+    print(f"{'size':>11} {'legacy ms':>10} {'new ms':>8} {'max diff':>9} "
+          f"{'diff px':>8} {'untouched':>10}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        center, radius = make_test_eyes(w, h)[0]
+        radius *= 1.1
+        new = time_call(lambda: apply_color_to_iris(image, center, radius, color, 0.4, 15), repeat)
+        out = apply_color_to_iris(image, center, radius, color, 0.4, 15)
+
+        # 旧实现整图逐像素，大图要跑数十秒，只跑一次
+        start = time.perf_counter()
+        ref, mask = legacy_apply_color_to_iris(image, center, radius, color, 0.4, 15)
+        legacy = (time.perf_counter() - start) * 1000
+
+        # 蒙版覆盖区应与旧实现一致（半径按1/32px量化，个别像素可差1~3级）；
+        # 其余像素新实现保持原图（旧实现因整图LAB往返会有±1~2的取整误差）
+        covered = mask > 0
+        diff = np.abs(out.astype(np.int16) - ref.astype(np.int16))[covered]
+        (x1, y1, x2, y2), new_mask = feather_mask(image.shape, center, radius, 15)
+        outside = np.ones((h, w), dtype=bool)
+        outside[y1:y2, x1:x2] = new_mask == 0
+        untouched = np.array_equal(out[outside], image[outside])
+        print(f"{w:>5}x{h:<5} {legacy:>10.0f} {new:>8.2f} {int(diff.max()):>9} "
+              f"{int(np.count_nonzero(diff.max(axis=1))):>8} {str(untouched):>10}")
+
+
+def make_test_lens(size: int, seed: int = 0) -> np.ndarray:
+    """生成三色环带的BGRA美瞳测试素材（外圈深色、中间主色、瞳孔附近浅色）"""
+    rng = np.random.default_rng(seed)
+    c = size // 2
+    y, x = np.ogrid[:size, :size]
+    dist = np.sqrt((x - c) ** 2 + (y - c) ** 2) / c
+    image = np.empty((size, size, 3), dtype=np.float64)
+    image[:] = (130, 155, 185)
+    image[dist > 0.8] = (60, 70, 90)
+    image[dist < 0.35] = (170, 190, 215)
+    image += rng.normal(0, 8, image.shape)
+    alpha = np.where(dist < 0.95, 255, 0).astype(np.uint8)
+    return np.dstack([np.clip(image, 0, 255).astype(np.uint8), alpha])
+
+
+def bench_palette(sizes, repeat):
+    """美瞳主色提取：子采样k-means 与 sklearn KMeans(全像素) 的耗时及主色差异（不一致时报错）"""
+    import os
+    import tempfile
+
+    from color_blend import _PALETTE_CACHE, extract_palette, get_dominant_color
+
+    try:
+        from sklearn.cluster import KMeans
+    except ImportError:
+        KMeans = None
+        print("（未安装sklearn，只测新实现）")
+
+    print(f"{'lens':>6} {'pixels':>8} {'palette ms':>11} {'first load ms':>14} {'cached ms':>10} "
+          f"{'sklearn ms':>11} {'max diff':>9} {'match':>6}")
+    mismatched = []
+    for w, h in sizes:
+        size = min(w, h) // 2
+        lens = make_test_lens(size)
+        fd, path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        cv2.imwrite(path, lens)
+        pixels = lens[:, :, :3][lens[:, :, 3] > 128]
+
+        def uncached():
+            _PALETTE_CACHE.clear()
+            return get_dominant_color(path)
+
+        # palette: 只算调色板；first load: 含PNG解码；cached: 同一素材再次调用
+        palette = time_call(lambda: extract_palette(pixels), repeat)
+        first = time_call(uncached, repeat)
+        cached = time_call(lambda: get_dominant_color(path), repeat)
+        dominant, _ = get_dominant_color(path)
+        os.remove(path)
+
+        line = f"{size:>6} {len(pixels):>8} {palette:>11.1f} {first:>14.1f} {cached:>10.3f}"
+        if KMeans is None:
+            print(f"{line} {'-':>11} {'-':>9} {'-':>6}")
+            continue
+
+        # 旧实现：KMeans(n_clusters=3, n_init=10) 跑全部不透明像素，只跑一次
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=3, random_state=42, n_init=10).fit(pixels)
+        legacy = (time.perf_counter() - start) * 1000
+        labels, counts = np.unique(kmeans.labels_, return_counts=True)
+        ref = kmeans.cluster_centers_[labels[np.argmax(counts)]].astype(int)
+
+        # 主色各通道相差不超过3级视为一致
+        diff = int(np.abs(np.array(dominant) - ref).max())
+        print(f"{line} {legacy:>11.0f} {diff:>9} {str(diff <= 3):>6}")
+        if diff > 3:
+            mismatched.append((size, tuple(dominant), tuple(int(v) for v in ref)))
+
+    if mismatched:
+        raise AssertionError(f"主色与sklearn不一致 (素材边长, 新实现, sklearn): {mismatched}")
+
+
+def make_test_close_eye(width: int, height: int, seed: int = 0):
+    """
+    生成眼睛特写测试图：肤色背景、巩膜、带放射纹理的虹膜、瞳孔、高光，上眼睑盖住虹膜上缘
+
+    Returns:
+        (BGR图像, 可见虹膜真值蒙版, (cx, cy, r))
+    """
+    rng = np.random.default_rng(seed)
+    cx, cy, r = width // 2, int(height * 0.52), int(min(width, height) * 0.25)
+    skin = (150, 170, 210)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = skin
+    cv2.ellipse(image, (cx, cy), (int(r * 2.6), int(r * 1.3)), 0, 0, 360, (225, 230, 235), -1)
+
+    y, x = np.ogrid[:height, :width]
+    dist = np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
+    iris = dist < r
+    texture = 60 + 25 * np.sin(np.arctan2(y - cy, x - cx) * 40) + 15 * dist / r
+    for c, k in enumerate((0.9, 1.0, 1.3)):
+        image[:, :, c][iris] = np.clip(texture * k, 0, 255)[iris]
+    cv2.circle(image, (cx, cy), int(r * 0.35), (20, 20, 20), -1)
+    cv2.circle(image, (cx + int(r * 0.3), cy - int(r * 0.3)), int(r * 0.1), (255, 255, 255), -1)
+
+    # 上眼睑：折线下缘，顶点在虹膜中心上方 0.55r
+    lid_y = cy - r * 0.55
+    lid = np.where(x < cx, lid_y - 0.3 * r * (1 - x / cx), lid_y - 0.3 * r * (x - cx) / (width - cx))
+    image[np.broadcast_to(y < lid, (height, width))] = skin
+
+    image = np.clip(image + rng.normal(0, 6, image.shape), 0, 255).astype(np.uint8)
+    truth = (iris & (y >= lid)).astype(np.uint8) * 255
+    return image, truth, (cx, cy, r)
+
+
+def bench_segment(sizes, repeat):
+    """眼睛特写虹膜分割：耗时、圆心/半径误差与可见区域IoU"""
+    from iris_segmenter import segment_iris
+
+    print(f"{'size':>10} {'ms':>7} {'center err':>11} {'radius err':>11} {'pupil':>12} "
+          f"{'visible IoU':>12} {'ok':>4}")
+    for w, h in sizes:
+        image, truth, (cx, cy, r) = make_test_close_eye(w, h)
+        elapsed = time_call(lambda: segment_iris(image), repeat)
+        result = segment_iris(image)
+        if result is None:
+            print(f"{w}x{h:<5} {elapsed:>7.1f} {'未检出':>11}")
+            continue
+
+        center_err = float(np.hypot(result.center[0] - cx, result.center[1] - cy))
+        radius_err = abs(result.iris_radius - r)
+        pupil = f"{result.pupil_radius:.0f}/{r * 0.35:.0f}" if result.pupil_radius else "-"
+        visible = result.visible_mask > 0
+        iou = (visible & (truth > 0)).sum() / max(1, (visible | (truth > 0)).sum())
+        # 圆心/半径误差在半径2%以内、IoU不低于0.9视为合格
+        ok = center_err <= 0.02 * r and radius_err <= 0.02 * r and iou >= 0.9
+        print(f"{w}x{h:<5} {elapsed:>7.1f} {center_err:>11.1f} {radius_err:>11.1f} {pupil:>12} "
+              f"{iou:>12.3f} {str(ok):>4}")
+
+
+def bench_texture(sizes, repeat):
+    """美瞳素材去反光：入库一次性修复 与 每个目标重复检测高光 的耗时"""
+    from lens_texture import clean_lens_texture, highlight_mask
+
+    print(f"{'lens':>6} {'ingest ms':>10} {'per-target old ms':>18} {'per-target new ms':>18} "
+          f"{'highlight px':>13} {'left px':>8}")
+    for w, h in sizes:
+        size = min(w, h) // 2
+        lens = make_test_lens(size)
+        # 两处窗户反光
+        for fx, fy in ((0.6, 0.4), (0.45, 0.58)):
+            cv2.circle(lens, (int(size * fx), int(size * fy)), max(3, size // 36),
+                       (250, 250, 250, 255), -1)
+        target_size = (size // 3, size // 3)
+
+        def old_target():
+            # 旧流程：每个目标缩放后重新阈值+模糊，降低高光处Alpha
+            scaled = cv2.resize(lens, target_size)
+            gray = cv2.cvtColor(scaled[:, :, :3], cv2.COLOR_BGR2GRAY)
+            highlight = cv2.GaussianBlur((gray > 210).astype(np.float32), (9, 9), 0)
+            return scaled[:, :, 3] / 255.0 * (1 - highlight)
+
+        clean, mask = clean_lens_texture(lens)
+        ingest = time_call(lambda: clean_lens_texture(lens), repeat)
+        old = time_call(old_target, repeat)
+        new = time_call(lambda: cv2.resize(clean, target_size), repeat)
+        left = int(np.count_nonzero(highlight_mask(clean)))
+        print(f"{size:>6} {ingest:>10.1f} {old:>18.2f} {new:>18.2f} "
+              f"{int(np.count_nonzero(mask)):>13} {left:>8}")
+    print("（ingest 每张素材只在入库时做一次；per-target 为每个目标缩放+高光处理的耗时）")
+
+
+def bench_viewport(sizes, repeat):
+    """圈选窗口渲染：整图按缩放resize 与 金字塔视口 的单帧耗时"""
+    from viewport import ImagePyramid, Viewport
+
+    screen = (1820, 930)
+    print(f"{'size':>10} {'pyramid ms':>11} {'scale':>6} {'full resize ms':>15} {'viewport ms':>12}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        start = time.perf_counter()
+        pyramid = ImagePyramid(image)
+        pyramid.done.wait()
+        build = (time.perf_counter() - start) * 1000
+
+        view = Viewport(image, *screen, pyramid)
+        for scale in (view.scale, view.scale * 1.6, 2.0):
+            view.scale = scale
+            # 每帧平移一个像素，避免命中底图缓存
+            frame = [0]
+
+            def render():
+                frame[0] += 1
+                view.pan(-frame[0], -frame[0])
+                view.render()
+
+            full = time_call(lambda: cv2.resize(image, (int(w * scale), int(h * scale))), repeat)
+            print(f"{w}x{h:<5} {build:>11.1f} {scale:>6.2f} {full:>15.1f} {time_call(render, repeat):>12.1f}")
+
+
+def make_test_history(count: int, seed: int = 0) -> list:
+    """生成模特图历史记录（每条两只眼，每只约200个圈选点）"""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    records = []
+    for i in range(count):
+        regions = []
+        for cx in rng.integers(200, 1800, 2):
+            r = rng.uniform(40, 120)
+            regions.append(np.column_stack([cx + r * np.cos(angles), 500 + r * np.sin(angles)])
+                           .astype(int).tolist())
+        records.append({'name': f"模特{i}", 'points': regions,
+                        'img_path': f"cache/target/模特{i}.png", 'time': '2026-01-01 00:00'})
+    return records
+
+
+def bench_history(sizes, repeat):
+    """圈选历史：history.json 整体读写 与 SQLite 单条增删、列表读取 的耗时（按记录条数，忽略 --size）"""
+    import json
+    import os
+    import tempfile
+    from history_store import HistoryStore
+
+    print(f"{'records':>8} {'json KB':>8} {'json load':>10} {'json save':>10} "
+          f"{'db KB':>7} {'db list':>8} {'db add':>7} {'db get':>7} {'db del':>7}")
+    for count in (20, 200, 2000):
+        records = make_test_history(count)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'history.json')
+
+            def save_json():
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(records, f, ensure_ascii=False, indent=2)
+
+            def load_json():
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+
+            save = time_call(save_json, repeat)
+            load = time_call(load_json, repeat)
+
+            store = HistoryStore(os.path.join(tmp, 'history.db'), limit=None)
+            store.import_records('target', records, skip_existing=False)
+            listing = time_call(lambda: store.records('target'), repeat)
+            record_id = store.records('target')[count // 2]['id']
+            get = time_call(lambda: store.get_points(record_id), repeat)
+            added = []
+            add = time_call(lambda: added.append(store.add('target', 'new', records[0]['points'])), repeat)
+            delete = time_call(lambda: store.delete(added.pop()['id']), min(repeat, len(added)))
+            db_kb = os.path.getsize(store.db_path) / 1024
+            store.close()
+            print(f"{count:>8} {os.path.getsize(json_path) / 1024:>8.0f} {load:>10.1f} {save:>10.1f} "
+                  f"{db_kb:>7.0f} {listing:>8.2f} {add:>7.2f} {get:>7.2f} {delete:>7.2f}")
+
+
+def make_test_stroke(radius: float, seed: int = 0) -> list:
+    """模拟手绘圈眼睛的鼠标轨迹（每隔1-2像素一个采样点，带手抖）"""
+    rng = np.random.default_rng(seed)
+    n = int(2 * np.pi * radius / 1.5)
+    angles = np.linspace(0.3, 2 * np.pi - 0.3, n)
+    r = radius + np.cumsum(rng.normal(0, 0.3, n))
+    pts = np.column_stack([1000 + r * np.cos(angles), 800 + r * np.sin(angles)])
+    return pts.astype(int).tolist()
+
+
+def bench_regions(sizes, repeat):
+    """圈选区域存储：原始点列 与 简化/圆弧参数 的点数、字节数和光栅化耗时（按半径，忽略 --size）"""
+    import json
+    from history_store import pack_points, unpack_points
+    from regions import arc_points, simplify_polyline
+
+    canvas = np.zeros((1600, 2000), dtype=np.uint8)
+
+    def fill(region):
+        cv2.fillPoly(canvas, [np.array(region, dtype=np.int32)], 255)
+
+    print(f"{'shape':>12} {'points':>7} {'stored':>7} {'json B':>7} {'blob B':>7} "
+          f"{'pack ms':>8} {'fill ms':>8} {'fill(simpl) ms':>15}")
+    for radius in (40, 120, 400):
+        for label, region in (("stroke", make_test_stroke(radius)),
+                              ("circle", arc_points((1000, 800), radius, 60))):
+            blobs = pack_points([region])
+            decoded = unpack_points(*blobs)[0]
+            stored = len(np.frombuffer(blobs[0], dtype='<i2')) // 2
+            simplified = simplify_polyline(region) if label == "stroke" else decoded
+            print(f"{label + ' r=' + str(radius):>12} {len(region):>7} {stored:>7} "
+                  f"{len(json.dumps([region])):>7} {sum(len(b) for b in blobs if b):>7} "
+                  f"{time_call(lambda: pack_points([region]), repeat):>8.2f} "
+                  f"{time_call(lambda: fill(region), repeat):>8.3f} "
+                  f"{time_call(lambda: fill(simplified), repeat):>15.3f}")
+
+
+def bench_thumbs(sizes, repeat):
+    """历史列表：点击记录时整图解码 与 读取缩略图/LRU命中 的耗时"""
+    import os
+    import tempfile
+    from image_cache import ImageLRU, ThumbnailCache, read_image_file
+
+    print(f"{'size':>10} {'png KB':>7} {'decode ms':>10} {'thumb gen ms':>13} "
+          f"{'thumb load ms':>14} {'thumb B':>8} {'lru hit ms':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        thumbs = ThumbnailCache(os.path.join(tmp, 'thumbs'))
+        for w, h in sizes:
+            path = os.path.join(tmp, f"{w}x{h}.png")
+            cv2.imencode('.png', make_test_image(w, h))[1].tofile(path)
+            decode = time_call(lambda: read_image_file(path), repeat)
+            start = time.perf_counter()
+            thumbs.get(path)
+            generate = (time.perf_counter() - start) * 1000
+            load = time_call(lambda: thumbs.load(path), repeat)
+            lru = ImageLRU()
+            lru.get(path)
+            hit = time_call(lambda: lru.get(path), repeat)
+            print(f"{w}x{h:<5} {os.path.getsize(path) / 1024:>7.0f} {decode:>10.1f} {generate:>13.1f} "
+                  f"{load:>14.2f} {os.path.getsize(thumbs.thumb_path(path)):>8} {hit:>11.3f}")
+
+
+def bench_dedup(sizes, repeat):
+    """保存历史记录：按时间戳复制原图 与 内容寻址存储 的耗时和磁盘占用（同一张图保存 repeat 次）"""
+    import os
+    import shutil
+    import tempfile
+    from image_cache import store_image
+
+    print(f"{'size':>10} {'png KB':>7} {'copy ms':>8} {'copy KB':>8} {'store ms':>9} {'store KB':>9} "
+          f"{'re-save ms':>11}")
+    for w, h in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, 'src.png')
+            cv2.imencode('.png', make_test_image(w, h))[1].tofile(src)
+            copy_dir, store_dir = os.path.join(tmp, 'copy'), os.path.join(tmp, 'store')
+            os.makedirs(copy_dir)
+            counter = [0]
+
+            def copy():
+                counter[0] += 1
+                shutil.copy2(src, os.path.join(copy_dir, f"img_{counter[0]}.png"))
+
+            copy_ms = time_call(copy, repeat)
+            store_ms = time_call(lambda: store_image(src, store_dir), repeat)
+            # 从历史记录载入后再次保存（源图已在缓存中）
+            cached = store_image(src, store_dir)
+            resave_ms = time_call(lambda: store_image(cached, store_dir), repeat)
+
+            def used(path):
+                return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1024
+
+            print(f"{w}x{h:<5} {os.path.getsize(src) / 1024:>7.0f} {copy_ms:>8.1f} {used(copy_dir):>8.0f} "
+                  f"{store_ms:>9.1f} {used(store_dir):>9.0f} {resave_ms:>11.3f}")
+
+
+def make_test_startup_dir(base_dir: str, count: int) -> list:
+    """生成旧版数据目录：count 张按 <记录名>_<时间戳> 命名的缓存图片，history.json 中记录的是已失效的绝对路径"""
+    import json
+    import os
+
+    cache_dir = os.path.join(base_dir, 'cache', 'target')
+    os.makedirs(os.path.join(base_dir, 'cache', 'lens'), exist_ok=True)
+    os.makedirs(cache_dir)
+    records = make_test_history(count)
+    for i, record in enumerate(records):
+        with open(os.path.join(cache_dir, f"{record['name']}_20260101_{i:06d}.png"), 'wb') as f:
+            f.write(b'\0' * 1024)
+        record['img_path'] = os.path.join(os.path.abspath(os.sep), 'old', f"{record['name']}.png")
+    with open(os.path.join(cache_dir, 'history.json'), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+    return records
+
+
+def bench_startup(sizes, repeat):
+    """lens_app 启动：每次启动读 history.json 并逐条遍历目录修复路径 与 一次性迁移+建索引 的耗时（按记录条数，忽略 --size）"""
+    import json
+    import os
+    import tempfile
+    from history_store import HistoryStore
+    from image_cache import legacy_image_index
+
+    print(f"{'records':>8} {'old launch':>11} {'migrate':>8} {'repair idx':>11} {'db open':>8} {'db list':>8}")
+    for count in (20, 200, 2000):
+        with tempfile.TemporaryDirectory() as tmp:
+            records = make_test_startup_dir(tmp, count)
+            cache_dir = os.path.join(tmp, 'cache', 'target')
+            json_path = os.path.join(cache_dir, 'history.json')
+
+            def old_launch():
+                # 旧版每次启动：整体读取 JSON，每条失效路径都遍历一次缓存目录
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+                for record in history:
+                    for filename in os.listdir(cache_dir):
+                        if filename.startswith(record['name'] + '_') and not filename.endswith('.json'):
+                            break
+
+            def repair():
+                index = legacy_image_index(cache_dir)
+                return [index.get(record['name']) for record in records]
+
+            old = time_call(old_launch, repeat)
+            repaired = time_call(repair, repeat)
+
+            # 迁移只在首次启动时执行一次
+            db_path = os.path.join(tmp, 'cache', 'history.db')
+            start = time.perf_counter()
+            store = HistoryStore(db_path, limit=None)
+            store.import_json('target', json_path)
+            migrate = (time.perf_counter() - start) * 1000
+            store.close()
+
+            # 之后的启动：打开数据库并读取列表（在后台线程，窗口先显示）
+            def open_db():
+                HistoryStore(db_path, limit=None).close()
+
+            opened = time_call(open_db, repeat)
+            store = HistoryStore(db_path, limit=None)
+            listing = time_call(lambda: store.records('target'), repeat)
+            store.close()
+            print(f"{count:>8} {old:>11.1f} {migrate:>8.1f} {repaired:>11.2f} {opened:>8.2f} {listing:>8.2f}")
+
+    # 有图形界面时测量实际的首个窗口时间
+    import tkinter as tk
+    from lens_app import LensApp
+
+    print(f"\n{'records':>8} {'launch':>7} {'window ms':>10} {'history ms':>11}")
+    for count in (20, 200, 2000):
+        with tempfile.TemporaryDirectory() as tmp:
+            make_test_startup_dir(tmp, count)
+            for launch in ('first', 'next'):
+                start = time.perf_counter()
+                try:
+                    app = LensApp(history_limit=None, base_dir=tmp)
+                except tk.TclError as e:
+                    print(f"[WARN] 无法创建窗口，跳过界面启动测试: {e}")
+                    return
+                app.root.update()
+                window = (time.perf_counter() - start) * 1000
+                while not app.history_loaded:
+                    app.root.update()
+                    time.sleep(0.001)
+                loaded = (time.perf_counter() - start) * 1000
+                app.root.destroy()
+                app.history_db.close()
+                print(f"{count:>8} {launch:>7} {window:>10.1f} {loaded:>11.1f}")
+
+
+def bench_masks(sizes, repeat):
+    """生成结果：每次整图绘制蒙版、提取纹理 与 按圈选点哈希缓存（磁盘命中）的耗时"""
+    import tempfile
+    from image_cache import ArrayCache, array_key
+    from lens_app import extract_texture, render_targets, target_alpha
+    from regions import arc_points
+
+    def full_frame_alpha(region, shape, feather=15):
+        # 旧版：整幅图绘制蒙版后裁剪再模糊
+        pts = np.array(region, dtype=np.int32)
+        x, y, w, h = cv2.boundingRect(pts)
+        mask = np.zeros(shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255)
+        alpha = cv2.GaussianBlur(mask[y:y + h, x:x + w].astype(np.float32), (31, 31), 0)
+        return alpha / alpha.max()
+
+    print(f"{'size':>11} {'tex ms':>7} {'tex hit':>8} {'full mask':>10} {'roi mask':>9} {'mask hit':>9} "
+          f"{'render':>7} {'cached':>7} {'equal':>6}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        eyes = make_test_eyes(w, h)
+        source_points = arc_points(eyes[0][0], eyes[0][1] * 3, 0)
+        regions = [arc_points(center, radius * 2, 30) for center, radius in eyes]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            texture = extract_texture(image, source_points)
+            tex = time_call(lambda: extract_texture(image, source_points), repeat)
+            key = array_key(source_points, 'texture', 'bench', 15)
+            ArrayCache(tmp).get(key, lambda: texture)
+            # 每次新建缓存对象，只测磁盘命中（相当于重新启动后处理）
+            tex_hit = time_call(lambda: ArrayCache(tmp).get(key, None), repeat)
+
+            full = time_call(lambda: [full_frame_alpha(r, image.shape) for r in regions], repeat)
+            roi = time_call(lambda: [target_alpha(r, image.shape) for r in regions], repeat)
+            keys = [array_key(r, 'target', h, w, 15) for r in regions]
+            for k, r in zip(keys, regions):
+                ArrayCache(tmp).get(k, lambda: target_alpha(r, image.shape))
+            hit = time_call(lambda: [ArrayCache(tmp).get(k, None) for k in keys], repeat)
+
+            render = time_call(lambda: render_targets(texture, image, regions), repeat)
+            cached = time_call(lambda: render_targets(texture, image, regions, alpha_cache=ArrayCache(tmp)),
+                               repeat)
+            equal = np.array_equal(render_targets(texture, image, regions),
+                                   render_targets(texture, image, regions, alpha_cache=ArrayCache(tmp)))
+            print(f"{w:>5}x{h:<5} {tex:>7.1f} {tex_hit:>8.2f} {full:>10.2f} {roi:>9.2f} {hit:>9.2f} "
+                  f"{render:>7.1f} {cached:>7.1f} {str(equal):>6}")
+
+
+def bench_preview(sizes, repeat):
+    """圈选实时预览：整图生成结果 与 只重新合成编辑中区域 的每帧耗时（帧预算 16ms）"""
+    from lens_app import extract_texture, render_targets
+    from regions import arc_points
+    from viewport import LivePreview, Viewport
+
+    print(f"{'size':>11} {'zoom':>5} {'full ms':>8} {'first':>6} {'draw':>6} {'move':>6} {'wheel':>6} "
+          f"{'worst':>6} {'<16ms':>6}")
+    for w, h in sizes:
+        image = make_test_image(w, h)
+        eyes = make_test_eyes(w, h)
+        texture = extract_texture(image, arc_points(eyes[0][0], eyes[0][1] * 3, 0))
+        regions = [arc_points(center, radius * 2, 60) for center, radius in eyes]
+        (cx, cy), radius = eyes[0]
+
+        view = Viewport(image, 1820, 930)
+        view.pyramid.done.wait()
+        # 旧流程：每次调整后整图生成结果再显示
+        full = time_call(lambda: render_targets(texture, image, regions), repeat)
+
+        for zoom in (None, 1.0, 4.0):
+            if zoom is None:
+                view.fit()
+            else:
+                view.scale = zoom
+                view.pan(910 - cx * zoom, 465 - cy * zoom)
+            preview = LivePreview(texture)
+
+            def frames(edit, count):
+                times = []
+                for k in range(count):
+                    preview.render(view, edit(k))
+                    times.append(preview.frame_ms)
+                return times
+
+            first = frames(lambda k: regions, 1)[0]
+            # 画圆：半径逐帧变化；中键移动：平移最后一个区域；滚轮：缩放最后一个区域
+            draw = frames(lambda k: regions + [arc_points((cx, cy), radius * 2 + k, 60)], repeat)
+            move = frames(lambda k: regions[:1] + [[[x + k, y] for x, y in regions[1]]], repeat)
+            wheel = frames(lambda k: regions[:1] + [arc_points(eyes[1][0], eyes[1][1] * 2 * 1.05 ** k, 60)],
+                           repeat)
+            worst = max(draw + move + wheel)
+            print(f"{w:>5}x{h:<5} {view.scale:>5.2f} {full:>8.1f} {first:>6.1f} {np.mean(draw):>6.1f} "
+                  f"{np.mean(move):>6.1f} {np.mean(wheel):>6.1f} {worst:>6.1f} {str(worst < 16):>6}")
+
+
+BENCHMARKS = {
+    'codec': bench_codec,
+    'color': bench_color,
+    'dedup': bench_dedup,
+    'history': bench_history,
+    'local': bench_local,
+    'mask': bench_mask,
+    'masks': bench_masks,
+    'palette': bench_palette,
+    'preview': bench_preview,
+    'regions': bench_regions,
+    'seam': bench_seam,
+    'segment': bench_segment,
+    'startup': bench_startup,
+    'texture': bench_texture,
+    'thumbs': bench_thumbs,
+    'viewport': bench_viewport,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    parser.add_argument("name", choices=sorted(BENCHMARKS) + ["all"], help="测试项")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数 (默认: 5)")
+    parser.add_argument(
+        "--size",
+        action="append",
+        help="图片尺寸 WxH，可多次指定 (默认: 常见尺寸)"
+    )
+    args = parser.parse_args()
+
+    sizes = DEFAULT_SIZES
+    if args.size:
+        sizes = [tuple(int(v) for v in s.lower().split('x')) for s in args.size]
+
+    names = sorted(BENCHMARKS) if args.name == "all" else [args.name]
+    for name in names:
+        print(f"\n== {name}: {BENCHMARKS[name].__doc__.strip()} ==")
+        BENCHMARKS[name](sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,39 +3,159 @@
 这种方法可以避免产生边缘印记
 """
 
+import hashlib
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Sequence
 from iris_detector import IrisDetector
+from radial_mask import feather_mask
 
 
-def get_dominant_color(image_path: str) -> tuple:
-    """从美瞳素材中提取主色调"""
-    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+# 调色板缓存: (绝对路径, 修改时间, 文件大小, n_colors) -> (颜色, 占比)
+_PALETTE_CACHE = {}
+
+
+def _kmeans(
+    pixels: np.ndarray,
+    n_colors: int,
+    rng: np.random.Generator,
+    iterations: int = 20
+) -> tuple:
+    """k-means++ 初始化 + Lloyd迭代，返回 (簇中心, 标签, 误差平方和)"""
+    def squared_distances(centers):
+        # |p - c|^2 = |p|^2 - 2 p·c + |c|^2
+        return np.maximum(sq_norms[:, np.newaxis] - 2 * pixels @ centers.T + (centers ** 2).sum(axis=1), 0)
+    
+    sq_norms = (pixels ** 2).sum(axis=1)
+    centers = pixels[[rng.integers(len(pixels))]]
+    for _ in range(1, n_colors):
+        d2 = squared_distances(centers).min(axis=1)
+        total = d2.sum()
+        index = rng.choice(len(pixels), p=d2 / total) if total > 0 else 0
+        centers = np.vstack([centers, pixels[index]])
+    
+    for _ in range(iterations):
+        labels = np.argmin(squared_distances(centers), axis=1)
+        counts = np.bincount(labels, minlength=n_colors)
+        sums = np.stack([
+            np.bincount(labels, weights=pixels[:, c], minlength=n_colors) for c in range(3)
+        ], axis=1)
+        # 空簇保持原中心
+        new_centers = np.where(counts[:, np.newaxis] > 0, sums / np.maximum(counts, 1)[:, np.newaxis], centers)
+        if np.allclose(new_centers, centers, atol=1e-3):
+            break
+        centers = new_centers
+    
+    d2 = squared_distances(centers)
+    labels = np.argmin(d2, axis=1)
+    return centers, labels, float(d2[np.arange(len(pixels)), labels].sum())
+
+
+def extract_palette(
+    pixels: np.ndarray,
+    n_colors: int = 3,
+    sample_size: int = 10000,
+    n_init: int = 3,
+    seed: int = 42
+) -> list:
+    """
+    从像素中提取调色板（不依赖sklearn）
+    
+    在固定种子的子采样上做k-means，多次初始化取误差最小的一次
+    
+    Args:
+        pixels: (N, 3) 像素
+        n_colors: 颜色数
+        sample_size: 子采样像素数
+        n_init: 初始化次数
+        seed: 随机种子（保证同一素材结果稳定）
+        
+    Returns:
+        [(颜色, 占比), ...]，按占比从大到小排序，颜色为 float 数组
+    """
+    pixels = np.asarray(pixels).reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    if len(pixels) > sample_size:
+        pixels = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+    pixels = pixels.astype(np.float64)
+    n_colors = min(n_colors, len(pixels))
+    
+    best = None
+    for _ in range(n_init):
+        centers, labels, inertia = _kmeans(pixels, n_colors, rng)
+        if best is None or inertia < best[2]:
+            best = (centers, labels, inertia)
+    
+    centers, labels, _ = best
+    counts = np.bincount(labels, minlength=n_colors)
+    order = np.argsort(-counts, kind='stable')
+    return [(centers[k], counts[k] / len(labels)) for k in order]
+
+
+def get_palette(image_path: str, n_colors: int = 3) -> tuple:
+    """
+    读取美瞳素材的调色板和平均色（按文件缓存，素材未修改时直接返回）
+    
+    Returns:
+        (调色板, 平均颜色)，调色板格式同 extract_palette
+    """
+    path = Path(image_path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size, n_colors)
+    if key in _PALETTE_CACHE:
+        return _PALETTE_CACHE[key]
+    
+    img = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError(f"无法读取图片: {image_path}")
+    
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
     
     if img.shape[2] == 4:
         # 只考虑不透明的像素
-        alpha = img[:, :, 3]
-        mask = alpha > 128
-        pixels = img[:, :, :3][mask]
+        opaque = img[:, :, 3] > 128
+        pixels = img[:, :, :3][opaque]
+        avg_color = cv2.mean(img[:, :, :3], mask=opaque.astype(np.uint8))[:3]
     else:
         pixels = img.reshape(-1, 3)
+        avg_color = cv2.mean(img)[:3]
+    if len(pixels) == 0:
+        raise ValueError(f"素材中没有不透明像素: {image_path}")
     
-    # 计算平均颜色
-    avg_color = np.mean(pixels, axis=0).astype(int)
+    avg_color = np.array(avg_color)
+    _PALETTE_CACHE[key] = (extract_palette(pixels, n_colors), avg_color)
+    return _PALETTE_CACHE[key]
+
+
+def get_dominant_color(image_path: str) -> tuple:
+    """从美瞳素材中提取主色调，返回 (主色, 平均色)，均为BGR整数元组"""
+    palette, avg_color = get_palette(image_path)
+    dominant_color = palette[0][0]
+    return (tuple(int(v) for v in dominant_color.astype(int)),
+            tuple(int(v) for v in avg_color.astype(int)))
+
+
+def get_target_color(lens_path: str) -> tuple:
+    """
+    混合用的目标颜色：美瞳素材的主色调，取色失败（如素材没有不透明像素）时退回整图平均色
     
-    # 也计算主要颜色（使用K-means）
-    from sklearn.cluster import KMeans
+    Returns:
+        BGR整数元组
+    """
     try:
-        kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
-        kmeans.fit(pixels)
-        # 取最大的簇作为主色
-        labels, counts = np.unique(kmeans.labels_, return_counts=True)
-        dominant_idx = labels[np.argmax(counts)]
-        dominant_color = kmeans.cluster_centers_[dominant_idx].astype(int)
-        return tuple(dominant_color), tuple(avg_color)
-    except:
-        return tuple(avg_color), tuple(avg_color)
+        dominant_color, avg_color = get_dominant_color(lens_path)
+        print(f"  Dominant color (BGR): {dominant_color}")
+        print(f"  Average color (BGR): {avg_color}")
+        return dominant_color
+    except Exception as e:
+        print(f"  Using fallback color extraction: {e}")
+        lens_img = cv2.imread(lens_path)
+        if lens_img is None:
+            raise ValueError(f"无法读取图片: {lens_path}")
+        return tuple(np.mean(lens_img.reshape(-1, 3), axis=0).astype(int))
 
 
 def apply_color_to_iris(
@@ -49,47 +169,31 @@ def apply_color_to_iris(
     """
     将目标颜色应用到虹膜区域
     使用颜色混合模式，只改变色调不添加纹理
+    
+    只在眼睛方框内转LAB混合，蒙版为0的像素保持原值
+    （不再经过整图 BGR->LAB->BGR 往返带来的取整误差）
     """
     result = model_image.copy()
-    h, w = model_image.shape[:2]
-    
-    # 创建虹膜区域蒙版
-    mask = np.zeros((h, w), dtype=np.float32)
-    
-    # 绘制渐变圆形蒙版
-    cx, cy = eye_center
-    for y in range(max(0, cy - int(eye_radius) - feather), 
-                   min(h, cy + int(eye_radius) + feather)):
-        for x in range(max(0, cx - int(eye_radius) - feather), 
-                       min(w, cx + int(eye_radius) + feather)):
-            dist = np.sqrt((x - cx)**2 + (y - cy)**2)
-            if dist < eye_radius - feather:
-                mask[y, x] = 1.0
-            elif dist < eye_radius + feather:
-                # 渐变过渡
-                mask[y, x] = 1.0 - (dist - (eye_radius - feather)) / (2 * feather)
-    
-    # 创建颜色叠加层
-    color_layer = np.zeros_like(model_image, dtype=np.float32)
-    color_layer[:, :] = target_color
+    
+    box, mask = feather_mask(model_image.shape, eye_center, eye_radius, feather)
+    if box is None:
+        return result
+    x1, y1, x2, y2 = box
+    roi = model_image[y1:y2, x1:x2]
     
     # 转换到LAB空间进行颜色混合
-    lab_original = cv2.cvtColor(model_image, cv2.COLOR_BGR2LAB).astype(np.float32)
-    lab_color = cv2.cvtColor(color_layer.astype(np.uint8), cv2.COLOR_BGR2LAB).astype(np.float32)
+    lab_original = cv2.cvtColor(roi, cv2.COLOR_BGR2LAB).astype(np.float32)
+    lab_color = cv2.cvtColor(np.uint8([[target_color]]), cv2.COLOR_BGR2LAB)[0, 0].astype(np.float32)
     
     # 只混合a和b通道（色度），保留原始L通道（亮度）
+    blend = (mask * intensity)[:, :, np.newaxis]
     lab_result = lab_original.copy()
+    lab_result[:, :, 1:] = lab_original[:, :, 1:] * (1 - blend) + lab_color[1:] * blend
     
-    for i in range(h):
-        for j in range(w):
-            if mask[i, j] > 0:
-                blend = mask[i, j] * intensity
-                # 保留原始亮度，混合色度
-                lab_result[i, j, 1] = lab_original[i, j, 1] * (1 - blend) + lab_color[i, j, 1] * blend
-                lab_result[i, j, 2] = lab_original[i, j, 2] * (1 - blend) + lab_color[i, j, 2] * blend
-    
-    # 转回BGR
-    result = cv2.cvtColor(lab_result.astype(np.uint8), cv2.COLOR_LAB2BGR)
+    # 转回BGR，只写回蒙版覆盖的像素
+    blended = cv2.cvtColor(lab_result.astype(np.uint8), cv2.COLOR_LAB2BGR)
+    covered = mask > 0
+    result[y1:y2, x1:x2][covered] = blended[covered]
     
     return result
 
@@ -103,43 +207,36 @@ def apply_color_fast(
     feather: int = 20
 ) -> np.ndarray:
     """
-    快速颜色混合（使用numpy向量化）
+    快速颜色混合（使用numpy向量化，只处理眼睛方框）
     """
-    result = model_image.copy().astype(np.float32)
-    h, w = model_image.shape[:2]
-    
-    cx, cy = eye_center
-    
-    # 创建坐标网格
-    y_coords, x_coords = np.ogrid[:h, :w]
-    
-    # 计算到中心的距离
-    dist = np.sqrt((x_coords - cx)**2 + (y_coords - cy)**2)
-    
-    # 创建渐变蒙版
-    inner_radius = eye_radius - feather
-    outer_radius = eye_radius + feather
-    
-    mask = np.zeros((h, w), dtype=np.float32)
-    mask[dist < inner_radius] = 1.0
-    
-    transition = (dist >= inner_radius) & (dist < outer_radius)
-    mask[transition] = 1.0 - (dist[transition] - inner_radius) / (outer_radius - inner_radius)
+    result = model_image.copy()
     
-    # 应用强度
-    mask = mask * intensity
+    box, mask = feather_mask(model_image.shape, eye_center, eye_radius, feather)
+    if box is None:
+        return result
+    x1, y1, x2, y2 = box
+    roi = model_image[y1:y2, x1:x2]
     
     # 转换到HSV进行颜色混合
-    hsv_original = cv2.cvtColor(model_image, cv2.COLOR_BGR2HSV).astype(np.float32)
+    hsv_original = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV).astype(np.float32)
     
     # 目标颜色的HSV
     target_bgr = np.uint8([[target_color]])
     target_hsv = cv2.cvtColor(target_bgr, cv2.COLOR_BGR2HSV)[0, 0].astype(np.float32)
     
-    # 混合H和S通道，保留V（亮度）
-    hsv_result = hsv_original.copy()
+    # 应用强度
+    mask = mask * intensity
+    
+    blended = _blend_hsv(hsv_original, target_hsv, mask)
+    covered = mask > 0
+    result[y1:y2, x1:x2][covered] = blended[covered]
     
-    mask_3d = mask[:, :, np.newaxis]
+    return result
+
+
+def _blend_hsv(hsv_original: np.ndarray, target_hsv: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """按蒙版混合H和S通道、保留V（亮度），返回BGR uint8"""
+    hsv_result = hsv_original.copy()
     
     # 只修改色相和饱和度
     hsv_result[:, :, 0] = hsv_original[:, :, 0] * (1 - mask) + target_hsv[0] * mask
@@ -149,7 +246,153 @@ def apply_color_fast(
     hsv_result[:, :, 0] = np.clip(hsv_result[:, :, 0], 0, 179)
     hsv_result[:, :, 1] = np.clip(hsv_result[:, :, 1], 0, 255)
     
-    result = cv2.cvtColor(hsv_result.astype(np.uint8), cv2.COLOR_HSV2BGR)
+    return cv2.cvtColor(hsv_result.astype(np.uint8), cv2.COLOR_HSV2BGR)
+
+
+# 色彩查找表的磁盘缓存目录
+LUT_CACHE_DIR = Path(__file__).parent / "cache" / "lut"
+
+# 查找表内存缓存: (素材内容哈希, 格点数, 颜色数) -> LUT
+_LUT_CACHE = {}
+
+
+def build_color_lut(palette: list, size: int = 17) -> np.ndarray:
+    """
+    由美瞳调色板生成3D色彩查找表
+    
+    保留输入像素的亮度L，色度a/b按亮度在调色板各色之间插值：
+    暗部取调色板中深色（外圈）的色度，亮部取浅色（瞳孔周围）的色度，
+    因此能把虹膜原有的明暗层次映射成美瞳的多种色调
+    
+    Args:
+        palette: extract_palette / get_palette 返回的调色板
+        size: 每个通道的格点数（17 或 33）
+        
+    Returns:
+        (size, size, size, 3) float32 查找表，下标顺序为 [B, G, R]，值为BGR (0-255)
+    """
+    colors = np.array([color for color, _ in palette], dtype=np.float32).reshape(-1, 1, 3)
+    palette_lab = cv2.cvtColor(colors / 255, cv2.COLOR_BGR2LAB).reshape(-1, 3)
+    palette_lab = palette_lab[np.argsort(palette_lab[:, 0])]
+    
+    axis = np.linspace(0, 1, size, dtype=np.float32)
+    grid = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1)
+    lab = cv2.cvtColor(grid.reshape(-1, 1, 3), cv2.COLOR_BGR2LAB).reshape(-1, 3)
+    
+    lab[:, 1] = np.interp(lab[:, 0], palette_lab[:, 0], palette_lab[:, 1])
+    lab[:, 2] = np.interp(lab[:, 0], palette_lab[:, 0], palette_lab[:, 2])
+    
+    bgr = cv2.cvtColor(lab.reshape(-1, 1, 3), cv2.COLOR_LAB2BGR)
+    return (np.clip(bgr, 0, 1) * 255).reshape(size, size, size, 3).astype(np.float32)
+
+
+def load_color_lut(
+    lens_path: str,
+    size: int = 17,
+    n_colors: int = 5,
+    cache_dir: Path = LUT_CACHE_DIR
+) -> np.ndarray:
+    """
+    读取美瞳素材对应的查找表，没有则生成并缓存到磁盘
+    
+    缓存按素材文件内容哈希命名，同一素材在不同路径/多次运行间共用
+    
+    Args:
+        lens_path: 美瞳素材路径
+        size: 查找表格点数
+        n_colors: 调色板颜色数
+        cache_dir: 磁盘缓存目录
+        
+    Returns:
+        build_color_lut 格式的查找表
+    """
+    with open(lens_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+    key = (digest, size, n_colors)
+    if key in _LUT_CACHE:
+        return _LUT_CACHE[key]
+    
+    cache_path = Path(cache_dir) / f"{digest}_{n_colors}c_{size}.npy"
+    if cache_path.exists():
+        lut = np.load(cache_path)
+    else:
+        palette, _ = get_palette(lens_path, n_colors)
+        lut = build_color_lut(palette, size)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(cache_path, lut)
+    
+    _LUT_CACHE[key] = lut
+    return lut
+
+
+def apply_color_lut(image: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """
+    用3D查找表映射颜色（三线性插值）
+    
+    Args:
+        image: BGR图像（一般为虹膜ROI）
+        lut: build_color_lut 格式的查找表
+        
+    Returns:
+        映射后的 float32 BGR 图像
+    """
+    size = lut.shape[0]
+    table = lut.reshape(-1, 3)
+    pos = image.reshape(-1, 3).astype(np.float32) * np.float32((size - 1) / 255)
+    base = np.minimum(pos.astype(np.int32), size - 2)
+    frac = pos - base
+    
+    # 格点在展平表中的下标及各轴步长
+    index = (base[:, 0] * size + base[:, 1]) * size + base[:, 2]
+    steps = (size * size, size, 1)
+    
+    # 8个角点按权重累加
+    out = np.zeros_like(pos)
+    for corner in range(8):
+        offset = 0
+        weight = np.ones(len(pos), dtype=np.float32)
+        for axis in range(3):
+            if corner >> (2 - axis) & 1:
+                offset += steps[axis]
+                weight *= frac[:, axis]
+            else:
+                weight *= 1 - frac[:, axis]
+        out += table[index + offset] * weight[:, np.newaxis]
+    
+    return out.reshape(image.shape)
+
+
+def _mix(original: np.ndarray, mapped: np.ndarray, blend: np.ndarray) -> np.ndarray:
+    """original 与 mapped 按 blend 线性混合，四舍五入为 uint8"""
+    blended = original + (mapped - original) * blend + np.float32(0.5)
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+
+def apply_lut_to_iris(
+    model_image: np.ndarray,
+    eye_center: tuple,
+    eye_radius: float,
+    lut: np.ndarray,
+    intensity: float = 0.5,
+    feather: int = 20
+) -> np.ndarray:
+    """
+    查找表色彩迁移（参数同 apply_color_fast，只处理眼睛方框）
+    """
+    result = model_image.copy()
+    
+    box, mask = feather_mask(model_image.shape, eye_center, eye_radius, feather)
+    if box is None:
+        return result
+    x1, y1, x2, y2 = box
+    roi = model_image[y1:y2, x1:x2]
+    
+    # 只映射蒙版覆盖的像素
+    covered = mask > 0
+    pixels = roi[covered]
+    blend = (mask[covered] * np.float32(intensity))[:, np.newaxis]
+    mapped = apply_color_lut(pixels, lut)
+    result[y1:y2, x1:x2][covered] = _mix(pixels, mapped, blend)
     
     return result
 
@@ -159,9 +402,20 @@ def process_with_color_blend(
     lens_path: str,
     output_path: str,
     intensity: float = 0.45,
-    feather: int = 18
+    feather: int = 18,
+    mode: str = "hsv",
+    lut_size: int = 17
 ):
-    """完整的颜色混合处理流程"""
+    """
+    完整的颜色混合处理流程
+    
+    Args:
+        mode: "hsv" - 向美瞳主色做单色混合 (apply_color_fast)
+              "lut" - 用美瞳调色板生成的3D查找表做多色调迁移 (apply_lut_to_iris)
+        lut_size: 查找表格点数（17 或 33）
+    """
+    if mode not in ("hsv", "lut"):
+        raise ValueError(f"不支持的混合模式: {mode}")
     
     print("Loading images...")
     model_img = cv2.imread(model_path)
@@ -174,43 +428,38 @@ def process_with_color_blend(
     if not result.success:
         raise ValueError("No face detected")
     
-    # 从美瞳素材提取目标颜色
-    print("Extracting target color from lens...")
-    try:
-        dominant_color, avg_color = get_dominant_color(lens_path)
-        print(f"  Dominant color (BGR): {dominant_color}")
-        print(f"  Average color (BGR): {avg_color}")
-        target_color = dominant_color
-    except Exception as e:
-        print(f"  Using fallback color extraction: {e}")
-        lens_img = cv2.imread(lens_path)
-        target_color = tuple(np.mean(lens_img.reshape(-1, 3), axis=0).astype(int))
+    if mode == "lut":
+        # 查找表按素材缓存到磁盘，同一美瞳换模特时直接复用
+        print(f"Loading {lut_size}^3 color LUT from lens palette...")
+        lut = load_color_lut(lens_path, lut_size)
+        
+        def recolor(image, eye_data):
+            return apply_lut_to_iris(
+                image, eye_data.center_px, eye_data.radius * 1.1,  # 稍微扩大一点
+                lut, intensity, feather
+            )
+    else:
+        # 从美瞳素材提取目标颜色
+        print("Extracting target color from lens...")
+        target_color = get_target_color(lens_path)
+        
+        def recolor(image, eye_data):
+            return apply_color_fast(
+                image, eye_data.center_px, eye_data.radius * 1.1,  # 稍微扩大一点
+                target_color, intensity, feather
+            )
     
     output = model_img.copy()
     
     # 处理左眼
     if result.left_eye:
         print(f"Processing left eye at {result.left_eye.center_px}...")
-        output = apply_color_fast(
-            output,
-            result.left_eye.center_px,
-            result.left_eye.radius * 1.1,  # 稍微扩大一点
-            target_color,
-            intensity,
-            feather
-        )
+        output = recolor(output, result.left_eye)
     
     # 处理右眼
     if result.right_eye:
         print(f"Processing right eye at {result.right_eye.center_px}...")
-        output = apply_color_fast(
-            output,
-            result.right_eye.center_px,
-            result.right_eye.radius * 1.1,
-            target_color,
-            intensity,
-            feather
-        )
+        output = recolor(output, result.right_eye)
     
     cv2.imwrite(output_path, output)
     print(f"[DONE] Saved to: {output_path}")
@@ -218,22 +467,131 @@ def process_with_color_blend(
     return output
 
 
+def sweep_color_blend(
+    model_path: str,
+    lens_path: str,
+    output_dir: str,
+    intensities: Sequence[float] = (0.35, 0.45, 0.55),
+    feathers: Sequence[int] = (20,),
+    mode: str = "hsv",
+    lut_size: int = 17,
+    name_format: str = "result_color_blend_{intensity}_{feather}.jpg",
+    workers: int = 4
+) -> dict:
+    """
+    一次生成多个强度/羽化组合的颜色混合结果
+    
+    读图、眼球检测、取色（或查找表）以及眼睛区域的颜色空间转换只做一次，
+    每个组合只做一次蒙版混合，输出图片在线程池中并行编码保存
+    
+    Args:
+        model_path: 模特图片路径
+        lens_path: 美瞳素材路径
+        output_dir: 输出目录
+        intensities: 强度列表
+        feathers: 羽化宽度列表
+        mode: "hsv" 或 "lut"，同 process_with_color_blend
+        lut_size: 查找表格点数
+        name_format: 输出文件名，{intensity} 为强度百分数，{feather} 为羽化宽度
+        workers: 编码线程数
+        
+    Returns:
+        {(强度, 羽化): 输出路径}
+    """
+    if mode not in ("hsv", "lut"):
+        raise ValueError(f"不支持的混合模式: {mode}")
+    if len(feathers) > 1 and "{feather}" not in name_format:
+        raise ValueError("多个羽化宽度时 name_format 需要包含 {feather}")
+    
+    print("Loading images...")
+    model_img = cv2.imread(model_path)
+    if model_img is None:
+        raise ValueError(f"无法读取图片: {model_path}")
+    
+    print("Detecting eyes...")
+    detector = IrisDetector()
+    result = detector.detect(model_img)
+    detector.close()
+    
+    if not result.success:
+        raise ValueError("No face detected")
+    
+    if mode == "lut":
+        print(f"Loading {lut_size}^3 color LUT from lens palette...")
+        lut = load_color_lut(lens_path, lut_size)
+    else:
+        print("Extracting target color from lens...")
+        target_color = get_target_color(lens_path)
+        target_hsv = cv2.cvtColor(np.uint8([[target_color]]), cv2.COLOR_BGR2HSV)[0, 0].astype(np.float32)
+    
+    # 每只眼按最大羽化取方框，一次性完成颜色空间转换
+    eyes = []
+    for eye_data in [result.left_eye, result.right_eye]:
+        if eye_data is None:
+            continue
+        center, radius = eye_data.center_px, eye_data.radius * 1.1
+        box, _ = feather_mask(model_img.shape, center, radius, max(feathers))
+        if box is None:
+            continue
+        x1, y1, x2, y2 = box
+        roi = model_img[y1:y2, x1:x2]
+        if mode == "lut":
+            converted = apply_color_lut(roi, lut)
+        else:
+            converted = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV).astype(np.float32)
+        eyes.append((center, radius, box, roi, converted))
+    
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    outputs = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for feather in feathers:
+            for intensity in intensities:
+                output = model_img.copy()
+                for center, radius, (bx1, by1, _, _), roi, converted in eyes:
+                    box, mask = feather_mask(model_img.shape, center, radius, feather)
+                    if box is None:
+                        continue
+                    x1, y1, x2, y2 = box
+                    # 当前羽化的方框落在最大羽化方框之内
+                    sub = (slice(y1 - by1, y2 - by1), slice(x1 - bx1, x2 - bx1))
+                    blend = mask * np.float32(intensity)
+                    if mode == "lut":
+                        blended = _mix(roi[sub], converted[sub], blend[:, :, np.newaxis])
+                    else:
+                        blended = _blend_hsv(converted[sub], target_hsv, blend)
+                    covered = mask > 0
+                    output[y1:y2, x1:x2][covered] = blended[covered]
+                
+                path = output_dir / name_format.format(intensity=int(round(intensity * 100)), feather=feather)
+                outputs[(intensity, feather)] = str(path)
+                jobs.append(pool.submit(cv2.imwrite, str(path), output))
+                print(f"  intensity={intensity}, feather={feather} -> {path.name}")
+        
+        for job in jobs:
+            job.result()
+    
+    print(f"[DONE] {len(outputs)} variants saved to: {output_dir}")
+    return outputs
+
+
 if __name__ == "__main__":
     base_dir = Path(__file__).parent
     
     model_path = base_dir / "input" / "model.jpg"
     lens_path = base_dir / "output" / "extracted_lens.png"
     
-    # 多个强度版本
-    for intensity in [0.35, 0.45, 0.55]:
-        output_path = base_dir / "output" / f"result_color_blend_{int(intensity*100)}.jpg"
-        process_with_color_blend(
-            str(model_path),
-            str(lens_path),
-            str(output_path),
-            intensity=intensity,
-            feather=20
-        )
+    # 多个强度版本（检测和取色只做一次）
+    sweep_color_blend(
+        str(model_path),
+        str(lens_path),
+        str(base_dir / "output"),
+        intensities=[0.35, 0.45, 0.55],
+        feathers=[20],
+        name_format="result_color_blend_{intensity}.jpg"
+    )
     
     # 创建对比图
     model_img = cv2.imread(str(model_path))
@@ -0,0 +1,222 @@
+"""
+批量提取美瞳素材
+从供应商试戴图目录中提取每只眼睛（含多张人脸）的美瞳纹理，
+输出BGRA素材和清单 manifest.json；检测不到人脸的特写图用经典方法分割虹膜，
+仍失败、按图像中心回退的图片列入人工复核名单
+
+用法: python extract_lenses.py <图片目录> <输出目录> [--workers N]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from lens_overlay import crop_lens, fallback_lens_region, locate_lens_regions
+from lens_texture import clean_lens_texture, highlight_path, save_lens_asset
+
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# 工作进程内复用的检测器（每个进程创建一次）
+_detector = None
+
+
+def _init_worker(max_faces: int):
+    """工作进程初始化：创建进程内共用的检测器"""
+    global _detector
+    try:
+        from iris_detector import IrisDetector
+
+        _detector = IrisDetector(max_num_faces=max_faces)
+    except Exception as e:
+        print(f"[WARN] 无法创建检测器，全部按虹膜分割/中心回退: {e}")
+        _detector = None
+
+
+def asset_prefixes(sources) -> dict:
+    """
+    每张图片的素材文件名前缀：默认为文件名（不含扩展名），
+    同名不同扩展名的图片（a.jpg / a.png）加上扩展名区分，仍重名时再加序号
+
+    Returns:
+        {图片路径: 前缀}
+    """
+    counts = {}
+    for source in sources:
+        stem = Path(source).stem
+        counts[stem] = counts.get(stem, 0) + 1
+
+    prefixes, used = {}, set()
+    for source in sources:
+        path = Path(source)
+        prefix = path.stem if counts[path.stem] == 1 else f"{path.stem}_{path.suffix.lstrip('.').lower()}"
+        base, index = prefix, 2
+        while prefix in used:
+            prefix = f"{base}_{index}"
+            index += 1
+        used.add(prefix)
+        prefixes[source] = prefix
+    return prefixes
+
+
+def _extract_one(source: str, output_dir: str, expand_ratio: float, prefix: Optional[str] = None) -> dict:
+    """
+    提取单张图片中的所有美瞳区域（出错时记录到 record["error"]，不中断整批）
+
+    Args:
+        prefix: 素材文件名前缀（默认为图片文件名，不含扩展名）
+
+    Returns:
+        清单记录 {"source", "fallback", "assets", "error"}
+    """
+    record = {"source": source, "fallback": False, "assets": [], "error": None}
+    try:
+        _extract_regions(record, source, output_dir, expand_ratio, prefix or Path(source).stem)
+    except Exception as e:
+        record["error"] = f"处理失败: {e}"
+    return record
+
+
+def _extract_regions(record: dict, source: str, output_dir: str, expand_ratio: float, prefix: str):
+    """_extract_one 的主体：检测、裁剪、去反光并保存每个区域，结果写入 record"""
+    # 使用numpy读写，支持中文路径
+    image = cv2.imdecode(np.fromfile(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        record["error"] = "无法读取图片"
+        return
+
+    if _detector is None:
+        region, fallback = fallback_lens_region(image, expand_ratio)
+        regions = [region]
+    else:
+        regions, fallback = locate_lens_regions(image, _detector, expand_ratio)
+    record["fallback"] = fallback
+
+    for label, (cx, cy), radius, visible_mask in regions:
+        lens, highlight = clean_lens_texture(crop_lens(image, cx, cy, radius, visible_mask))
+        asset = Path(output_dir) / f"{prefix}_{label}.png"
+        if not save_lens_asset(str(asset), lens, highlight):
+            record["error"] = f"编码失败: {asset.name}"
+            continue
+        record["assets"].append({
+            "file": asset.name,
+            "highlight": Path(highlight_path(str(asset))).name,
+            "label": label,
+            "center": [int(cx), int(cy)],
+            "radius": int(radius),
+        })
+
+
+def extract_lenses(
+    input_dir: str,
+    output_dir: str,
+    workers: Optional[int] = None,
+    max_faces: int = 4,
+    expand_ratio: float = 1.2
+) -> dict:
+    """
+    批量提取目录下所有试戴图的美瞳素材
+
+    Args:
+        input_dir: 试戴图目录
+        output_dir: 素材输出目录（同时写入 manifest.json）
+        workers: 工作进程数（默认CPU核数；1 表示在当前进程内顺序处理）
+        max_faces: 每张图最多检测的人脸数
+        expand_ratio: 提取范围扩展比例
+
+    Returns:
+        清单 {"images", "assets", "review", "records"}
+    """
+    global _detector
+    sources = sorted(
+        str(p) for p in Path(input_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    prefixes = asset_prefixes(sources)
+
+    print("=" * 60)
+    print(f"  批量提取美瞳: {len(sources)} 张图片, {workers} 个进程")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(max_faces)
+        try:
+            records = [_extract_one(s, str(output_dir), expand_ratio, prefixes[s]) for s in sources]
+        finally:
+            # 当前进程内创建的检测器用完即关闭
+            if _detector is not None:
+                _detector.close()
+                _detector = None
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(max_faces,)
+        ) as pool:
+            records = list(pool.map(
+                _extract_one, sources,
+                [str(output_dir)] * len(sources), [expand_ratio] * len(sources),
+                [prefixes[s] for s in sources],
+                chunksize=max(1, len(sources) // (workers * 4))
+            ))
+
+    for record in records:
+        name = Path(record["source"]).name
+        if record["error"]:
+            print(f"  [FAIL] {name}: {record['error']}")
+        elif record["fallback"]:
+            print(f"  [REVIEW] {name}: 未检测到眼睛，按图像中心提取")
+        elif any(a["label"] == "iris" for a in record["assets"]):
+            print(f"  [OK] {name}: 虹膜分割 {len(record['assets'])} 个素材")
+        else:
+            print(f"  [OK] {name}: {len(record['assets'])} 个素材")
+
+    manifest = {
+        "images": len(sources),
+        "assets": sum(len(r["assets"]) for r in records),
+        "review": [r["source"] for r in records if r["fallback"] or r["error"]],
+        "records": records,
+    }
+    with open(output_dir / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"\n完成: {manifest['assets']} 个素材, 耗时 {time.perf_counter() - start:.1f}s")
+    print(f"清单: {output_dir / 'manifest.json'}")
+    if manifest["review"]:
+        print(f"需人工复核 {len(manifest['review'])} 张:")
+        for source in manifest["review"]:
+            print(f"  {source}")
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="批量提取美瞳素材 - 从试戴图目录提取每只眼睛的美瞳纹理",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python extract_lenses.py supplier_photos/ lenses/
+  python extract_lenses.py supplier_photos/ lenses/ --workers 8 --max-faces 2
+        """
+    )
+    parser.add_argument("input_dir", help="试戴图目录")
+    parser.add_argument("output_dir", help="素材输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数 (默认: CPU核数)")
+    parser.add_argument("--max-faces", type=int, default=4, help="每张图最多检测的人脸数 (默认: 4)")
+    parser.add_argument("--expand", type=float, default=1.2, help="提取范围扩展比例 (默认: 1.2)")
+    args = parser.parse_args()
+
+    extract_lenses(args.input_dir, args.output_dir, args.workers, args.max_faces, args.expand)
+
+
+if __name__ == "__main__":
+    main()
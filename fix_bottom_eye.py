@@ -4,42 +4,7 @@
 
 import cv2
 import numpy as np
-
-# 粉珊棕颜色
-CORAL_BROWN = (130, 155, 185)
-
-
-def apply_color_to_region(image, center, radius, target_color, intensity=0.5, feather=15):
-    """对指定区域应用颜色"""
-    result = image.copy()
-    h, w = image.shape[:2]
-    cx, cy = center
-    
-    y_coords, x_coords = np.ogrid[:h, :w]
-    dist = np.sqrt((x_coords - cx)**2 + (y_coords - cy)**2)
-    
-    inner_radius = radius - feather
-    outer_radius = radius + feather
-    
-    mask = np.zeros((h, w), dtype=np.float32)
-    mask[dist < inner_radius] = 1.0
-    transition = (dist >= inner_radius) & (dist < outer_radius)
-    if np.any(transition):
-        mask[transition] = 1.0 - (dist[transition] - inner_radius) / (outer_radius - inner_radius)
-    mask = mask * intensity
-    
-    lab_original = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.float32)
-    
-    target_bgr = np.zeros((1, 1, 3), dtype=np.uint8)
-    target_bgr[0, 0] = target_color
-    lab_target = cv2.cvtColor(target_bgr, cv2.COLOR_BGR2LAB).astype(np.float32)[0, 0]
-    
-    lab_result = lab_original.copy()
-    lab_result[:, :, 1] = lab_original[:, :, 1] * (1 - mask) + lab_target[1] * mask
-    lab_result[:, :, 2] = lab_original[:, :, 2] * (1 - mask) + lab_target[2] * mask
-    
-    result = cv2.cvtColor(np.clip(lab_result, 0, 255).astype(np.uint8), cv2.COLOR_LAB2BGR)
-    return result
+from recolor import CORAL_BROWN, EyeSpec, recolor_eyes
 
 
 if __name__ == "__main__":
@@ -67,14 +32,13 @@ if __name__ == "__main__":
     print(f'Processing eye at ({eye_center_x}, {eye_center_y}) with radius {eye_radius}')
     
     # 应用颜色 - 强度提高到0.75
-    result = apply_color_to_region(
-        img,
+    result = recolor_eyes(img, [EyeSpec(
         (eye_center_x, eye_center_y),
         eye_radius,
         CORAL_BROWN,
         intensity=0.75,  # 更强的颜色覆盖
         feather=10
-    )
+    )])
     
     # 保存结果
     cv2.imwrite('output/result_final.jpg', result)
@@ -3,34 +3,7 @@
 """
 import cv2
 import numpy as np
-
-CORAL_BROWN = (130, 155, 185)
-
-def apply_color(image, cx, cy, radius, color, intensity, feather):
-    result = image.copy()
-    h, w = image.shape[:2]
-    
-    y, x = np.ogrid[:h, :w]
-    dist = np.sqrt((x - cx)**2 + (y - cy)**2)
-    
-    mask = np.zeros((h, w), dtype=np.float32)
-    inner = radius - feather
-    outer = radius + feather
-    
-    mask[dist < inner] = 1.0
-    trans = (dist >= inner) & (dist < outer)
-    mask[trans] = 1.0 - (dist[trans] - inner) / (outer - inner)
-    mask *= intensity
-    
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.float32)
-    target = np.zeros((1,1,3), dtype=np.uint8)
-    target[0,0] = color
-    lab_t = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype(np.float32)[0,0]
-    
-    lab[:,:,1] = lab[:,:,1] * (1 - mask) + lab_t[1] * mask
-    lab[:,:,2] = lab[:,:,2] * (1 - mask) + lab_t[2] * mask
-    
-    return cv2.cvtColor(np.clip(lab, 0, 255).astype(np.uint8), cv2.COLOR_LAB2BGR)
+from recolor import CORAL_BROWN, EyeSpec, recolor_eyes
 
 # 加载之前处理好的图片（已经处理了模特双眼）
 img = cv2.imread('output/result_coral_brown.jpg')
@@ -45,7 +18,7 @@ EYE_RADIUS = 32
 print(f'Processing corner eye at ({EYE_CX}, {EYE_CY}), r={EYE_RADIUS}')
 
 # 应用颜色，高强度
-result = apply_color(img, EYE_CX, EYE_CY, EYE_RADIUS, CORAL_BROWN, 0.8, 8)
+result = recolor_eyes(img, [EyeSpec((EYE_CX, EYE_CY), EYE_RADIUS, CORAL_BROWN, 0.8, 8)])
 
 cv2.imwrite('output/result_final.jpg', result)
 print('Saved: output/result_final.jpg')
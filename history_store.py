@@ -0,0 +1,278 @@
+"""
+圈选历史记录存储（SQLite）
+每条记录一行，圈选点打包成 int16 二进制；增删改都是单条事务，
+列表只读取名称/时间/图片路径，圈选点在选中记录时才按主键读取
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from regions import SIMPLIFY_TOLERANCE, arc_points, fit_arc, simplify_polyline
+
+
+# 每类历史记录默认保留的条数（None 为不限）
+DEFAULT_LIMIT = 20
+
+# 数据库结构版本（PRAGMA user_version）
+# 1: 初始结构；2: 增加 circles 列，圆形模式的圆弧按参数存储
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind     TEXT NOT NULL,           -- 'lens' 眼部图 / 'target' 模特图
+    name     TEXT NOT NULL,
+    img_path TEXT NOT NULL DEFAULT '',
+    time     TEXT NOT NULL,
+    points   BLOB NOT NULL,           -- int16 小端 (x, y) 序列
+    regions  BLOB,                    -- int32 各区域点数；NULL 表示单个区域的扁平点列
+    circles  BLOB                     -- float32 (区域序号, cx, cy, 半径, 豁口角度)，这些区域点数为0
+);
+CREATE INDEX IF NOT EXISTS idx_history_kind ON history(kind, id);
+CREATE INDEX IF NOT EXISTS idx_history_name ON history(kind, name);
+CREATE INDEX IF NOT EXISTS idx_history_img ON history(img_path);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _encode_region(region, tolerance):
+    """单个区域 -> (点列, 圆弧参数或None)"""
+    arc = fit_arc(region)
+    if arc is not None:
+        return [], arc
+    return simplify_polyline(region, tolerance), None
+
+
+def pack_points(points, tolerance: float = SIMPLIFY_TOLERANCE):
+    """
+    圈选点 -> (points blob, regions blob, circles blob)
+
+    圆形模式的圆弧只存参数，其余折线按 tolerance 做 Douglas-Peucker 简化
+
+    Args:
+        points: [[x, y], ...]（眼部图）或 [[[x, y], ...], ...]（模特图，多个区域）
+        tolerance: 折线简化容差（像素）
+    """
+    # 扁平点列的元素是 [x, y]；多区域的元素是点列（可能为空）
+    nested = bool(points) and (len(points[0]) == 0 or isinstance(points[0][0], (list, tuple)))
+    encoded = [_encode_region(region, tolerance) for region in (points if nested else [points])]
+
+    flat = [p for region, _ in encoded for p in region]
+    data = np.array(flat, dtype=np.int64).reshape(-1, 2)
+    data = np.clip(data, -32768, 32767).astype('<i2')
+
+    regions = None
+    if nested:
+        regions = np.array([len(region) for region, _ in encoded], dtype='<i4').tobytes()
+    circles = [(i, *arc) for i, (_, arc) in enumerate(encoded) if arc is not None]
+    circles = np.array(circles, dtype='<f4').tobytes() if circles else None
+    return data.tobytes(), regions, circles
+
+
+def unpack_points(points_blob, regions_blob, circles_blob=None):
+    """pack_points 的逆过程，返回 JSON 同格式的嵌套列表（圆弧还原成点列）"""
+    flat = np.frombuffer(points_blob, dtype='<i2').reshape(-1, 2).tolist()
+    lengths = [len(flat)] if regions_blob is None else np.frombuffer(regions_blob, dtype='<i4').tolist()
+    out, start = [], 0
+    for n in lengths:
+        out.append(flat[start:start + n])
+        start += n
+    if circles_blob is not None:
+        for index, cx, cy, radius, gap in np.frombuffer(circles_blob, dtype='<f4').reshape(-1, 5).tolist():
+            out[int(index)] = arc_points((cx, cy), radius, gap)
+    return out[0] if regions_blob is None else out
+
+
+def _synchronized(method):
+    """同一连接上的操作串行执行（启动时历史记录在后台线程加载）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class HistoryStore:
+    """眼部图/模特图圈选历史（两类记录共用一个数据库，可跨线程使用）"""
+
+    def __init__(self, db_path: str, limit: Optional[int] = DEFAULT_LIMIT):
+        """
+        Args:
+            db_path: 数据库文件路径
+            limit: 每类记录保留的最大条数，超出时删除最旧的（None 为不限）
+        """
+        self.db_path = db_path
+        self.limit = limit
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            if 0 < version < 2:
+                self.conn.execute("ALTER TABLE history ADD COLUMN circles BLOB")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @_synchronized
+    def close(self):
+        self.conn.close()
+
+    @_synchronized
+    def records(self, kind: str) -> List[dict]:
+        """
+        列出一类记录（最新在前），不含圈选点
+
+        Returns:
+            [{'id', 'name', 'img_path', 'time'}, ...]
+        """
+        rows = self.conn.execute(
+            "SELECT id, name, img_path, time FROM history WHERE kind = ? ORDER BY id DESC",
+            (kind,)
+        ).fetchall()
+        return [{'id': r[0], 'name': r[1], 'img_path': r[2], 'time': r[3]} for r in rows]
+
+    @_synchronized
+    def get_points(self, record_id: int):
+        """按主键读取一条记录的圈选点，记录不存在时返回None"""
+        row = self.conn.execute(
+            "SELECT points, regions, circles FROM history WHERE id = ?", (record_id,)
+        ).fetchone()
+        return unpack_points(*row) if row else None
+
+    @_synchronized
+    def has_name(self, kind: str, name: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM history WHERE kind = ? AND name = ? LIMIT 1", (kind, name)
+        ).fetchone() is not None
+
+    def _insert(self, kind, name, points, img_path, time, record_id=None):
+        blob, regions, circles = pack_points(points)
+        cur = self.conn.execute(
+            "INSERT INTO history (id, kind, name, img_path, time, points, regions, circles) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (record_id, kind, name, img_path or "", time, blob, regions, circles)
+        )
+        return cur.lastrowid
+
+    def _trim(self, kind):
+        """删除超出条数上限的最旧记录"""
+        if self.limit is None:
+            return
+        self.conn.execute(
+            "DELETE FROM history WHERE kind = ? AND id NOT IN "
+            "(SELECT id FROM history WHERE kind = ? ORDER BY id DESC LIMIT ?)",
+            (kind, kind, self.limit)
+        )
+
+    @_synchronized
+    def add(self, kind: str, name: str, points, img_path: str = "", time: str = None) -> dict:
+        """
+        添加一条记录（成为最新一条），并按上限删除最旧的记录
+
+        Returns:
+            新记录 {'id', 'name', 'img_path', 'time'}
+        """
+        time = time or datetime.now().strftime('%Y-%m-%d %H:%M')
+        with self.conn:
+            record_id = self._insert(kind, name, points, img_path, time)
+            self._trim(kind)
+        return {'id': record_id, 'name': name, 'img_path': img_path or "", 'time': time}
+
+    @_synchronized
+    def delete(self, record_id: int):
+        with self.conn:
+            self.conn.execute("DELETE FROM history WHERE id = ?", (record_id,))
+
+    @_synchronized
+    def set_img_path(self, record_id: int, img_path: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE history SET img_path = ? WHERE id = ?", (img_path, record_id)
+            )
+
+    @_synchronized
+    def replace_img_path(self, old_path: str, new_path: str) -> int:
+        """把引用 old_path 的所有记录改为 new_path，返回修改条数"""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE history SET img_path = ? WHERE img_path = ?", (new_path, old_path)
+            ).rowcount
+
+    @_synchronized
+    def referenced_paths(self, kind: str) -> List[str]:
+        """一类记录引用的所有图片路径（去重，不含空路径）"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT img_path FROM history WHERE kind = ? AND img_path != ''", (kind,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    @_synchronized
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @_synchronized
+    def set_meta(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    @_synchronized
+    def import_records(self, kind: str, records: list, skip_existing: bool = True) -> int:
+        """
+        批量导入 JSON 格式的记录（列表最新在前），排在已有记录之后，单个事务
+
+        Args:
+            skip_existing: 跳过同名记录（合并旧历史时用）
+
+        Returns:
+            导入条数
+        """
+        count = 0
+        with self.conn:
+            # 主键按列表顺序从现有最小主键往下排，导入的记录都比已有记录旧
+            next_id = self.conn.execute("SELECT MIN(id) FROM history").fetchone()[0]
+            next_id = 1 if next_id is None else next_id
+            for record in records:
+                name = record.get('name', '')
+                if skip_existing and self.has_name(kind, name):
+                    continue
+                next_id -= 1
+                self._insert(kind, name, record.get('points', []),
+                             record.get('img_path', ''), record.get('time', ''), next_id)
+                count += 1
+            self._trim(kind)
+        return count
+
+    @_synchronized
+    def import_json(self, kind: str, json_path: str) -> int:
+        """
+        一次性导入旧的 history.json（导入过的文件不再重复导入，原文件保留）
+
+        Returns:
+            导入条数
+        """
+        key = f"imported:{kind}"
+        if not os.path.exists(json_path) or self.get_meta(key) is not None:
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] 无法读取 {json_path}: {e}")
+            return 0
+        count = self.import_records(kind, records, skip_existing=False)
+        self.set_meta(key, json_path)
+        print(f"[INFO] 已导入 {count} 条历史记录: {json_path}")
+        return count
@@ -0,0 +1,405 @@
+"""
+历史图片缓存
+- 缓存目录中的原图按内容哈希命名（<哈希>.<扩展名>），同一张图只存一份，
+  由历史记录引用，没有记录引用时回收
+- ThumbnailCache: 列表用的小尺寸 WebP 缩略图，按原图路径+修改时间命名，生成一次后复用
+- ImageLRU: 解码后的原图按字节数上限做 LRU，重复选中/处理同一张图不再重新解码
+- ArrayCache: 提取的纹理和羽化蒙版按圈选点哈希缓存（内存+磁盘），历史记录重复处理时不再计算
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# 缩略图边长上限（像素）
+THUMB_SIZE = 40
+
+# 缩略图 WebP 质量
+THUMB_QUALITY = 80
+
+# 解码原图缓存的字节数上限
+IMAGE_CACHE_BYTES = 256 * 1024 * 1024
+
+# 内容寻址文件名使用的哈希长度（十六进制位数）
+DIGEST_LENGTH = 20
+
+# 纹理/蒙版缓存：内存和磁盘的字节数上限
+ARRAY_MEMORY_BYTES = 64 * 1024 * 1024
+ARRAY_DISK_BYTES = 256 * 1024 * 1024
+
+# 缓存目录中视为图片的扩展名
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+_CONTENT_NAME = re.compile(r'^[0-9a-f]{%d}\.[a-z]+$' % DIGEST_LENGTH)
+
+# 旧版缓存文件名：<记录名>_<年月日>_<时分秒>[_<微秒>].<扩展名>
+_LEGACY_NAME = re.compile(r'^(.*)_\d{8}_\d{6}(?:_\d{6})?\.\w+$')
+
+
+def read_image_file(path: str, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    """读取图片（支持中文路径），失败返回None"""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    return cv2.imdecode(data, flags) if data.size else None
+
+
+def file_digest(path: str) -> str:
+    """文件内容的 SHA-256（十六进制，截取 DIGEST_LENGTH 位）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:DIGEST_LENGTH]
+
+
+def content_name(digest: str, src_path: str) -> str:
+    """内容寻址文件名：<哈希><原扩展名（小写）>"""
+    return digest + os.path.splitext(src_path)[1].lower()
+
+
+def is_content_name(filename: str) -> bool:
+    """是否为 store_image 生成的内容寻址文件名（只有这类文件会被回收）"""
+    return _CONTENT_NAME.match(filename) is not None
+
+
+def image_identity(path: str) -> Optional[str]:
+    """
+    图片的标识（用于缓存键）：缓存中的内容寻址图片用文件名中的哈希，
+    其他图片用 路径+大小+修改时间；文件不存在时返回None
+    """
+    if not path:
+        return None
+    if is_content_name(os.path.basename(path)):
+        return os.path.splitext(os.path.basename(path))[0]
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def array_key(points, *params) -> str:
+    """圈选点（及影响结果的参数）的哈希，作为纹理/蒙版的缓存键"""
+    h = hashlib.sha1(np.asarray(points, dtype=np.int32).tobytes())
+    h.update(repr(params).encode('utf-8'))
+    return h.hexdigest()[:DIGEST_LENGTH]
+
+
+def normalize_rel_path(path: str) -> str:
+    """统一路径分隔符，用于比较历史记录中（可能来自其他系统）的相对路径"""
+    return os.path.normpath(path.replace('\\', '/')) if path else ""
+
+
+def store_image(src_path: str, cache_dir: str) -> str:
+    """
+    把图片以内容哈希命名存入缓存目录；相同内容已存在时直接复用
+
+    Returns:
+        缓存中的文件路径
+    """
+    # 从历史记录载入的图片本身就在缓存中，文件名即哈希，不必重新计算
+    if (is_content_name(os.path.basename(src_path))
+            and os.path.dirname(os.path.abspath(src_path)) == os.path.abspath(cache_dir)):
+        return src_path
+    dest = os.path.join(cache_dir, content_name(file_digest(src_path), src_path))
+    if os.path.exists(dest):
+        return dest
+    os.makedirs(cache_dir, exist_ok=True)
+    # 先复制到临时文件再改名，中断时不会留下不完整的内容寻址文件
+    tmp = dest + '.tmp'
+    shutil.copy2(src_path, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def legacy_image_index(cache_dir: str) -> Dict[str, str]:
+    """
+    扫描一次缓存目录，建立 记录名 -> 旧版缓存图片路径 的索引
+    （用于修复指向已不存在的绝对路径的旧记录，代替逐条记录遍历目录）
+
+    同名有多张时取文件名排序的第一张
+    """
+    index = {}
+    if not os.path.isdir(cache_dir):
+        return index
+    for filename in sorted(os.listdir(cache_dir)):
+        match = _LEGACY_NAME.match(filename)
+        if match and filename.lower().endswith(IMAGE_EXTS):
+            index.setdefault(match.group(1), os.path.join(cache_dir, filename))
+    return index
+
+
+def collect_garbage(cache_dir: str, referenced: Iterable[str]) -> List[str]:
+    """
+    删除缓存目录中没有被引用的内容寻址图片（旧命名的文件不处理）
+
+    Args:
+        cache_dir: 缓存目录
+        referenced: 被历史记录引用的文件绝对路径
+
+    Returns:
+        已删除的文件路径
+    """
+    keep = {os.path.normcase(os.path.abspath(p)) for p in referenced}
+    removed = []
+    if not os.path.isdir(cache_dir):
+        return removed
+    for filename in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, filename)
+        if not is_content_name(filename) or os.path.normcase(os.path.abspath(path)) in keep:
+            continue
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            print(f"[WARN] 无法删除 {path}: {e}")
+    return removed
+
+
+def dedup_cache_dir(cache_dir: str, referenced: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    一次性整理旧的缓存目录：按内容分组，重复的只保留一份
+
+    被引用的图片改名为内容寻址文件名（之后由引用计数管理）；
+    没有被引用的旧文件保留原名的一份，其余相同内容的副本删除
+
+    Args:
+        cache_dir: 缓存目录
+        referenced: 被历史记录引用的文件绝对路径
+
+    Returns:
+        (旧路径 -> 新路径 的改名表, 已删除的文件路径)
+    """
+    keep = {os.path.normcase(os.path.abspath(p)) for p in referenced}
+    groups = {}
+    for filename in sorted(os.listdir(cache_dir)):
+        path = os.path.join(cache_dir, filename)
+        if os.path.isfile(path) and filename.lower().endswith(IMAGE_EXTS):
+            groups.setdefault(file_digest(path), []).append(path)
+
+    renamed, removed = {}, []
+    for digest, paths in groups.items():
+        used = [p for p in paths if os.path.normcase(os.path.abspath(p)) in keep]
+        if used:
+            target = os.path.join(cache_dir, content_name(digest, used[0]))
+            if not os.path.exists(target):
+                os.replace(used[0], target)
+            survivors = {os.path.abspath(target)}
+            for p in used:
+                if os.path.abspath(p) != os.path.abspath(target):
+                    renamed[p] = target
+        else:
+            survivors = {os.path.abspath(paths[0])}
+        for p in paths:
+            if os.path.abspath(p) not in survivors and os.path.exists(p):
+                os.remove(p)
+                removed.append(p)
+    return renamed, removed
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存"""
+
+    def __init__(self, thumb_dir: str, size: int = THUMB_SIZE):
+        """
+        Args:
+            thumb_dir: 缩略图目录
+            size: 缩略图边长上限
+        """
+        self.thumb_dir = thumb_dir
+        self.size = size
+        os.makedirs(thumb_dir, exist_ok=True)
+
+    def thumb_path(self, img_path: str) -> Optional[str]:
+        """原图对应的缩略图路径（原图改动后路径随之变化），原图不存在时返回None"""
+        try:
+            st = os.stat(img_path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(img_path)}|{st.st_size}|{st.st_mtime_ns}|{self.size}"
+        return os.path.join(self.thumb_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '.webp')
+
+    def load(self, img_path: str) -> Optional[np.ndarray]:
+        """读取已生成的缩略图（BGR），没有时返回None"""
+        path = self.thumb_path(img_path)
+        if path is None or not os.path.exists(path):
+            return None
+        return read_image_file(path)
+
+    def get(self, img_path: str) -> Optional[np.ndarray]:
+        """
+        读取缩略图，没有时从原图生成并写入磁盘（较慢，应在后台线程调用）
+
+        Returns:
+            BGR缩略图，原图无法读取时返回None
+        """
+        thumb = self.load(img_path)
+        if thumb is not None:
+            return thumb
+        path = self.thumb_path(img_path)
+        if path is None:
+            return None
+
+        # JPEG 可直接按 1/4 解码；PNG 仍需完整解码
+        img = read_image_file(img_path, cv2.IMREAD_REDUCED_COLOR_4)
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        scale = self.size / max(h, w)
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                             interpolation=cv2.INTER_AREA)
+
+        ok, data = cv2.imencode('.webp', img, [cv2.IMWRITE_WEBP_QUALITY, THUMB_QUALITY])
+        if ok:
+            # 先写临时文件再改名，后台线程写到一半时不会被读到
+            tmp = path + '.tmp'
+            data.tofile(tmp)
+            os.replace(tmp, path)
+        return img
+
+
+class ImageLRU:
+    """解码后原图的 LRU 缓存（线程安全），同一路径返回同一个数组，调用方不应修改"""
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # 路径 -> (修改时间, 图片)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[np.ndarray]:
+        """
+        读取图片（命中缓存时不解码）
+
+        Returns:
+            BGR图片，无法读取时返回None
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] == mtime:
+                self._items.move_to_end(key)
+                return item[1]
+
+        img = read_image_file(path)
+        if img is None:
+            return None
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].nbytes
+            self._items[key] = (mtime, img)
+            self._bytes += img.nbytes
+            # 至少保留刚读入的这一张
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return img
+
+
+class ArrayCache:
+    """
+    数组缓存（线程安全）：内存 LRU + 磁盘 .npy 文件（按最近使用时间淘汰）
+
+    键应包含决定结果的全部输入（见 array_key），同一个键的结果不会改变，
+    缓存的数组调用方不应修改
+    """
+
+    def __init__(self, cache_dir: str, memory_bytes: int = ARRAY_MEMORY_BYTES,
+                 disk_bytes: int = ARRAY_DISK_BYTES):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录
+            memory_bytes: 内存中保留的字节数上限
+            disk_bytes: 磁盘缓存的字节数上限
+        """
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._items = OrderedDict()  # 键 -> 数组
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def _remember(self, key: str, array: np.ndarray):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = array
+            self._bytes += array.nbytes
+            while self._bytes > self.memory_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get(self, key: Optional[str], compute) -> np.ndarray:
+        """
+        读取缓存，没有时调用 compute() 计算并写入缓存
+
+        Args:
+            key: 缓存键（None 表示不缓存，直接计算）
+            compute: 无参函数，返回要缓存的数组
+        """
+        if key is None:
+            return compute()
+        with self._lock:
+            array = self._items.get(key)
+            if array is not None:
+                self._items.move_to_end(key)
+                return array
+
+        path = self._path(key)
+        try:
+            array = np.load(path)
+            os.utime(path)  # 记录最近使用时间
+        except (OSError, ValueError):
+            array = compute()
+            # 先写临时文件再改名，并发读取时不会读到写了一半的文件
+            tmp = path + '.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp, path)
+                self._prune()
+            except OSError as e:
+                print(f"[WARN] 无法写入缓存 {path}: {e}")
+        self._remember(key, array)
+        return array
+
+    def _prune(self):
+        """磁盘缓存超出上限时删除最久未使用的文件"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.npy'):
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
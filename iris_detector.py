@@ -46,17 +46,18 @@ class IrisDetector:
     LEFT_EYE_CONTOUR = [33, 133, 160, 159, 158, 144, 145, 153]
     RIGHT_EYE_CONTOUR = [362, 263, 387, 386, 385, 373, 374, 380]
     
-    def __init__(self, static_image_mode: bool = True):
+    def __init__(self, static_image_mode: bool = True, max_num_faces: int = 1):
         """
         初始化检测器
         
         Args:
             static_image_mode: True用于处理静态图片，False用于视频流
+            max_num_faces: 最多检测的人脸数（detect_all 使用）
         """
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=static_image_mode,
-            max_num_faces=1,
+            max_num_faces=max_num_faces,
             refine_landmarks=True,  # 启用虹膜关键点 (478个点)
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
@@ -74,32 +75,54 @@ class IrisDetector:
         """
         h, w = image.shape[:2]
         
+        results = self.detect_all(image)
+        if not results:
+            return EyeDetectionResult(None, None, False, (w, h))
+        
+        return results[0]
+    
+    def detect_all(self, image: np.ndarray) -> List[EyeDetectionResult]:
+        """
+        检测图像中所有人脸（最多 max_num_faces 张）的眼球关键点
+        
+        Args:
+            image: BGR格式的OpenCV图像
+            
+        Returns:
+            每张人脸一个 EyeDetectionResult，未检测到人脸时为空列表
+        """
+        h, w = image.shape[:2]
+        
         # 转换为RGB (MediaPipe要求)
         rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         results = self.face_mesh.process(rgb_image)
         
         if not results.multi_face_landmarks:
-            return EyeDetectionResult(None, None, False, (w, h))
-        
-        landmarks = results.multi_face_landmarks[0].landmark
-        
-        # 提取左眼数据
-        left_eye = self._extract_eye_data(
-            landmarks, w, h,
-            self.LEFT_IRIS_CENTER,
-            self.LEFT_IRIS_POINTS,
-            is_left=True
-        )
+            return []
         
-        # 提取右眼数据
-        right_eye = self._extract_eye_data(
-            landmarks, w, h,
-            self.RIGHT_IRIS_CENTER,
-            self.RIGHT_IRIS_POINTS,
-            is_left=False
-        )
+        faces = []
+        for face_landmarks in results.multi_face_landmarks:
+            landmarks = face_landmarks.landmark
+            
+            # 提取左眼数据
+            left_eye = self._extract_eye_data(
+                landmarks, w, h,
+                self.LEFT_IRIS_CENTER,
+                self.LEFT_IRIS_POINTS,
+                is_left=True
+            )
+            
+            # 提取右眼数据
+            right_eye = self._extract_eye_data(
+                landmarks, w, h,
+                self.RIGHT_IRIS_CENTER,
+                self.RIGHT_IRIS_POINTS,
+                is_left=False
+            )
+            
+            faces.append(EyeDetectionResult(left_eye, right_eye, True, (w, h)))
         
-        return EyeDetectionResult(left_eye, right_eye, True, (w, h))
+        return faces
     
     def _extract_eye_data(
         self, 
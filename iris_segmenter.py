@@ -0,0 +1,180 @@
+"""
+经典方法虹膜/角膜缘分割
+用于眼睛特写图（FaceMesh检测不到人脸时）：降采样图上做Hough圆检测，
+再在原图上沿径向射线搜索边缘精修圆心和半径，并估计眼睑遮挡
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class IrisSegmentation:
+    """虹膜分割结果（坐标均为原图像素）"""
+    center: Tuple[int, int]        # 虹膜中心 (x, y)
+    iris_radius: float             # 角膜缘（虹膜外圈）半径
+    pupil_radius: Optional[float]  # 瞳孔半径，边缘不明显时为None
+    visible_mask: np.ndarray       # 与原图同尺寸 uint8，255 为未被眼睑遮挡的虹膜区域
+    confidence: float              # 与拟合圆一致的射线占比 (0-1)
+
+
+def _radial_profiles(
+    gray: np.ndarray,
+    center: Tuple[float, float],
+    radii: np.ndarray,
+    angles: np.ndarray
+) -> np.ndarray:
+    """沿各角度射线采样灰度，返回 (角度数, 半径数) float32"""
+    cx, cy = center
+    cos_a = np.cos(angles).astype(np.float32)[:, np.newaxis]
+    sin_a = np.sin(angles).astype(np.float32)[:, np.newaxis]
+    radii = radii.astype(np.float32)[np.newaxis, :]
+    map_x = (cx + cos_a * radii).astype(np.float32)
+    map_y = (cy + sin_a * radii).astype(np.float32)
+    return cv2.remap(
+        gray, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    ).astype(np.float32)
+
+
+def _ring_contrast(gray: np.ndarray, circle: np.ndarray) -> float:
+    """圆周外侧与内侧的平均亮度差（虹膜比巩膜暗时为正）"""
+    cx, cy, r = circle
+    angles = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+    inside = _radial_profiles(gray, (cx, cy), np.linspace(0.75 * r, 0.95 * r, 4), angles)
+    outside = _radial_profiles(gray, (cx, cy), np.linspace(1.05 * r, 1.25 * r, 4), angles)
+    return float(np.median(outside.mean(axis=1) - inside.mean(axis=1)))
+
+
+def _fit_circle(points: np.ndarray) -> Optional[Tuple[float, float, float]]:
+    """代数最小二乘圆拟合，返回 (cx, cy, r)"""
+    if len(points) < 3:
+        return None
+    x, y = points[:, 0], points[:, 1]
+    a = np.column_stack([x, y, np.ones_like(x)])
+    b = x ** 2 + y ** 2
+    sol, *_ = np.linalg.lstsq(a, b, rcond=None)
+    cx, cy = sol[0] / 2, sol[1] / 2
+    r2 = sol[2] + cx ** 2 + cy ** 2
+    if r2 <= 0:
+        return None
+    return cx, cy, math.sqrt(r2)
+
+
+def segment_iris(
+    image: np.ndarray,
+    work_size: int = 240,
+    min_radius_ratio: float = 0.10,
+    max_radius_ratio: float = 0.48,
+    n_rays: int = 120,
+    min_contrast: float = 12.0,
+    min_confidence: float = 0.3
+) -> Optional[IrisSegmentation]:
+    """
+    分割眼睛特写图中的虹膜
+
+    Args:
+        image: BGR或灰度图像
+        work_size: Hough检测时短边缩放到的尺寸（精修在约2倍分辨率上进行）
+        min_radius_ratio, max_radius_ratio: 虹膜半径相对短边的搜索范围
+        n_rays: 精修时的径向射线数
+        min_contrast: 圆周内外最小亮度差，低于此视为没有虹膜
+        min_confidence: 低于此一致率视为分割失败
+
+    Returns:
+        IrisSegmentation，找不到可信的虹膜时返回None
+    """
+    h, w = image.shape[:2]
+
+    # 大图先隔行隔列抽样到短边约 2*work_size，后续全部在小图上计算
+    step = max(1, min(h, w) // (2 * work_size))
+    sub = np.ascontiguousarray(image[::step, ::step])
+    gray = sub if sub.ndim == 2 else cv2.cvtColor(sub, cv2.COLOR_BGR2GRAY)
+
+    # 1. 降采样图上做Hough圆检测（先去掉虹膜纹理），按圆周内外亮度差挑选候选
+    scale = min(1.0, work_size / min(gray.shape[:2]))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(cv2.medianBlur(small, 5), (0, 0), 2)
+    m = min(small.shape[:2])
+    circles = cv2.HoughCircles(
+        small, cv2.HOUGH_GRADIENT, dp=1, minDist=m * 0.1,
+        param1=40, param2=12,
+        minRadius=max(3, int(m * min_radius_ratio)), maxRadius=int(m * max_radius_ratio)
+    )
+    if circles is None:
+        return None
+    best = max(circles[0][:5], key=lambda c: _ring_contrast(small, c))
+    if _ring_contrast(small, best) < min_contrast:
+        return None
+    cx, cy, r = (float(v) / scale for v in best)
+
+    # 2. 沿射线搜索暗->亮的角膜缘边缘，稳健拟合圆
+    blurred = cv2.GaussianBlur(gray, (0, 0), max(1.0, r / 60))
+    angles = np.linspace(0, 2 * np.pi, n_rays, endpoint=False)
+    for _ in range(2):
+        radii = np.linspace(0.1 * r, 1.4 * r, max(32, int(1.3 * r)))
+        grad = np.gradient(_radial_profiles(blurred, (cx, cy), radii, angles), axis=1)
+
+        search = (radii >= 0.7 * r) & (radii <= 1.3 * r)
+        idx = np.argmax(np.where(search, grad, -np.inf), axis=1)
+        strength = grad[np.arange(n_rays), idx]
+        edge_r = radii[idx]
+
+        strong = strength >= 0.4 * np.percentile(strength, 75)
+        points = np.column_stack([cx + edge_r * np.cos(angles), cy + edge_r * np.sin(angles)])[strong]
+        fit = _fit_circle(points)
+        for _ in range(2):
+            if fit is None or len(points) < 8:
+                break
+            residual = np.abs(np.hypot(points[:, 0] - fit[0], points[:, 1] - fit[1]) - fit[2])
+            points = points[residual <= 2 * np.median(residual) + 1]
+            fit = _fit_circle(points)
+        if fit is None or len(points) < 8:
+            break
+        cx, cy, r = fit
+
+    # 3. 最终圆上重新采样：边缘与圆一致的射线视为可见，其余为眼睑遮挡
+    radii = np.linspace(0.1 * r, 1.4 * r, max(32, int(1.3 * r)))
+    grad = np.gradient(_radial_profiles(blurred, (cx, cy), radii, angles), axis=1)
+
+    tolerance = max(1.5, 0.08 * r)
+    near = np.abs(radii - r) <= tolerance
+    local = np.where(near, grad, -np.inf).max(axis=1)
+    # 一致性阈值同时参考典型边缘强度和整体梯度噪声
+    floor = 3 * np.median(np.abs(grad))
+    consistent = local >= max(0.4 * np.percentile(local, 75), floor)
+    confidence = float(consistent.mean())
+    if confidence < min_confidence or _ring_contrast(blurred, np.array([cx, cy, r])) < min_contrast:
+        return None
+
+    # 遮挡射线上，可见范围截止到圆内最强的亮度变化（眼睑边缘/睫毛）
+    inner = (radii >= 0.3 * r) & (radii < r - tolerance)
+    lid_idx = np.argmax(np.where(inner, np.abs(grad), -np.inf), axis=1)
+    visible_r = np.where(consistent, r, radii[lid_idx])
+    # 沿角度做环形中值滤波，去掉孤立的误判
+    padded = np.concatenate([visible_r[-2:], visible_r, visible_r[:2]])
+    visible_r = np.median(np.lib.stride_tricks.sliding_window_view(padded, 5), axis=1)
+
+    polygon = np.column_stack([cx + visible_r * np.cos(angles), cy + visible_r * np.sin(angles)])
+    visible_mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.fillPoly(visible_mask, [np.round(polygon * step).astype(np.int32)], 255)
+
+    # 瞳孔：圆内较小半径处暗->亮的边缘，取可见射线的中值
+    pupil_radius = None
+    rows = np.nonzero(consistent)[0]
+    if len(rows) >= 8:
+        pupil_zone = (radii >= 0.12 * r) & (radii <= 0.7 * r)
+        pupil_idx = np.argmax(np.where(pupil_zone, grad[rows], -np.inf), axis=1)
+        if np.median(grad[rows, pupil_idx]) >= max(0.3 * np.percentile(local, 75), floor):
+            pupil_radius = float(np.median(radii[pupil_idx])) * step
+
+    return IrisSegmentation(
+        center=(int(round(cx * step)), int(round(cy * step))),
+        iris_radius=float(r) * step,
+        pupil_radius=pupil_radius,
+        visible_mask=visible_mask,
+        confidence=confidence
+    )
@@ -5,31 +5,153 @@ import cv2
 import numpy as np
 import os
 import json
-import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 from datetime import datetime
 
+from history_store import DEFAULT_LIMIT, HistoryStore
+from image_cache import (THUMB_SIZE, ArrayCache, ImageLRU, ThumbnailCache, array_key,
+                         collect_garbage, dedup_cache_dir, image_identity, legacy_image_index,
+                         normalize_rel_path, store_image)
+from lens_texture import clean_lens_texture
+from regions import MIN_REGION_POINTS, arc_points, simplify_regions
+from render_worker import RenderWorker
+from viewport import ImagePyramid, LivePreview, Viewport
+
+
+# 历史数据迁移版本（记录在数据库 meta 表中，每一步只在首次启动时执行一次）
+# 1: 导入旧的 history.json；2: 缓存图片按内容去重
+DATA_VERSION = 2
+
+
+def region_mask(points, shape):
+    """
+    在区域的外接矩形内绘制蒙版（不绘制整幅图，超出图片的部分裁掉）
+    
+    Returns:
+        ((x, y, w, h) 外接矩形, 裁剪后的 uint8 蒙版)
+    """
+    pts = np.array(points, dtype=np.int32)
+    x, y, w, h = cv2.boundingRect(pts)
+    mask = np.zeros((max(0, min(h, shape[0] - y)), max(0, min(w, shape[1] - x))), dtype=np.uint8)
+    cv2.fillPoly(mask, [pts], 255, offset=(-x, -y))
+    return (x, y, w, h), mask
+
+
+def feather_mask(mask, feather):
+    """蒙版高斯羽化并归一化到 0-1（float32）"""
+    alpha = cv2.GaussianBlur(mask.astype(np.float32), (feather*2+1, feather*2+1), 0)
+    return alpha / alpha.max() if alpha.max() > 0 else alpha
+
+
+def extract_texture(source_img, source_points, feather=15):
+    """从源图圈选区域提取带羽化Alpha的纹理，并去除反光"""
+    (sx, sy, srw, srh), cropped_mask = region_mask(source_points, source_img.shape)
+    
+    # 提取纹理区域
+    cropped = source_img[sy:sy+srh, sx:sx+srw].copy()
+    
+    # 创建带羽化的alpha通道
+    alpha = feather_mask(cropped_mask, feather)
+    
+    # 创建带alpha的纹理，去掉反光
+    texture = np.dstack([cropped, (alpha * 255).astype(np.uint8)])
+    texture, _ = clean_lens_texture(texture)
+    return texture
+
+
+def target_alpha(target_region, shape, feather=15):
+    """模特图单个区域的羽化蒙版（外接矩形内，float32 0-1）"""
+    return feather_mask(region_mask(target_region, shape)[1], feather)
+
+
+def render_targets(texture, target_img, target_points, feather=15, report=None, alpha_cache=None):
+    """
+    把纹理贴到模特图的每个圈选区域
+    
+    Args:
+        texture: 带羽化Alpha的BGRA纹理
+        target_img: 模特图（不修改）
+        target_points: 模特图圈选区域列表
+        feather: 目标蒙版羽化半径
+        report: 进度回调 report(0-1)，每处理完一个区域调用一次（后台任务借此检查取消）
+        alpha_cache: 羽化蒙版缓存（ArrayCache），按区域圈选点哈希复用
+    
+    Returns:
+        结果图
+    """
+    result = target_img.copy()
+    th, tw = result.shape[:2]
+    
+    for i, target_region in enumerate(target_points):
+        if report is not None:
+            report(i / len(target_points))
+        if len(target_region) < MIN_REGION_POINTS:
+            continue
+        
+        tx, ty, trw, trh = cv2.boundingRect(np.array(target_region, dtype=np.int32))
+        
+        # 羽化目标蒙版（只与区域和图片尺寸有关，保存过的区域直接读缓存）
+        if alpha_cache is not None:
+            target_alpha_mask = alpha_cache.get(array_key(target_region, 'target', th, tw, feather),
+                                                lambda: target_alpha(target_region, (th, tw), feather))
+        else:
+            target_alpha_mask = target_alpha(target_region, (th, tw), feather)
+        
+        # 缩放纹理以匹配目标区域大小
+        scaled_texture = cv2.resize(texture, (trw, trh))
+        
+        # 混合
+        roi = result[ty:ty+trh, tx:tx+trw].astype(np.float32)
+        tex_bgr = scaled_texture[:,:,:3].astype(np.float32)
+        tex_alpha = scaled_texture[:,:,3:4].astype(np.float32) / 255.0
+        
+        # 合并源alpha和目标alpha
+        combined_alpha = tex_alpha[:,:,0] * target_alpha_mask
+        combined_alpha = combined_alpha[:,:,np.newaxis]
+        
+        # 混合
+        blended = tex_bgr * combined_alpha + roi * (1 - combined_alpha)
+        result[ty:ty+trh, tx:tx+trw] = np.clip(blended, 0, 255).astype(np.uint8)
+    
+    return result
+
+
 class LensApp:
-    def __init__(self):
+    def __init__(self, history_limit=DEFAULT_LIMIT, base_dir=None):
+        """
+        Args:
+            history_limit: 每类历史记录保留的最大条数（None 为不限）
+            base_dir: 数据目录（cache/ 所在目录），默认为程序所在目录
+        """
         self.root = tk.Tk()
         self.root.title("美瞳替换软件 v1.0")
         self.root.geometry("900x650")
         self.root.configure(bg='#2b2b2b')
         
         # 获取程序所在目录
-        self.base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
         
         # 数据
         self.source_path = None
         self.target_path = None
         self.source_img = None
         self.target_img = None
+        # 已提交、尚未完成的后台任务快照（其中的图片在任务结束前不能被回收）
+        self.pending_renders = []
         
         # 定位参数 - 画笔圈出的点
         self.source_points = []
         
+        # 已提取的纹理缓存：(源图, 圈选点, 去反光后的BGRA纹理)
+        self._texture_cache = None
+        # 纹理和模特图羽化蒙版的持久缓存（按图片+圈选点哈希，历史记录重复处理时不再计算）
+        self.mask_cache = ArrayCache(os.path.join(self.base_dir, 'cache', 'masks'))
+        
+        # 最近加载图片的金字塔 [(图片, ImagePyramid)]，眼部图和模特图各一张
+        self._pyramids = []
+        
         # 标记是否是新圈选的（用于在预览后询问保存）
         self.source_is_new = False
         self.target_is_new = False  # 眼部图圈出的区域
@@ -42,26 +164,46 @@ class LensApp:
         os.makedirs(self.lens_cache_dir, exist_ok=True)
         os.makedirs(self.target_cache_dir, exist_ok=True)
         
-        # 历史记录文件
+        # 历史记录数据库（旧版 history.json 只在首次启动时导入）
         self.history_file = os.path.join(self.lens_cache_dir, 'history.json')
         self.target_history_file = os.path.join(self.target_cache_dir, 'history.json')
-        
-        # 迁移旧的历史记录（只迁移一次）
-        self.migrate_old_history()
-        
-        # 加载历史记录
-        self.lens_history = self.load_history(self.history_file)
-        self.target_history = self.load_history(self.target_history_file)
-        
-        # 更新绝对路径为相对路径（在加载后执行）
-        self._update_history_paths()
+        self.history_db = HistoryStore(os.path.join(self.base_dir, 'cache', 'history.db'),
+                                       limit=history_limit)
+        
+        # 历史记录在窗口显示后由后台加载（首次启动时先执行数据迁移）
+        self.lens_history = []
+        self.target_history = []
+        self.history_loaded = False
+        # 旧版缓存目录的 记录名 -> 图片 索引（修复旧记录路径时才建立，每个目录只扫描一次）
+        self._legacy_images = {}
         self.selected_history = None  # 选中的眼部图历史记录
         self.selected_target_history = None  # 选中的模特图历史记录
         
+        # 解码后原图的LRU缓存；历史列表缩略图在后台生成，点击记录时不解码原图
+        self.image_cache = ImageLRU()
+        self.thumbnails = ThumbnailCache(os.path.join(self.base_dir, 'cache', 'thumbs'))
+        self.thumb_worker = RenderWorker(self.root)
+        self._thumb_photos = {}  # 原图路径 -> PhotoImage（需保持引用，否则Tk不显示）
+        
         self.setup_ui()
+        
+        # 后台生成结果：处理期间主窗口保持响应，可继续圈选下一张模特图排队
+        self.worker = RenderWorker(self.root, on_update=self.update_job_progress)
+        
+        # 缩略图任务排在历史记录加载之后，同一个后台线程依次执行
+        self.status.config(text="正在加载历史记录...")
+        self.thumb_worker.submit("history", lambda job: self.load_all_history(),
+                                 self.on_history_loaded)
     
     def setup_ui(self):
         """设置界面"""
+        # 历史列表：带缩略图的树形列表（深色）
+        style = ttk.Style(self.root)
+        style.configure('History.Treeview', background='#2b2b2b', fieldbackground='#2b2b2b',
+                        foreground='#ffffff', font=("Microsoft YaHei", 9),
+                        rowheight=THUMB_SIZE + 6, borderwidth=0)
+        style.map('History.Treeview', background=[('selected', '#4a90d9')])
+        
         # 标题
         title = tk.Label(self.root, text="美瞳替换软件", 
                         font=("Microsoft YaHei", 20, "bold"),
@@ -108,13 +250,11 @@ class LensApp:
         list1 = tk.Frame(right1, bg='#3c3c3c')
         list1.pack(fill='both', expand=True)
         
-        self.history_listbox = tk.Listbox(list1, 
-                                          font=("Microsoft YaHei", 9),
-                                          bg='#2b2b2b', fg='#ffffff',
-                                          selectbackground='#4a90d9',
-                                          height=5, width=28)
+        self.history_listbox = ttk.Treeview(list1, show='tree', selectmode='browse',
+                                            style='History.Treeview', height=3)
+        self.history_listbox.column('#0', width=220)
         self.history_listbox.pack(side='left', fill='both', expand=True)
-        self.history_listbox.bind('<<ListboxSelect>>', self.on_history_select)
+        self.history_listbox.bind('<<TreeviewSelect>>', self.on_history_select)
         
         sb1 = tk.Scrollbar(list1, command=self.history_listbox.yview)
         sb1.pack(side='right', fill='y')
@@ -166,13 +306,11 @@ class LensApp:
         list2 = tk.Frame(right2, bg='#3c3c3c')
         list2.pack(fill='both', expand=True)
         
-        self.target_history_listbox = tk.Listbox(list2, 
-                                                  font=("Microsoft YaHei", 9),
-                                                  bg='#2b2b2b', fg='#ffffff',
-                                                  selectbackground='#4a90d9',
-                                                  height=5, width=28)
+        self.target_history_listbox = ttk.Treeview(list2, show='tree', selectmode='browse',
+                                                   style='History.Treeview', height=3)
+        self.target_history_listbox.column('#0', width=220)
         self.target_history_listbox.pack(side='left', fill='both', expand=True)
-        self.target_history_listbox.bind('<<ListboxSelect>>', self.on_target_history_select)
+        self.target_history_listbox.bind('<<TreeviewSelect>>', self.on_target_history_select)
         
         sb2 = tk.Scrollbar(list2, command=self.target_history_listbox.yview)
         sb2.pack(side='right', fill='y')
@@ -196,19 +334,66 @@ class LensApp:
                                    state='disabled')
         self.btn_start.pack()
         
+        # 后台任务进度（有任务时显示）
+        self.job_frame = tk.Frame(btn_frame, bg='#2b2b2b')
+        self.job_progress = ttk.Progressbar(self.job_frame, length=220,
+                                            mode='determinate', maximum=100)
+        self.job_progress.pack(side='left', padx=5)
+        self.job_label = tk.Label(self.job_frame, text="",
+                                  font=("Microsoft YaHei", 9),
+                                  fg='#888888', bg='#2b2b2b')
+        self.job_label.pack(side='left', padx=5)
+        self.btn_cancel = tk.Button(self.job_frame, text="取消",
+                                    font=("Microsoft YaHei", 9),
+                                    command=self.cancel_job,
+                                    bg='#d9534f', fg='white', width=6)
+        self.btn_cancel.pack(side='left', padx=5)
+        
         # 状态栏
         self.status = tk.Label(self.root, text="请选择眼部图和模特图（或从历史记录选择）", 
                                font=("Microsoft YaHei", 10),
                                fg='#888888', bg='#2b2b2b')
         self.status.pack(side='bottom', pady=8)
     
+    def run_migrations(self):
+        """执行尚未完成的数据迁移步骤，每完成一步记录一次版本（中途退出时下次从该步继续）"""
+        steps = [self.migrate_old_history, self.dedup_image_cache]
+        version = int(self.history_db.get_meta('data_version') or 0)
+        for step_version, step in enumerate(steps[version:DATA_VERSION], start=version + 1):
+            step()
+            self.history_db.set_meta('data_version', str(step_version))
+            print(f"[INFO] 数据迁移完成: 版本 {step_version}")
+    
+    def load_all_history(self):
+        """后台线程：执行数据迁移并读取两类历史记录列表"""
+        try:
+            self.run_migrations()
+        except Exception as e:
+            print(f"[WARN] 数据迁移失败: {e}")
+        return self.load_history('lens'), self.load_history('target')
+    
+    def on_history_loaded(self, job):
+        """界面线程：历史记录加载完成后填充列表"""
+        if job.error is not None:
+            print(f"[WARN] 加载历史记录失败: {job.error}")
+        else:
+            self.lens_history, self.target_history = job.result
+        self.history_loaded = True
+        self.update_history_list()
+        self.update_target_history_list()
+        self.status.config(text="请选择眼部图和模特图（或从历史记录选择）")
+    
     def migrate_old_history(self):
-        """迁移旧的历史记录到新位置，并复制图片到缓存目录"""
+        """迁移旧的历史记录到数据库，并复制图片到缓存目录"""
+        # cache 下的 history.json 整体导入一次
+        self.history_db.import_json('lens', self.history_file)
+        self.history_db.import_json('target', self.target_history_file)
+        
         # 旧的历史记录文件路径
         old_lens_file = os.path.join(self.base_dir, 'output', 'lens_history.json')
         old_target_file = os.path.join(self.base_dir, 'output', 'target_history.json')
         
-        def migrate_with_images(old_file, new_file, cache_dir, is_target=False):
+        def migrate_with_images(old_file, kind, cache_dir):
             """迁移历史记录并复制图片"""
             if not os.path.exists(old_file):
                 return
@@ -227,39 +412,18 @@ class LensApp:
                 # 如果是绝对路径且文件存在，复制到缓存目录
                 if img_path and os.path.isabs(img_path) and os.path.exists(img_path):
                     try:
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                        ext = os.path.splitext(img_path)[1]
-                        name = record.get('name', 'img')
-                        cached_filename = f"{name}_{timestamp}{ext}"
-                        cached_path = os.path.join(cache_dir, cached_filename)
-                        shutil.copy2(img_path, cached_path)
+                        cached_path = store_image(img_path, cache_dir)
                         # 更新为相对路径
                         record['img_path'] = os.path.relpath(cached_path, self.base_dir)
-                        print(f"已复制图片: {os.path.basename(img_path)} -> {cached_filename}")
+                        print(f"已复制图片: {os.path.basename(img_path)} -> {os.path.basename(cached_path)}")
                     except Exception as e:
                         print(f"复制图片失败: {e}")
                 
                 new_history.append(record)
             
-            # 合并新旧记录（保留新文件中的记录）
-            existing_history = []
-            if os.path.exists(new_file):
-                try:
-                    with open(new_file, 'r', encoding='utf-8') as f:
-                        existing_history = json.load(f)
-                except:
-                    pass
-            
-            # 合并：新记录在前，旧记录（不重复的）在后
-            existing_names = {r.get('name', '') for r in existing_history}
-            for record in new_history:
-                if record.get('name', '') not in existing_names:
-                    existing_history.append(record)
-            
-            # 保存合并后的历史记录
-            with open(new_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_history, f, ensure_ascii=False, indent=2)
-            print(f"已迁移历史记录到: {new_file}")
+            # 合并新旧记录（已有同名记录的不导入）
+            self.history_db.import_records(kind, new_history)
+            print(f"已迁移历史记录到: {self.history_db.db_path}")
             
             # 删除旧文件，避免重复迁移
             try:
@@ -269,145 +433,187 @@ class LensApp:
                 pass
         
         # 迁移眼部图历史
-        migrate_with_images(old_lens_file, self.history_file, self.lens_cache_dir, False)
+        migrate_with_images(old_lens_file, 'lens', self.lens_cache_dir)
         
         # 迁移模特图历史  
-        migrate_with_images(old_target_file, self.target_history_file, self.target_cache_dir, True)
+        migrate_with_images(old_target_file, 'target', self.target_cache_dir)
     
-    def _update_history_paths(self):
-        """更新内存中历史记录的绝对路径为相对路径"""
-        def find_cached_image(cache_dir, name):
-            """在缓存目录中查找与name匹配的图片"""
-            if not os.path.exists(cache_dir):
-                return None
-            for filename in os.listdir(cache_dir):
-                if filename.startswith(name + '_') and not filename.endswith('.json'):
-                    return os.path.join(cache_dir, filename)
-            return None
+    def resolve_image_path(self, record, is_target, store=True):
+        """
+        记录对应图片的绝对路径，顺带修复旧记录中的绝对路径（修复后写回数据库）
         
-        def update_list(history_list, cache_dir):
-            updated = False
-            for record in history_list:
-                img_path = record.get('img_path', '')
-                name = record.get('name', 'img')
-                
-                if img_path and os.path.isabs(img_path):
-                    if os.path.exists(img_path):
-                        # 绝对路径存在，复制到缓存
-                        try:
-                            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                            ext = os.path.splitext(img_path)[1]
-                            cached_filename = f"{name}_{timestamp}{ext}"
-                            cached_path = os.path.join(cache_dir, cached_filename)
-                            shutil.copy2(img_path, cached_path)
-                            record['img_path'] = os.path.relpath(cached_path, self.base_dir)
-                            updated = True
-                            print(f"已关联缓存图片: {name}")
-                        except Exception as e:
-                            print(f"复制失败: {e}")
-                    else:
-                        # 绝对路径不存在，查找缓存中的图片
-                        cached_img = find_cached_image(cache_dir, name)
-                        if cached_img:
-                            record['img_path'] = os.path.relpath(cached_img, self.base_dir)
-                            updated = True
-                            print(f"已关联缓存图片: {name}")
-            return updated
-        
-        # 更新眼部图历史
-        if update_list(self.lens_history, self.lens_cache_dir):
-            self.save_history(self.lens_history, self.history_file)
-        
-        # 更新模特图历史
-        if update_list(self.target_history, self.target_cache_dir):
-            self.save_history(self.target_history, self.target_history_file)
-    
-    def load_history(self, filepath):
-        """加载历史记录"""
-        if os.path.exists(filepath):
+        - 绝对路径存在：store 为 True 时存入缓存目录，改为相对路径
+        - 绝对路径不存在：按记录名在旧版缓存图片索引中查找
+        
+        Args:
+            record: 历史记录
+            is_target: 是否为模特图记录
+            store: 是否复制外部图片到缓存（需要计算哈希，列表刷新时为 False）
+        
+        Returns:
+            图片绝对路径（找不到时为记录中的原路径，可能不存在）
+        """
+        img_path = record.get('img_path', '')
+        if not img_path or not os.path.isabs(img_path):
+            return self.get_abs_path(img_path)
+        
+        cache_dir = self.target_cache_dir if is_target else self.lens_cache_dir
+        if os.path.exists(img_path):
+            if not store:
+                return img_path
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+                cached_path = store_image(img_path, cache_dir)
+            except OSError as e:
+                print(f"[WARN] 复制图片失败: {e}")
+                return img_path
+        else:
+            if cache_dir not in self._legacy_images:
+                self._legacy_images[cache_dir] = legacy_image_index(cache_dir)
+            cached_path = self._legacy_images[cache_dir].get(record.get('name', 'img'))
+            if cached_path is None:
+                return img_path
+        
+        record['img_path'] = os.path.relpath(cached_path, self.base_dir)
+        self.history_db.set_img_path(record['id'], record['img_path'])
+        print(f"[INFO] 已关联缓存图片: {record.get('name', '')}")
+        return cached_path
     
-    def save_history(self, history_list, filepath):
-        """保存历史记录"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    def load_history(self, kind):
+        """加载历史记录列表（'lens' 眼部图 / 'target' 模特图，最新在前，不含圈选点）"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(history_list, f, ensure_ascii=False, indent=2)
-            print(f"[保存成功] {filepath} - {len(history_list)}条记录")
+            return self.history_db.records(kind)
         except Exception as e:
-            print(f"[保存失败] {filepath}: {e}")
+            print(f"[读取失败] 历史记录 {kind}: {e}")
+            return []
     
     def add_to_history(self, name, points, img_path, is_target=False):
         """添加新记录，将图片复制到缓存目录"""
         # 确定缓存目录
         cache_dir = self.target_cache_dir if is_target else self.lens_cache_dir
         
-        # 生成唯一文件名并复制图片到缓存
+        # 按内容哈希存入缓存（同一张图已存过则直接引用）
         cached_img_path = ""
         if img_path and os.path.exists(img_path):
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            ext = os.path.splitext(img_path)[1]
-            cached_filename = f"{name}_{timestamp}{ext}"
-            cached_img_path = os.path.join(cache_dir, cached_filename)
             try:
-                shutil.copy2(img_path, cached_img_path)
+                cached_img_path = store_image(img_path, cache_dir)
                 # 保存相对路径
                 cached_img_path = os.path.relpath(cached_img_path, self.base_dir)
             except Exception as e:
                 print(f"复制图片失败: {e}")
                 cached_img_path = ""
         
-        record = {
-            'name': name,
-            'points': points,
-            'img_path': cached_img_path,  # 使用相对路径
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M')
-        }
         print(f"[添加记录] name={name}, img_path={cached_img_path}, is_target={is_target}")
+        try:
+            # 单条插入（超出条数上限的最旧记录在同一事务中删除）
+            self.history_db.add('target' if is_target else 'lens', name, points, cached_img_path)
+        except Exception as e:
+            print(f"[保存失败] {name}: {e}")
+            return
+        # 超出条数上限被删掉的旧记录可能释放了图片
+        self.collect_image_garbage(is_target)
         if is_target:
-            self.target_history.insert(0, record)
-            if len(self.target_history) > 20:
-                self.target_history = self.target_history[:20]
-            self.save_history(self.target_history, self.target_history_file)
+            self.target_history = self.load_history('target')
             self.update_target_history_list()
         else:
-            self.lens_history.insert(0, record)
-            if len(self.lens_history) > 20:
-                self.lens_history = self.lens_history[:20]
-            self.save_history(self.lens_history, self.history_file)
+            self.lens_history = self.load_history('lens')
             self.update_history_list()
     
     def delete_history(self, index, is_target=False):
         """删除记录"""
         if is_target:
             if 0 <= index < len(self.target_history):
+                self.history_db.delete(self.target_history[index]['id'])
                 del self.target_history[index]
-                self.save_history(self.target_history, self.target_history_file)
+                self.collect_image_garbage(True)
                 self.update_target_history_list()
         else:
             if 0 <= index < len(self.lens_history):
+                self.history_db.delete(self.lens_history[index]['id'])
                 del self.lens_history[index]
-                self.save_history(self.lens_history, self.history_file)
+                self.collect_image_garbage(False)
                 self.update_history_list()
     
+    def referenced_images(self, is_target):
+        """一类历史记录引用的缓存图片 {绝对路径: 记录中保存的路径}"""
+        kind = 'target' if is_target else 'lens'
+        return {os.path.normcase(self.get_abs_path(p)): p
+                for p in self.history_db.referenced_paths(kind)}
+    
+    def images_in_use(self, is_target):
+        """当前选中或排队生成中的图片路径（记录已删除时也要保留到用完为止）"""
+        key = 'target_path' if is_target else 'source_path'
+        paths = [getattr(self, key)] + [snapshot[key] for snapshot in self.pending_renders]
+        return [p for p in paths if p]
+    
+    def collect_image_garbage(self, is_target):
+        """删除不再被任何记录引用、也没有正在使用的缓存图片"""
+        cache_dir = self.target_cache_dir if is_target else self.lens_cache_dir
+        keep = list(self.referenced_images(is_target)) + self.images_in_use(is_target)
+        for path in collect_garbage(cache_dir, keep):
+            print(f"[INFO] 已回收缓存图片: {os.path.basename(path)}")
+    
+    def dedup_image_cache(self):
+        """整理旧的缓存目录：相同内容的图片只保留一份，被引用的改为内容哈希命名"""
+        for is_target, cache_dir in ((False, self.lens_cache_dir), (True, self.target_cache_dir)):
+            if not os.path.isdir(cache_dir):
+                continue
+            # 先按记录名关联丢失原图的旧记录，它们对应的旧缓存图片也算被引用
+            for record in self.history_db.records('target' if is_target else 'lens'):
+                img_path = record['img_path']
+                if img_path and os.path.isabs(img_path) and not os.path.exists(img_path):
+                    self.resolve_image_path(record, is_target, store=False)
+            referenced = self.referenced_images(is_target)
+            try:
+                renamed, removed = dedup_cache_dir(cache_dir, referenced)
+            except OSError as e:
+                print(f"[WARN] 整理缓存图片失败: {e}")
+                continue
+            for old_path, new_path in renamed.items():
+                stored = referenced.get(os.path.normcase(old_path))
+                if stored is not None:
+                    self.history_db.replace_img_path(stored, os.path.relpath(new_path, self.base_dir))
+            if removed:
+                print(f"[INFO] {cache_dir}: 删除 {len(removed)} 个重复图片")
+        # 整理时改名/删除了旧文件，索引需重新建立
+        self._legacy_images.clear()
+    
     def update_history_list(self):
         """更新眼部图历史记录列表"""
-        self.history_listbox.delete(0, tk.END)
-        for i, record in enumerate(self.lens_history):
-            display = f"{record['name']} ({record['time']})"
-            self.history_listbox.insert(tk.END, display)
+        self.fill_history_tree(self.history_listbox, self.lens_history)
     
     def update_target_history_list(self):
         """更新模特图历史记录列表"""
-        self.target_history_listbox.delete(0, tk.END)
-        for i, record in enumerate(self.target_history):
+        self.fill_history_tree(self.target_history_listbox, self.target_history)
+    
+    def fill_history_tree(self, tree, records):
+        """填充历史列表；已有缩略图直接显示，没有的交给后台生成后再补上"""
+        tree.delete(*tree.get_children())
+        for i, record in enumerate(records):
             display = f"{record['name']} ({record['time']})"
-            self.target_history_listbox.insert(tk.END, display)
+            img_path = self.resolve_image_path(record, tree is self.target_history_listbox, store=False)
+            photo = self._thumb_photos.get(img_path)
+            iid = tree.insert('', 'end', text=display, **({'image': photo} if photo else {}))
+            if photo is None and img_path:
+                self.request_thumbnail(tree, iid, img_path)
+    
+    def request_thumbnail(self, tree, iid, img_path):
+        """后台读取/生成缩略图，完成后在界面线程中设置到列表行上"""
+        def on_done(job):
+            if job.result is None:
+                return
+            photo = self._thumb_photos.get(img_path)
+            if photo is None:
+                rgb = cv2.cvtColor(job.result, cv2.COLOR_BGR2RGB)
+                photo = self._thumb_photos[img_path] = ImageTk.PhotoImage(Image.fromarray(rgb))
+            if tree.exists(iid):
+                tree.item(iid, image=photo)
+        
+        self.thumb_worker.submit(img_path, lambda job: self.thumbnails.get(img_path), on_done)
+    
+    def selected_index(self, tree):
+        """历史列表中选中行的序号，没有选中时返回None"""
+        selection = tree.selection()
+        return tree.index(selection[0]) if selection else None
     
     def get_abs_path(self, rel_path):
         """将相对路径转换为绝对路径"""
@@ -416,21 +622,20 @@ class LensApp:
         # 如果已经是绝对路径，直接返回
         if os.path.isabs(rel_path):
             return rel_path
-        # 转换为绝对路径
-        return os.path.join(self.base_dir, rel_path)
+        # 转换为绝对路径（其他系统保存的记录可能使用反斜杠）
+        return os.path.join(self.base_dir, normalize_rel_path(rel_path))
     
     def on_history_select(self, event):
         """选中眼部图历史记录"""
-        selection = self.history_listbox.curselection()
-        if selection:
-            idx = selection[0]
+        idx = self.selected_index(self.history_listbox)
+        if idx is not None:
             self.selected_history = self.lens_history[idx]
-            self.source_points = [list(p) for p in self.selected_history['points']]
+            self.source_points = self.history_db.get_points(self.selected_history['id']) or []
             name = self.selected_history['name']
-            # 尝试加载对应的图片（转换相对路径为绝对路径）
-            img_path = self.get_abs_path(self.selected_history.get('img_path', ''))
+            # 只记录图片路径（旧记录的绝对路径在此时修复），原图等处理时才解码
+            img_path = self.resolve_image_path(self.selected_history, False)
             if img_path and os.path.exists(img_path):
-                self.source_img = self.read_image(img_path)
+                self.source_img = None
                 self.source_path = img_path
                 self.source_label.config(text=f"✓ {name}", fg='#5cb85c')
                 self.status.config(text=f"已加载眼部图: {name}")
@@ -444,16 +649,15 @@ class LensApp:
     
     def on_target_history_select(self, event):
         """选中模特图历史记录"""
-        selection = self.target_history_listbox.curselection()
-        if selection:
-            idx = selection[0]
+        idx = self.selected_index(self.target_history_listbox)
+        if idx is not None:
             self.selected_target_history = self.target_history[idx]
-            self.target_points = [[list(p) for p in region] for region in self.selected_target_history['points']]
+            self.target_points = self.history_db.get_points(self.selected_target_history['id']) or []
             name = self.selected_target_history['name']
-            # 尝试加载对应的图片（转换相对路径为绝对路径）
-            img_path = self.get_abs_path(self.selected_target_history.get('img_path', ''))
+            # 只记录图片路径（旧记录的绝对路径在此时修复），原图等处理时才解码
+            img_path = self.resolve_image_path(self.selected_target_history, True)
             if img_path and os.path.exists(img_path):
-                self.target_img = self.read_image(img_path)
+                self.target_img = None
                 self.target_path = img_path
                 self.target_label.config(text=f"✓ {name}", fg='#5cb85c')
             else:
@@ -463,9 +667,8 @@ class LensApp:
     
     def delete_selected_history(self):
         """删除选中的眼部图历史记录"""
-        selection = self.history_listbox.curselection()
-        if selection:
-            idx = selection[0]
+        idx = self.selected_index(self.history_listbox)
+        if idx is not None:
             name = self.lens_history[idx]['name']
             if messagebox.askyesno("确认", f"确定删除「{name}」？"):
                 self.delete_history(idx, is_target=False)
@@ -474,43 +677,56 @@ class LensApp:
     
     def delete_selected_target_history(self):
         """删除选中的模特图历史记录"""
-        selection = self.target_history_listbox.curselection()
-        if selection:
-            idx = selection[0]
+        idx = self.selected_index(self.target_history_listbox)
+        if idx is not None:
             name = self.target_history[idx]['name']
             if messagebox.askyesno("确认", f"确定删除「{name}」？"):
                 self.delete_history(idx, is_target=True)
                 self.selected_target_history = None
                 self.target_points = []
     
-    def ask_save_history(self):
-        """询问是否保存到历史记录"""
+    def ask_save_history(self, points=None, path=None):
+        """询问是否保存到历史记录（默认保存当前眼部图圈选）"""
+        if points is None:
+            points, path = self.source_points, self.source_path
         if messagebox.askyesno("保存记录", "是否将此美瞳圈选保存到历史记录？\n下次可直接使用，无需重新圈选"):
             # 使用简单对话框获取名称
-            default_name = os.path.basename(self.source_path).rsplit('.', 1)[0] if self.source_path else "美瞳"
+            default_name = os.path.basename(path).rsplit('.', 1)[0] if path else "美瞳"
             from tkinter import simpledialog
             name = simpledialog.askstring("命名记录", "请输入名称：", initialvalue=default_name)
             if name and name.strip():
-                self.add_to_history(name.strip(), self.source_points, self.source_path or "")
+                self.add_to_history(name.strip(), points, path or "")
                 messagebox.showinfo("成功", f"已保存「{name}」到历史记录")
     
-    def ask_save_target_history(self):
-        """询问是否保存模特图圈选到历史记录"""
+    def ask_save_target_history(self, points=None, path=None):
+        """询问是否保存模特图圈选到历史记录（默认保存当前模特图圈选）"""
+        if points is None:
+            points, path = self.target_points, self.target_path
         if messagebox.askyesno("保存记录", "是否将此模特图眼睛位置保存到历史记录？\n下次可直接使用，无需重新圈选"):
-            default_name = os.path.basename(self.target_path).rsplit('.', 1)[0] if self.target_path else "模特"
+            default_name = os.path.basename(path).rsplit('.', 1)[0] if path else "模特"
             from tkinter import simpledialog
             name = simpledialog.askstring("命名记录", "请输入名称：", initialvalue=default_name)
             if name and name.strip():
-                self.add_to_history(name.strip(), self.target_points, self.target_path or "", is_target=True)
+                self.add_to_history(name.strip(), points, path or "", is_target=True)
                 messagebox.showinfo("成功", f"已保存「{name}」到模特图历史记录")
     
     def read_image(self, path):
-        """读取图片（支持中文路径）"""
-        # 使用numpy读取，支持中文路径
-        img_array = np.fromfile(path, dtype=np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        """读取图片（支持中文路径），最近用过的图片直接从内存缓存返回"""
+        img = self.image_cache.get(path)
+        if img is not None:
+            # 加载后立即在后台构建缩放金字塔，打开圈选窗口时通常已经就绪
+            self.get_pyramid(img)
         return img
     
+    def get_pyramid(self, img):
+        """返回图片的缩放金字塔（首次请求时开始后台构建）"""
+        for cached_img, pyramid in self._pyramids:
+            if cached_img is img:
+                return pyramid
+        pyramid = ImagePyramid(img)
+        self._pyramids = [(img, pyramid)] + self._pyramids[:1]
+        return pyramid
+    
     def select_source(self):
         """选择眼部图"""
         path = filedialog.askopenfilename(
@@ -686,41 +902,129 @@ class LensApp:
                 self.root.deiconify()
                 return
         
-        # 步骤3：生成结果
-        self.status.config(text="正在生成结果...")
-        result = self.process()
-        
-        if result is not None:
-            # 保存结果
-            output_path = 'output/result.jpg'
-            cv2.imwrite(output_path, result)
-            
-            # 显示结果
-            self.show_result(result, output_path)
-            
-            # 预览后询问是否保存新圈选的内容到历史记录
-            if self.source_is_new:
-                self.ask_save_history()
-                self.source_is_new = False
-            if self.target_is_new:
-                self.ask_save_target_history()
-                self.target_is_new = False
-            
-            # 重置模特图数据，准备下次使用
-            self.target_points = []
-            self.target_img = None
-            self.target_path = None
-            self.selected_target_history = None
-            self.target_label.config(text="未选择", fg='#888888')
-            self.btn_start.config(state='disabled')
-            self.status.config(text="已完成！请选择新的模特图继续")
+        # 步骤3：提交到后台生成结果，主窗口立即恢复，可以继续圈选下一张模特图
+        if self.check_process_inputs():
+            self.submit_render()
         
         self.root.deiconify()
     
+    def submit_render(self):
+        """把当前眼部图和模特图的圈选打包成后台任务"""
+        feather = 15
+        # 任务持有数据快照，提交后界面上的模特图数据可以直接重置
+        source_img = self.source_img
+        target_img = self.target_img
+        target_points = [list(region) for region in self.target_points]
+        snapshot = {
+            'source_path': self.source_path,
+            'source_points': list(self.source_points),
+            'source_is_new': self.source_is_new,
+            'target_path': self.target_path,
+            'target_points': target_points,
+            'target_is_new': self.target_is_new,
+            'output_path': os.path.join(
+                'output', f"result_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jpg"),
+        }
+        
+        def task(job):
+            # 纹理提取（缓存未命中时较慢）也在后台完成，算作进度的第一步
+            steps = len(target_points) + 1
+            job.report(0.0)
+            texture = self.source_texture(source_img, snapshot['source_points'],
+                                          snapshot['source_path'], feather)
+            result = render_targets(texture, target_img, target_points, feather,
+                                    lambda p: job.report((1 + p * (steps - 1)) / steps),
+                                    self.mask_cache)
+            job.report(1.0)
+            # 保存结果（支持中文路径）
+            os.makedirs(os.path.dirname(snapshot['output_path']), exist_ok=True)
+            ok, data = cv2.imencode('.jpg', result)
+            if not ok:
+                raise IOError(f"无法写出 {snapshot['output_path']}")
+            data.tofile(snapshot['output_path'])
+            return result
+        
+        name = os.path.basename(self.target_path) if self.target_path else "模特图"
+        self.pending_renders.append(snapshot)
+        self.worker.submit(name, task, lambda job: self.on_render_done(job, snapshot))
+        
+        # 新圈选的眼部图只在第一次出结果后询问保存
+        self.source_is_new = False
+        self.target_is_new = False
+        
+        # 重置模特图数据，准备下次使用
+        self.target_points = []
+        self.target_img = None
+        self.target_path = None
+        self.selected_target_history = None
+        self.target_label.config(text="未选择", fg='#888888')
+        self.btn_start.config(state='disabled')
+        self.update_job_progress()
+        self.status.config(text="正在后台生成结果，可以继续选择下一张模特图")
+    
+    def on_render_done(self, job, snapshot):
+        """后台任务完成（界面线程中调用）"""
+        try:
+            self.finish_render(job, snapshot)
+        finally:
+            # 询问保存历史记录时还要用到快照中的图片，全部处理完才允许回收
+            self.pending_renders.remove(snapshot)
+    
+    def finish_render(self, job, snapshot):
+        """显示后台任务的结果并询问是否保存新圈选"""
+        if job.status == 'cancelled':
+            self.status.config(text=f"已取消「{job.label}」")
+            return
+        if job.status == 'failed':
+            messagebox.showerror("错误", f"生成结果失败：{job.error}")
+            self.status.config(text=f"「{job.label}」生成失败")
+            return
+        
+        # 显示结果
+        self.show_result(job.result, snapshot['output_path'])
+        
+        # 预览后询问是否保存新圈选的内容到历史记录
+        if snapshot['source_is_new']:
+            self.ask_save_history(snapshot['source_points'], snapshot['source_path'])
+        if snapshot['target_is_new']:
+            self.ask_save_target_history(snapshot['target_points'], snapshot['target_path'])
+        
+        if not self.worker.busy:
+            self.status.config(text="已完成！请选择新的模特图继续")
+    
+    def cancel_job(self):
+        """取消正在生成的结果"""
+        job = self.worker.cancel_current()
+        if job is not None:
+            self.job_label.config(text=f"正在取消「{job.label}」...")
+    
+    def update_job_progress(self):
+        """刷新后台任务进度条（有任务时显示，空闲时隐藏）"""
+        job = self.worker.current
+        if not self.worker.busy:
+            if self.job_frame.winfo_ismapped():
+                self.job_frame.pack_forget()
+            return
+        if not self.job_frame.winfo_ismapped():
+            self.job_frame.pack(pady=(8, 0))
+        
+        queued = self.worker.queued
+        if job is None:
+            self.job_progress['value'] = 0
+            text = f"排队中 {queued} 个"
+        elif job.cancelled:
+            text = f"正在取消「{job.label}」..."
+        else:
+            self.job_progress['value'] = job.progress * 100
+            text = f"正在生成「{job.label}」"
+            if queued:
+                text += f"，排队 {queued} 个"
+        self.job_label.config(text=text)
+        self.btn_cancel.config(state='normal' if job is not None and not job.cancelled else 'disabled')
+    
     def locate_source(self):
         """定位眼部图 - 用画笔圈出美瞳区域"""
-        img = self.source_img.copy()
-        h, w = img.shape[:2]
+        img = self.source_img
         self.source_points = []
         
         # 获取屏幕尺寸，让图片自动填满屏幕
@@ -733,9 +1037,8 @@ class LensApp:
             screen_w = [1820]
             screen_h = [930]
         
-        # 计算填满屏幕的缩放比例
-        view_scale = [min(screen_w[0] / w, screen_h[0] / h)]
-        offset_x, offset_y = [0], [0]
+        # 视口：初始缩放填满屏幕，从金字塔取层渲染，只在输入事件后重绘
+        view = Viewport(img, screen_w[0], screen_h[0], self.get_pyramid(img))
         drawing = [False]
         dragging = [False]
         moving = [False]  # 移动已画图形
@@ -752,8 +1055,10 @@ class LensApp:
         erase_radius = [5]  # 擦除半径（默认最小）
         
         def mouse_cb(event, x, y, flags, param):
-            ox = int((x - offset_x[0]) / view_scale[0])
-            oy = int((y - offset_y[0]) / view_scale[0])
+            ox, oy = view.to_image(x, y)
+            # 单纯移动鼠标不需要重绘
+            if event != cv2.EVENT_MOUSEMOVE or drawing[0] or dragging[0] or moving[0]:
+                view.dirty = True
             
             if event == cv2.EVENT_LBUTTONDOWN:
                 drawing[0] = True
@@ -780,8 +1085,7 @@ class LensApp:
                     else:
                         current_points.append([ox, oy])
                 elif dragging[0]:
-                    offset_x[0] = x - drag_start[0]
-                    offset_y[0] = y - drag_start[1]
+                    view.pan(x - drag_start[0], y - drag_start[1])
                 elif moving[0] and len(self.source_points) > 0:
                     # 移动已画的图形
                     dx = ox - move_start[0]
@@ -792,17 +1096,7 @@ class LensApp:
                 drawing[0] = False
                 if circle_mode[0] and circle_radius[0] > 5:
                     # 生成带豁口的弧形（上方留口）
-                    pts = []
-                    gap_half = gap_angle[0] / 2
-                    start_deg = -90 + gap_half  # 从右上开始
-                    end_deg = -90 - gap_half + 360  # 到左上结束
-                    num_pts = 60
-                    for i in range(num_pts + 1):
-                        deg = start_deg + (end_deg - start_deg) * i / num_pts
-                        a = np.radians(deg)
-                        px = int(circle_center[0] + circle_radius[0] * np.cos(a))
-                        py = int(circle_center[1] + circle_radius[0] * np.sin(a))
-                        pts.append([px, py])
+                    pts = arc_points(circle_center, circle_radius[0], gap_angle[0])
                     if append_mode[0] and len(self.source_points) > 0:
                         self.source_points.extend(pts)
                     else:
@@ -817,8 +1111,8 @@ class LensApp:
                 current_points.clear()
             elif event == cv2.EVENT_RBUTTONDOWN:
                 dragging[0] = True
-                drag_start[0] = x - offset_x[0]
-                drag_start[1] = y - offset_y[0]
+                drag_start[0] = x - view.offset_x
+                drag_start[1] = y - view.offset_y
             elif event == cv2.EVENT_RBUTTONUP:
                 dragging[0] = False
             elif event == cv2.EVENT_MBUTTONDOWN:  # 中键移动图形
@@ -838,7 +1132,8 @@ class LensApp:
                                           for p in self.source_points]
         
         def draw():
-            disp = img.copy()
+            # 底图只重采样可见窗口，叠加层直接画在屏幕坐标上
+            canvas = view.render()
             lw = line_width[0]
             
             # 画圆形预览（带豁口）
@@ -846,35 +1141,17 @@ class LensApp:
                 gap_half = gap_angle[0] / 2
                 start_a = int(-90 + gap_half)
                 end_a = int(-90 - gap_half + 360)
-                cv2.ellipse(disp, (circle_center[0], circle_center[1]), 
-                           (circle_radius[0], circle_radius[0]), 0, start_a, end_a, (0, 255, 0), lw)
+                center = tuple(view.to_screen([circle_center])[0])
+                radius = max(1, int(round(circle_radius[0] * view.scale)))
+                cv2.ellipse(canvas, center, (radius, radius), 0, start_a, end_a, (0, 255, 0), lw)
             elif len(current_points) > 1:
-                pts = np.array(current_points, dtype=np.int32)
-                cv2.polylines(disp, [pts], False, (0, 255, 0), lw)
+                pts = view.to_screen(current_points)
+                cv2.polylines(canvas, [pts], False, (0, 255, 0), lw)
             
             # 画已确定的区域（不闭合，留豁口）
             if len(self.source_points) > 1:
-                pts = np.array(self.source_points, dtype=np.int32)
-                cv2.polylines(disp, [pts], False, (0, 255, 0), lw)  # False=不闭合
-            
-            scaled = cv2.resize(disp, (int(w * view_scale[0]), int(h * view_scale[0])))
-            
-            # 获取屏幕尺寸，使用大画布
-            canvas_h, canvas_w = screen_h[0], screen_w[0]
-            canvas = np.zeros((canvas_h, canvas_w, 3), dtype=np.uint8)
-            canvas[:] = (40, 40, 40)
-            
-            sh, sw = scaled.shape[:2]
-            px, py = int(offset_x[0]), int(offset_y[0])
-            
-            src_x1, src_y1 = max(0, -px), max(0, -py)
-            src_x2, src_y2 = min(sw, canvas_w - px), min(sh, canvas_h - py)
-            dst_x1, dst_y1 = max(0, px), max(0, py)
-            dst_x2 = dst_x1 + (src_x2 - src_x1)
-            dst_y2 = dst_y1 + (src_y2 - src_y1)
-            
-            if src_x2 > src_x1 and src_y2 > src_y1:
-                canvas[dst_y1:dst_y2, dst_x1:dst_x2] = scaled[src_y1:src_y2, src_x1:src_x2]
+                pts = view.to_screen(self.source_points)
+                cv2.polylines(canvas, [pts], False, (0, 255, 0), lw)  # False=不闭合
             
             if erase_mode[0]:
                 mode_str = f"ERASE (r={erase_radius[0]})"
@@ -901,16 +1178,22 @@ class LensApp:
         cv2.setMouseCallback(win, mouse_cb)
         
         while True:
-            cv2.imshow(win, draw())
+            # 只有输入改变了画面才重绘，空闲时只等待事件
+            if view.dirty:
+                view.dirty = False
+                cv2.imshow(win, draw())
             k = cv2.waitKey(30)
             
             if k == -1:
                 continue
             k = k & 0xFF
+            view.dirty = True
             
             if k == 32:  # SPACE
                 if len(self.source_points) > 10:
                     cv2.destroyAllWindows()
+                    # 手绘点列按像素容差简化（圆形模式的圆弧保存时按参数存储）
+                    self.source_points = simplify_regions([self.source_points])[0]
                     # 标记为新圈选，在预览后询问是否保存
                     self.source_is_new = True
                     return True
@@ -922,9 +1205,9 @@ class LensApp:
                 current_points.clear()
                 circle_radius[0] = 0
             elif k == ord('z') or k == ord('Z'):
-                view_scale[0] = min(10.0, view_scale[0] + 0.2)
+                view.zoom(0.2)
             elif k == ord('x') or k == ord('X'):
-                view_scale[0] = max(0.2, view_scale[0] - 0.2)
+                view.zoom(-0.2)
             elif k == ord('+') or k == ord('='):  # 加粗/增大擦除半径
                 if erase_mode[0]:
                     erase_radius[0] = min(100, erase_radius[0] + 5)
@@ -955,8 +1238,7 @@ class LensApp:
                 if gap_angle[0] < 20:
                     gap_angle[0] = 20
             elif k == ord('r') or k == ord('R'):  # 重置视图
-                offset_x[0], offset_y[0] = 0, 0
-                view_scale[0] = min(screen_w[0] / w, screen_h[0] / h)
+                view.fit()
             elif k == ord('f') or k == ord('F'):  # 切换全屏
                 fullscreen[0] = not fullscreen[0]
                 if fullscreen[0]:
@@ -966,8 +1248,7 @@ class LensApp:
     
     def locate_target(self):
         """定位模特图 - 用画笔圈出眼睛区域（可画多个）"""
-        img = self.target_img.copy()
-        h, w = img.shape[:2]
+        img = self.target_img
         self.target_points = []
         
         # 获取屏幕尺寸，让图片自动填满屏幕
@@ -980,9 +1261,8 @@ class LensApp:
             screen_w = [1820]
             screen_h = [930]
         
-        # 计算填满屏幕的缩放比例
-        view_scale = [min(screen_w[0] / w, screen_h[0] / h)]
-        offset_x, offset_y = [0], [0]
+        # 视口：初始缩放填满屏幕，从金字塔取层渲染，只在输入事件后重绘
+        view = Viewport(img, screen_w[0], screen_h[0], self.get_pyramid(img))
         drawing = [False]
         dragging = [False]
         moving = [False]
@@ -998,9 +1278,20 @@ class LensApp:
         erase_mode = [False]  # 擦除模式
         erase_radius = [5]  # 擦除半径（默认最小）
         
+        # 实时预览：眼部图已圈选时，把纹理直接合成到圈出的区域上（[P] 开关）
+        # 从历史记录选中的眼部图还没有解码，在这里读取
+        if self.source_img is None and self.source_path and len(self.source_points) >= MIN_REGION_POINTS:
+            self.source_img = self.read_image(self.source_path)
+        preview = [None]
+        if self.source_img is not None and len(self.source_points) >= MIN_REGION_POINTS:
+            preview[0] = LivePreview(self.get_source_texture())
+        show_preview = [preview[0] is not None]
+        
         def mouse_cb(event, x, y, flags, param):
-            ox = int((x - offset_x[0]) / view_scale[0])
-            oy = int((y - offset_y[0]) / view_scale[0])
+            ox, oy = view.to_image(x, y)
+            # 单纯移动鼠标不需要重绘
+            if event != cv2.EVENT_MOUSEMOVE or drawing[0] or dragging[0] or moving[0]:
+                view.dirty = True
             
             if event == cv2.EVENT_LBUTTONDOWN:
                 drawing[0] = True
@@ -1026,8 +1317,7 @@ class LensApp:
                     else:
                         current_points.append([ox, oy])
                 elif dragging[0]:
-                    offset_x[0] = x - drag_start[0]
-                    offset_y[0] = y - drag_start[1]
+                    view.pan(x - drag_start[0], y - drag_start[1])
                 elif moving[0] and len(self.target_points) > 0:
                     dx = ox - move_start[0]
                     dy = oy - move_start[1]
@@ -1036,17 +1326,7 @@ class LensApp:
             elif event == cv2.EVENT_LBUTTONUP:
                 drawing[0] = False
                 if circle_mode[0] and circle_radius[0] > 5:
-                    pts = []
-                    gap_half = gap_angle[0] / 2
-                    start_deg = -90 + gap_half
-                    end_deg = -90 - gap_half + 360
-                    num_pts = 60
-                    for i in range(num_pts + 1):
-                        deg = start_deg + (end_deg - start_deg) * i / num_pts
-                        a = np.radians(deg)
-                        px = int(circle_center[0] + circle_radius[0] * np.cos(a))
-                        py = int(circle_center[1] + circle_radius[0] * np.sin(a))
-                        pts.append([px, py])
+                    pts = arc_points(circle_center, circle_radius[0], gap_angle[0])
                     self.target_points.append(pts)
                     circle_radius[0] = 0
                 elif len(current_points) > 10:
@@ -1058,8 +1338,8 @@ class LensApp:
                 current_points.clear()
             elif event == cv2.EVENT_RBUTTONDOWN:
                 dragging[0] = True
-                drag_start[0] = x - offset_x[0]
-                drag_start[1] = y - offset_y[0]
+                drag_start[0] = x - view.offset_x
+                drag_start[1] = y - view.offset_y
             elif event == cv2.EVENT_RBUTTONUP:
                 dragging[0] = False
             elif event == cv2.EVENT_MBUTTONDOWN:
@@ -1077,7 +1357,17 @@ class LensApp:
                                                for p in region]
         
         def draw():
-            disp = img.copy()
+            # 底图只重采样可见窗口，叠加层直接画在屏幕坐标上
+            # 实时预览：编辑区域时只重新合成最后一个区域，拖动视图时暂停
+            canvas = None
+            if show_preview[0] and not dragging[0]:
+                regions = [r for r in self.target_points if len(r) >= MIN_REGION_POINTS]
+                if circle_mode[0] and drawing[0] and circle_radius[0] > 5:
+                    regions.append(arc_points(circle_center, circle_radius[0], gap_angle[0]))
+                if regions:
+                    canvas = preview[0].render(view, regions)
+            if canvas is None:
+                canvas = view.render()
             lw = line_width[0]
             
             # 画圆形预览（带豁口）
@@ -1085,41 +1375,23 @@ class LensApp:
                 gap_half = gap_angle[0] / 2
                 start_a = int(-90 + gap_half)
                 end_a = int(-90 - gap_half + 360)
-                cv2.ellipse(disp, (circle_center[0], circle_center[1]), 
-                           (circle_radius[0], circle_radius[0]), 0, start_a, end_a, (0, 255, 0), lw)
+                center = tuple(view.to_screen([circle_center])[0])
+                radius = max(1, int(round(circle_radius[0] * view.scale)))
+                cv2.ellipse(canvas, center, (radius, radius), 0, start_a, end_a, (0, 255, 0), lw)
             elif len(current_points) > 1:
-                pts = np.array(current_points, dtype=np.int32)
-                cv2.polylines(disp, [pts], False, (0, 255, 0), lw)
+                pts = view.to_screen(current_points)
+                cv2.polylines(canvas, [pts], False, (0, 255, 0), lw)
             
             # 画所有已确定的区域
             for i, region in enumerate(self.target_points):
                 if len(region) > 1:
-                    pts = np.array(region, dtype=np.int32)
-                    cv2.polylines(disp, [pts], False, (0, 255, 0), lw)  # 不闭合
+                    pts = view.to_screen(region)
+                    cv2.polylines(canvas, [pts], False, (0, 255, 0), lw)  # 不闭合
                     # 在左上角显示小编号
                     x, y, rw, rh = cv2.boundingRect(pts)
-                    cv2.putText(disp, str(i+1), (x-15, y-5), 
+                    cv2.putText(canvas, str(i+1), (x-15, y-5), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
             
-            scaled = cv2.resize(disp, (int(w * view_scale[0]), int(h * view_scale[0])))
-            
-            # 使用大画布
-            canvas_h, canvas_w = screen_h[0], screen_w[0]
-            canvas = np.zeros((canvas_h, canvas_w, 3), dtype=np.uint8)
-            canvas[:] = (40, 40, 40)
-            
-            sh, sw = scaled.shape[:2]
-            px, py = int(offset_x[0]), int(offset_y[0])
-            
-            src_x1, src_y1 = max(0, -px), max(0, -py)
-            src_x2, src_y2 = min(sw, canvas_w - px), min(sh, canvas_h - py)
-            dst_x1, dst_y1 = max(0, px), max(0, py)
-            dst_x2 = dst_x1 + (src_x2 - src_x1)
-            dst_y2 = dst_y1 + (src_y2 - src_y1)
-            
-            if src_x2 > src_x1 and src_y2 > src_y1:
-                canvas[dst_y1:dst_y2, dst_x1:dst_x2] = scaled[src_y1:src_y2, src_x1:src_x2]
-            
             if erase_mode[0]:
                 mode_str = f"ERASE (r={erase_radius[0]})"
                 color = (0, 0, 255)  # 红色表示擦除模式
@@ -1132,9 +1404,11 @@ class LensApp:
             else:
                 mode_str = "FREE"
                 color = (0, 255, 0)  # 绿色
+            if show_preview[0]:
+                mode_str += f" | Preview {preview[0].frame_ms:.0f}ms"
             cv2.putText(canvas, f"Eyes: {len(self.target_points)} | Mode: {mode_str} | [F] Fullscreen", 
                        (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.55, color, 2)
-            cv2.putText(canvas, f"[O] Circle [A] Append [E] Erase [G] Gap:{gap_angle[0]} [U] Undo [+/-] Size [SPACE] OK", 
+            cv2.putText(canvas, f"[O] Circle [A] Append [E] Erase [G] Gap:{gap_angle[0]} [P] Preview [U] Undo [+/-] Size [SPACE] OK", 
                        (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
             return canvas
         
@@ -1145,16 +1419,22 @@ class LensApp:
         cv2.setMouseCallback(win, mouse_cb)
         
         while True:
-            cv2.imshow(win, draw())
+            # 只有输入改变了画面才重绘，空闲时只等待事件
+            if view.dirty:
+                view.dirty = False
+                cv2.imshow(win, draw())
             k = cv2.waitKey(30)
             
             if k == -1:
                 continue
             k = k & 0xFF
+            view.dirty = True
             
             if k == 32:  # SPACE
                 if len(self.target_points) > 0:
                     cv2.destroyAllWindows()
+                    # 手绘点列按像素容差简化（圆形模式的圆弧保存时按参数存储）
+                    self.target_points = simplify_regions(self.target_points)
                     # 标记为新圈选，在预览后询问是否保存
                     self.target_is_new = True
                     return True
@@ -1169,9 +1449,9 @@ class LensApp:
                 current_points.clear()
                 circle_radius[0] = 0
             elif k == ord('z') or k == ord('Z'):
-                view_scale[0] = min(10.0, view_scale[0] + 0.2)
+                view.zoom(0.2)
             elif k == ord('x') or k == ord('X'):
-                view_scale[0] = max(0.2, view_scale[0] - 0.2)
+                view.zoom(-0.2)
             elif k == ord('+') or k == ord('='):  # 加粗/增大擦除半径
                 if erase_mode[0]:
                     erase_radius[0] = min(100, erase_radius[0] + 5)
@@ -1201,9 +1481,10 @@ class LensApp:
                 gap_angle[0] = (gap_angle[0] + 20) % 180
                 if gap_angle[0] < 20:
                     gap_angle[0] = 20
+            elif k == ord('p') or k == ord('P'):  # 切换实时预览（需要已圈选眼部图）
+                show_preview[0] = preview[0] is not None and not show_preview[0]
             elif k == ord('r') or k == ord('R'):  # 重置视图
-                offset_x[0], offset_y[0] = 0, 0
-                view_scale[0] = min(screen_w[0] / w, screen_h[0] / h)
+                view.fit()
             elif k == ord('f') or k == ord('F'):  # 切换全屏
                 fullscreen[0] = not fullscreen[0]
                 if fullscreen[0]:
@@ -1211,86 +1492,54 @@ class LensApp:
                 else:
                     cv2.setWindowProperty(win, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_NORMAL)
     
-    def process(self):
-        """处理并生成结果 - 使用画笔圈选的区域"""
-        if len(self.source_points) < 10 or len(self.target_points) == 0:
+    def check_process_inputs(self):
+        """检查圈选和图片是否齐全，不齐全时弹出错误提示"""
+        if len(self.source_points) < MIN_REGION_POINTS or len(self.target_points) == 0:
             messagebox.showerror("错误", "请先完成圈选操作")
-            return None
+            return False
         
         # 检查图片是否已加载
         if self.source_img is None:
             messagebox.showerror("错误", "眼部图未加载，请重新选择眼部图")
-            return None
+            return False
         if self.target_img is None:
             messagebox.showerror("错误", "模特图未加载，请重新选择模特图")
+            return False
+        return True
+    
+    def process(self):
+        """处理并生成结果 - 使用画笔圈选的区域"""
+        if not self.check_process_inputs():
             return None
         
-        # 从源图圈选区域提取纹理
-        sh, sw = self.source_img.shape[:2]
-        source_pts = np.array(self.source_points, dtype=np.int32)
-        
-        # 创建源蒙版
-        source_mask = np.zeros((sh, sw), dtype=np.uint8)
-        cv2.fillPoly(source_mask, [source_pts], 255)
-        
-        # 获取边界框
-        sx, sy, srw, srh = cv2.boundingRect(source_pts)
-        
-        # 提取纹理区域
-        cropped = self.source_img[sy:sy+srh, sx:sx+srw].copy()
-        cropped_mask = source_mask[sy:sy+srh, sx:sx+srw]
-        
-        # 创建带羽化的alpha通道
+        # 从源图圈选区域提取纹理（同一源图和圈选只提取一次）
         feather = 15
-        alpha = cv2.GaussianBlur(cropped_mask.astype(np.float32), (feather*2+1, feather*2+1), 0)
-        alpha = alpha / alpha.max() if alpha.max() > 0 else alpha
-        
-        # 创建带alpha的纹理
-        texture = np.dstack([cropped, (alpha * 255).astype(np.uint8)])
-        
-        # 应用到每个目标区域
-        result = self.target_img.copy()
-        
-        for target_region in self.target_points:
-            if len(target_region) < 10:
-                continue
-            
-            target_pts = np.array(target_region, dtype=np.int32)
-            tx, ty, trw, trh = cv2.boundingRect(target_pts)
-            
-            # 创建目标蒙版
-            th, tw = result.shape[:2]
-            target_mask = np.zeros((th, tw), dtype=np.uint8)
-            cv2.fillPoly(target_mask, [target_pts], 255)
-            target_cropped_mask = target_mask[ty:ty+trh, tx:tx+trw]
-            
-            # 羽化目标蒙版
-            target_alpha = cv2.GaussianBlur(target_cropped_mask.astype(np.float32), (feather*2+1, feather*2+1), 0)
-            target_alpha = target_alpha / target_alpha.max() if target_alpha.max() > 0 else target_alpha
-            
-            # 缩放纹理以匹配目标区域大小
-            scaled_texture = cv2.resize(texture, (trw, trh))
-            
-            # 混合
-            roi = result[ty:ty+trh, tx:tx+trw].astype(np.float32)
-            tex_bgr = scaled_texture[:,:,:3].astype(np.float32)
-            tex_alpha = scaled_texture[:,:,3:4].astype(np.float32) / 255.0
-            
-            # 合并源alpha和目标alpha
-            combined_alpha = tex_alpha[:,:,0] * target_alpha
-            combined_alpha = combined_alpha[:,:,np.newaxis]
-            
-            # 排除高光区域
-            gray = cv2.cvtColor(scaled_texture[:,:,:3], cv2.COLOR_BGR2GRAY)
-            highlight = (gray > 210).astype(np.float32)
-            highlight = cv2.GaussianBlur(highlight, (9, 9), 0)[:,:,np.newaxis]
-            combined_alpha = combined_alpha * (1 - highlight)
-            
-            # 混合
-            blended = tex_bgr * combined_alpha + roi * (1 - combined_alpha)
-            result[ty:ty+trh, tx:tx+trw] = np.clip(blended, 0, 255).astype(np.uint8)
+        texture = self.get_source_texture(feather)
         
-        return result
+        return render_targets(texture, self.target_img, self.target_points, feather,
+                              alpha_cache=self.mask_cache)
+    
+    def get_source_texture(self, feather=15):
+        """当前眼部图圈选区域的纹理（见 source_texture）"""
+        return self.source_texture(self.source_img, self.source_points, self.source_path, feather)
+    
+    def source_texture(self, source_img, source_points, source_path, feather=15):
+        """
+        从源图圈选区域提取带羽化Alpha的纹理（同一源图和圈选只提取一次，有图片文件时缓存到磁盘）
+        
+        只读取传入的参数，可以在后台任务中用提交时的快照调用
+        """
+        key = tuple(map(tuple, source_points))
+        cache = self._texture_cache
+        if cache is not None and cache[0] is source_img and cache[1] == key:
+            return cache[2]
+        
+        identity = image_identity(source_path)
+        texture = self.mask_cache.get(
+            array_key(source_points, 'texture', identity, feather) if identity else None,
+            lambda: extract_texture(source_img, source_points, feather))
+        self._texture_cache = (source_img, key, texture)
+        return texture
     
     def show_result(self, result, path):
         """显示结果"""
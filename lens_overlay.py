@@ -9,6 +9,9 @@ from typing import Tuple, Optional
 import math
 
 from iris_detector import EyeData, EyeDetectionResult
+from iris_segmenter import segment_iris
+from lens_texture import clean_lens_texture, load_lens_asset, save_lens_asset
+from radial_mask import circular_alpha
 
 
 class ContactLensOverlay:
@@ -21,11 +24,12 @@ class ContactLensOverlay:
         Args:
             lens_image_path: 美瞳PNG图片路径（需要透明通道）
         """
-        # 读取带Alpha通道的图片
-        self.lens_image = cv2.imread(lens_image_path, cv2.IMREAD_UNCHANGED)
+        # 读取带Alpha通道的图片（入库时已去除源图反光，旧素材在此现场处理）
+        loaded = load_lens_asset(lens_image_path)
         
-        if self.lens_image is None:
+        if loaded is None:
             raise ValueError(f"无法读取美瞳图片: {lens_image_path}")
+        self.lens_image, _ = loaded
         
         # 如果没有Alpha通道，创建一个基于圆形的蒙版
         if self.lens_image.shape[2] == 3:
@@ -56,16 +60,10 @@ class ContactLensOverlay:
         """为没有Alpha通道的图片添加圆形蒙版"""
         h, w = image.shape[:2]
         
-        # 创建圆形蒙版
-        alpha = np.zeros((h, w), dtype=np.uint8)
+        # 创建圆形蒙版（边缘20px线性渐变）
         center = (w // 2, h // 2)
         radius = min(w, h) // 2 - 5
-        
-        # 创建渐变边缘
-        for r in range(radius, radius - 20, -1):
-            intensity = int(255 * (r - (radius - 20)) / 20)
-            cv2.circle(alpha, center, r, intensity, -1)
-        cv2.circle(alpha, center, radius - 20, 255, -1)
+        alpha = circular_alpha(h, w, center, radius - 20, radius)
         
         # 合并通道
         result = np.dstack([image, alpha])
@@ -405,54 +403,104 @@ class ContactLensOverlay:
         return result
 
 
-def extract_lens_from_eye_image(
-    eye_image_path: str,
-    output_path: str,
+def locate_lens_regions(
+    image: np.ndarray,
+    detector=None,
     expand_ratio: float = 1.2
-) -> str:
+) -> Tuple[list, bool]:
     """
-    从眼睛照片中提取美瞳纹理（辅助工具）
+    定位眼睛照片中的美瞳区域
     
     Args:
-        eye_image_path: 带美瞳的眼睛照片
-        output_path: 输出PNG路径
+        image: BGR图像
+        detector: 复用的 IrisDetector（批量处理时传入，None则临时创建）
         expand_ratio: 提取范围扩展比例
         
     Returns:
-        输出文件路径
+        ([(标签, (cx, cy), 半径, 可见蒙版), ...], 是否使用了中心回退)；
+        检测成功时每张人脸的每只眼各一项，标签如 "f0_left"，可见蒙版为None；
+        检测失败时见 fallback_lens_region
     """
-    from iris_detector import IrisDetector
-    
-    image = cv2.imread(eye_image_path)
-    if image is None:
-        raise ValueError(f"Cannot read image: {eye_image_path}")
-    
-    h, w = image.shape[:2]
-    cx, cy = w // 2, h // 2
-    radius = None
+    regions = []
     
     # 尝试使用MediaPipe检测
     try:
-        detector = IrisDetector()
-        result = detector.detect(image)
-        detector.close()
-        
-        if result.success:
-            eye_data = result.left_eye or result.right_eye
-            if eye_data:
-                cx, cy = eye_data.center_px
-                radius = int(eye_data.radius * expand_ratio)
-                print(f"[OK] MediaPipe detected eye at ({cx}, {cy}), radius={radius}")
+        if detector is None:
+            from iris_detector import IrisDetector
+            
+            owned = IrisDetector()
+            faces = owned.detect_all(image)
+            owned.close()
+        else:
+            faces = detector.detect_all(image)
+        
+        for i, result in enumerate(faces):
+            for side, eye_data in [('left', result.left_eye), ('right', result.right_eye)]:
+                if eye_data:
+                    regions.append((
+                        f"f{i}_{side}", eye_data.center_px,
+                        int(eye_data.radius * expand_ratio), None
+                    ))
     except Exception as e:
         print(f"[WARN] MediaPipe detection failed: {e}")
     
-    # 如果检测失败，使用简单模式（假设眼睛在图像中心）
-    if radius is None:
-        print("[INFO] Using simple center extraction mode...")
-        # 对于眼睛特写图，估算虹膜占图像的比例
-        # 通常虹膜半径约为图像短边的 20-35%
-        radius = int(min(h, w) * 0.30)
-        print(f"[INFO] Estimated center ({cx}, {cy}), radius={radius}")
+    if regions:
+        return regions, False
+    
+    region, fallback = fallback_lens_region(image, expand_ratio)
+    return [region], fallback
+
+
+def fallback_lens_region(image: np.ndarray, expand_ratio: float = 1.2) -> Tuple[tuple, bool]:
+    """
+    检测不到人脸时（眼睛特写图）：先用经典方法分割虹膜，失败再按图像中心估算
+    
+    Returns:
+        ((标签, (cx, cy), 半径, 可见蒙版), 是否使用了中心回退)；
+        分割成功时标签为 "iris"，可见蒙版为去掉眼睑遮挡的虹膜区域
+    """
+    segmentation = segment_iris(image)
+    if segmentation is not None:
+        region = (
+            "iris", segmentation.center,
+            int(segmentation.iris_radius * expand_ratio), segmentation.visible_mask
+        )
+        return region, False
+    
+    return center_lens_region(image), True
+
+
+def center_lens_region(image: np.ndarray) -> tuple:
+    """
+    检测失败时的简单模式：假设眼睛在图像中心
+    
+    对于眼睛特写图，估算虹膜占图像的比例，通常虹膜半径约为图像短边的 20-35%
+    
+    Returns:
+        ("center", (cx, cy), 半径, None)
+    """
+    h, w = image.shape[:2]
+    return "center", (w // 2, h // 2), int(min(h, w) * 0.30), None
+
+
+def crop_lens(
+    image: np.ndarray,
+    cx: int,
+    cy: int,
+    radius: int,
+    visible_mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    以 (cx, cy) 为中心裁剪正方形美瞳区域并加圆形渐变Alpha
+    
+    Args:
+        visible_mask: 与原图同尺寸的可见区域蒙版（如去掉眼睑的虹膜），
+            给出时Alpha再与羽化后的蒙版取最小值
+    
+    Returns:
+        BGRA 纹理
+    """
+    h, w = image.shape[:2]
     
     # 创建正方形裁剪区域
     x1 = max(0, cx - radius)
@@ -465,22 +513,57 @@ def extract_lens_from_eye_image(
     
     # 创建圆形Alpha蒙版
     ch, cw = cropped.shape[:2]
-    alpha = np.zeros((ch, cw), dtype=np.uint8)
     center = (cw // 2, ch // 2)
     
     # 创建渐变边缘
     edge_width = max(15, min(ch, cw) // 20)  # 动态边缘宽度
     max_radius = min(ch, cw) // 2
-    for r in range(max_radius, max_radius - edge_width, -1):
-        intensity = int(255 * (r - (max_radius - edge_width)) / edge_width)
-        cv2.circle(alpha, center, r, intensity, -1)
-    cv2.circle(alpha, center, max_radius - edge_width, 255, -1)
+    alpha = circular_alpha(ch, cw, center, max_radius - edge_width, max_radius)
+    
+    if visible_mask is not None:
+        visible = cv2.GaussianBlur(visible_mask[y1:y2, x1:x2], (0, 0), edge_width / 3)
+        alpha = np.minimum(alpha, visible)
     
     # 合并为BGRA
-    result_image = np.dstack([cropped, alpha])
+    return np.dstack([cropped, alpha])
+
+
+def extract_lens_from_eye_image(
+    eye_image_path: str,
+    output_path: str,
+    expand_ratio: float = 1.2,
+    detector=None
+) -> str:
+    """
+    从眼睛照片中提取美瞳纹理（辅助工具）
+    
+    Args:
+        eye_image_path: 带美瞳的眼睛照片
+        output_path: 输出PNG路径
+        expand_ratio: 提取范围扩展比例
+        detector: 复用的 IrisDetector（None则临时创建）
+        
+    Returns:
+        输出文件路径
+    """
+    image = cv2.imread(eye_image_path)
+    if image is None:
+        raise ValueError(f"Cannot read image: {eye_image_path}")
+    
+    regions, fallback = locate_lens_regions(image, detector, expand_ratio)
+    label, (cx, cy), radius, visible_mask = regions[0]
+    if fallback:
+        print("[INFO] Using simple center extraction mode...")
+        print(f"[INFO] Estimated center ({cx}, {cy}), radius={radius}")
+    elif label == "iris":
+        print(f"[OK] Iris segmented at ({cx}, {cy}), radius={radius}")
+    else:
+        print(f"[OK] MediaPipe detected eye at ({cx}, {cy}), radius={radius}")
+    
+    result_image, highlight = clean_lens_texture(crop_lens(image, cx, cy, radius, visible_mask))
     
-    # 保存
-    cv2.imwrite(output_path, result_image)
+    # 保存（干净纹理 + 高光蒙版）
+    save_lens_asset(output_path, result_image, highlight)
     print(f"[OK] Lens texture extracted to: {output_path}")
     
     return output_path
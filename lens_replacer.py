@@ -17,6 +17,9 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import sys
 
+from lens_texture import clean_lens_texture, save_lens_asset
+from radial_mask import extract_quadrant_lens
+
 class LensReplacer:
     def __init__(self):
         # 图片路径
@@ -280,38 +283,15 @@ class LensReplacer:
         # 提取纹理
         print("\n正在提取美瞳纹理...")
         
-        max_r = max(self.source_top, self.source_bottom, self.source_left, self.source_right)
-        sh, sw = self.source_img.shape[:2]
-        
-        x1 = max(0, self.source_cx - max_r)
-        y1 = max(0, self.source_cy - max_r)
-        x2 = min(sw, self.source_cx + max_r)
-        y2 = min(sh, self.source_cy + max_r)
-        
-        cropped = self.source_img[y1:y2, x1:x2].copy()
-        ch, cw = cropped.shape[:2]
-        center_x = self.source_cx - x1
-        center_y = self.source_cy - y1
-        
-        # 创建Alpha蒙版
-        alpha = np.zeros((ch, cw), dtype=np.float32)
-        for y in range(ch):
-            for x in range(cw):
-                dx, dy = x - center_x, y - center_y
-                ry = self.source_top if dy < 0 else self.source_bottom
-                rx = self.source_left if dx < 0 else self.source_right
-                if rx > 0 and ry > 0:
-                    dist = np.sqrt((dx / rx)**2 + (dy / ry)**2)
-                    if dist <= 1:
-                        if dist > 1 - self.source_feather / max(rx, ry):
-                            alpha[y, x] = (1 - dist) / (self.source_feather / max(rx, ry))
-                        else:
-                            alpha[y, x] = 1.0
-        
-        alpha = (alpha * 255).astype(np.uint8)
-        texture = np.dstack([cropped, alpha])
-        
-        cv2.imwrite(f'{self.output_dir}/extracted_texture.png', texture)
+        texture = extract_quadrant_lens(
+            self.source_img, self.source_cx, self.source_cy,
+            self.source_top, self.source_bottom, self.source_left, self.source_right,
+            self.source_feather
+        )
+        # 提取时一次性去除源图反光，后面直接缩放混合
+        texture, highlight = clean_lens_texture(texture)
+        
+        save_lens_asset(f'{self.output_dir}/extracted_texture.png', texture, highlight)
         print(f"  已保存纹理: {self.output_dir}/extracted_texture.png")
         
         # 应用到目标
@@ -353,12 +333,6 @@ class LensReplacer:
         overlay_bgr = overlay_roi[:, :, :3].astype(float)
         overlay_alpha = overlay_roi[:, :, 3:4].astype(float) / 255.0
         
-        # 排除源纹理高光
-        overlay_gray = cv2.cvtColor(overlay_roi[:, :, :3], cv2.COLOR_BGR2GRAY)
-        source_highlight = (overlay_gray > 220).astype(float)
-        source_highlight = cv2.GaussianBlur(source_highlight, (5, 5), 0)[:, :, np.newaxis]
-        overlay_alpha = overlay_alpha * (1 - source_highlight * 0.7)
-        
         # 混合
         blended = overlay_alpha * overlay_bgr + (1 - overlay_alpha) * base_roi
         result[py1:py2, px1:px2] = np.clip(blended, 0, 255).astype(np.uint8)
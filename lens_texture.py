@@ -0,0 +1,169 @@
+"""
+美瞳纹理预处理
+素材入库时一次性检测源图上的镜面反光并用图像修复去掉，
+保存干净纹理和高光蒙版（<素材名>.highlight.png），之后贴到每个目标上只需缩放和混合
+"""
+
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# 源纹理高光阈值（灰度）
+HIGHLIGHT_THRESHOLD = 210
+
+# 超过不透明区域此比例的亮斑视为美瞳本身的浅色花纹，不当作反光
+MAX_HIGHLIGHT_RATIO = 0.05
+
+# 小于此面积（像素）的亮点视为噪点
+MIN_HIGHLIGHT_AREA = 4
+
+# Telea图像修复半径
+INPAINT_RADIUS = 3
+
+
+def _highlight_blobs(
+    texture: np.ndarray,
+    threshold: int,
+    max_ratio: float
+) -> Tuple[np.ndarray, list]:
+    """高光蒙版及各块反光（已膨胀）的外接框 [(x1, y1, x2, y2), ...]"""
+    h, w = texture.shape[:2]
+    has_alpha = texture.shape[2] == 4
+    gray = cv2.cvtColor(texture, cv2.COLOR_BGRA2GRAY if has_alpha else cv2.COLOR_BGR2GRAY)
+    bright = gray > threshold
+    if has_alpha:
+        opaque = texture[:, :, 3] > 0
+        bright &= opaque
+        area = max(1, int(np.count_nonzero(opaque)))
+    else:
+        area = gray.size
+
+    mask = np.zeros((h, w), dtype=np.uint8)
+    if not bright.any():
+        return mask, []
+
+    # 去掉大面积亮斑（浅色花纹）和零星噪点，只保留成块的反光
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(
+        bright.astype(np.uint8), connectivity=8
+    )
+    boxes = []
+    for i, (x, y, bw, bh, size) in enumerate(stats):
+        if i == 0 or size < MIN_HIGHLIGHT_AREA or size > area * max_ratio:
+            continue
+        mask[y:y + bh, x:x + bw][labels[y:y + bh, x:x + bw] == i] = 255
+        boxes.append((max(0, x - 2), max(0, y - 2), min(w, x + bw + 2), min(h, y + bh + 2)))
+
+    # 膨胀一圈覆盖光晕（5x5核，外接框已相应外扩2像素）
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    blobs = mask.copy()
+    for x1, y1, x2, y2 in boxes:
+        x1, y1 = max(0, x1 - 2), max(0, y1 - 2)
+        x2, y2 = min(w, x2 + 2), min(h, y2 + 2)
+        np.maximum(mask[y1:y2, x1:x2], cv2.dilate(blobs[y1:y2, x1:x2], kernel),
+                   out=mask[y1:y2, x1:x2])
+
+    return mask, boxes
+
+
+def highlight_mask(
+    texture: np.ndarray,
+    threshold: int = HIGHLIGHT_THRESHOLD,
+    max_ratio: float = MAX_HIGHLIGHT_RATIO
+) -> np.ndarray:
+    """
+    检测纹理上的镜面反光
+
+    Args:
+        texture: BGR或BGRA纹理（BGRA时只在不透明区域内检测）
+        threshold: 灰度阈值
+        max_ratio: 单个亮斑面积上限（相对不透明区域），更小的噪点由 MIN_HIGHLIGHT_AREA 过滤
+
+    Returns:
+        uint8 蒙版，255 为反光（已膨胀一圈覆盖光晕）
+    """
+    return _highlight_blobs(texture, threshold, max_ratio)[0]
+
+
+def clean_lens_texture(
+    texture: np.ndarray,
+    threshold: int = HIGHLIGHT_THRESHOLD
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    去除纹理上的镜面反光（Telea图像修复），Alpha通道保持不变
+
+    Returns:
+        (干净纹理, 高光蒙版)
+    """
+    mask, boxes = _highlight_blobs(texture, threshold, MAX_HIGHLIGHT_RATIO)
+    if not boxes:
+        return texture, mask
+
+    # 只在每块反光外扩修复半径的小方框内修复，不处理整张纹理
+    result = texture.copy()
+    h, w = mask.shape
+    pad = INPAINT_RADIUS + 2
+    for x1, y1, x2, y2 in boxes:
+        x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+        x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
+        box = result[y1:y2, x1:x2]
+        bgr = np.ascontiguousarray(box[:, :, :3])
+        box[:, :, :3] = cv2.inpaint(bgr, mask[y1:y2, x1:x2], INPAINT_RADIUS, cv2.INPAINT_TELEA)
+
+    return result, mask
+
+
+def highlight_path(asset_path: str) -> str:
+    """素材对应的高光蒙版路径"""
+    return os.path.splitext(asset_path)[0] + ".highlight.png"
+
+
+def _write_png(path: str, image: np.ndarray) -> bool:
+    """使用numpy写出PNG，支持中文路径"""
+    ok, data = cv2.imencode('.png', image)
+    if ok:
+        data.tofile(path)
+    return ok
+
+
+def save_lens_asset(path: str, texture: np.ndarray, mask: np.ndarray) -> bool:
+    """
+    保存干净纹理及其高光蒙版
+
+    Returns:
+        是否写出成功
+    """
+    return _write_png(path, texture) and _write_png(highlight_path(path), mask)
+
+
+def load_lens_asset(
+    path: str,
+    threshold: int = HIGHLIGHT_THRESHOLD
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    读取美瞳素材
+
+    有高光蒙版的素材视为已入库处理过，直接返回；
+    旧素材（没有蒙版）在内存中现场去反光
+
+    Returns:
+        (干净纹理, 高光蒙版)，无法读取时返回None
+    """
+    try:
+        texture = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    except OSError:
+        return None
+    if texture is None:
+        return None
+    if texture.ndim == 2:
+        texture = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+
+    mask_file = highlight_path(path)
+    if os.path.exists(mask_file):
+        mask = cv2.imdecode(np.fromfile(mask_file, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if mask is not None and mask.shape == texture.shape[:2]:
+            return texture, mask
+
+    return clean_lens_texture(texture, threshold)
@@ -8,6 +8,7 @@ import numpy as np
 import argparse
 import os
 from pathlib import Path
+from typing import Optional
 
 from iris_detector import IrisDetector, EyeDetectionResult
 from lens_overlay import ContactLensOverlay, extract_lens_from_eye_image
@@ -26,7 +27,11 @@ def replace_contact_lens(
     blend_mode: str = "normal",
     opacity: float = 1.0,
     protect_center: bool = True,
-    show_preview: bool = False
+    show_preview: bool = False,
+    sd_image_codec: str = "png",
+    sd_mask_codec: str = "png",
+    seam_threshold: Optional[float] = None,
+    local_mode: str = "telea"
 ) -> np.ndarray:
     """
     完整的美瞳替换流程
@@ -44,6 +49,10 @@ def replace_contact_lens(
         opacity: 不透明度 (0.0-1.0)
         protect_center: SD融合时是否保护中心纹理
         show_preview: 是否显示预览窗口
+        sd_image_codec: SD请求中图像的传输编码 ("png", "webp")
+        sd_mask_codec: SD请求中蒙版的传输编码 ("png", "webp", "bits")
+        seam_threshold: 接缝分数阈值，接缝已干净的眼睛跳过SD (None=全部送SD)
+        local_mode: SD不可用时的本地修复模式 ("telea", "multiband", "seamless")
         
     Returns:
         处理后的图像
@@ -122,20 +131,33 @@ def replace_contact_lens(
         print(f"      API地址: {sd_api_url}")
         print(f"      重绘强度: {denoising_strength}")
         print(f"      保护中心: {protect_center}")
+        if seam_threshold is not None:
+            print(f"      接缝阈值: {seam_threshold}")
         
-        refiner = SDInpaintingRefiner(api_url=sd_api_url)
+        refiner = SDInpaintingRefiner(
+            api_url=sd_api_url,
+            image_codec=sd_image_codec,
+            mask_codec=sd_mask_codec
+        )
         
         if refiner.check_api_available():
             result = refiner.refine(
                 result, 
                 detection_result,
                 denoising_strength=denoising_strength,
-                protect_center=protect_center
+                protect_center=protect_center,
+                reference=model_image,
+                seam_threshold=seam_threshold
             )
+            if seam_threshold is not None:
+                print(f"      SD调用: {refiner.sd_calls} 次, 节省: {refiner.sd_calls_saved} 次"
+                      f" (跳过 {refiner.eyes_skipped} 只眼)")
         else:
-            print("      SD API不可用，使用本地修复...")
-            local_refiner = LocalInpaintRefiner()
-            result = local_refiner.refine(result, detection_result)
+            print(f"      SD API不可用，使用本地修复 ({local_mode})...")
+            local_refiner = LocalInpaintRefiner(mode=local_mode)
+            result = local_refiner.refine(result, detection_result, reference=model_image)
+        
+        refiner.close()
     else:
         print("\n[4/5] 跳过SD边缘融合 (use_sd_refinement=False)")
     
@@ -172,6 +194,161 @@ def replace_contact_lens(
     return result
 
 
+def replace_contact_lens_batch(
+    model_dir: str,
+    lens_image_path: str,
+    output_dir: str,
+    use_sd_refinement: bool = True,
+    sd_api_url: str = "http://127.0.0.1:7860",
+    denoising_strength: float = 0.35,
+    preserve_highlights: bool = True,
+    highlight_threshold: int = 220,
+    blend_mode: str = "normal",
+    opacity: float = 1.0,
+    protect_center: bool = True,
+    sd_image_codec: str = "png",
+    sd_mask_codec: str = "png",
+    seam_threshold: Optional[float] = None,
+    local_mode: str = "telea",
+    sd_batch_size: int = 4
+) -> int:
+    """
+    批量美瞳替换：同一美瞳应用到目录下所有模特图
+    
+    SD融合使用合并请求，每个请求最多包含 sd_batch_size 个眼睛裁剪；
+    图片逐张读取，凑满一组眼睛即发送并写出结果，内存中只保留一组所需的图片
+    
+    Args:
+        model_dir: 模特图片目录
+        lens_image_path: 美瞳PNG图片路径
+        output_dir: 输出目录（文件名与输入相同）
+        sd_batch_size: 每个SD请求包含的眼睛裁剪数
+        其余参数同 replace_contact_lens()
+        
+    Returns:
+        成功处理的图片数
+    """
+    if sd_batch_size < 1:
+        raise ValueError(f"sd_batch_size 必须大于0: {sd_batch_size}")
+    
+    extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+    model_paths = sorted(
+        p for p in Path(model_dir).iterdir() if p.suffix.lower() in extensions
+    )
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print("=" * 60)
+    print(f"  批量替换: {len(model_paths)} 张图片")
+    print("=" * 60)
+    
+    overlay = ContactLensOverlay(lens_image_path)
+    detector = IrisDetector()
+    
+    # SD不可用时逐张本地修复；可用时攒够一组眼睛裁剪再合并发送
+    refiner, local_refiner = None, None
+    if use_sd_refinement:
+        refiner = SDInpaintingRefiner(
+            api_url=sd_api_url,
+            image_codec=sd_image_codec,
+            mask_codec=sd_mask_codec
+        )
+        if not refiner.check_api_available():
+            print(f"  SD API不可用，使用本地修复 ({local_mode})...")
+            local_refiner = LocalInpaintRefiner(mode=local_mode)
+            refiner.close()
+            refiner = None
+    
+    # 等待SD的图片: (文件名, 已贴美瞳图像, 需要处理的眼睛)；只保留一组所需的图片，原图不保留
+    pending = []
+    pending_eyes = 0
+    written = 0
+    
+    def save(name, result):
+        nonlocal written
+        cv2.imwrite(str(output_dir / name), result)
+        written += 1
+    
+    def flush():
+        nonlocal pending_eyes
+        if not pending:
+            return
+        results = refiner.refine_batch(
+            [(composite, detection) for _, composite, detection in pending],
+            batch_size=sd_batch_size,
+            denoising_strength=denoising_strength,
+            protect_center=protect_center
+        )
+        for (name, _, _), result in zip(pending, results):
+            save(name, result)
+        pending.clear()
+        pending_eyes = 0
+    
+    for path in model_paths:
+        model_image = cv2.imread(str(path))
+        if model_image is None:
+            print(f"  跳过 (无法读取): {path.name}")
+            continue
+        detection_result = detector.detect(model_image)
+        if not detection_result.success:
+            print(f"  跳过 (未检测到人脸): {path.name}")
+            continue
+        
+        composite = overlay.apply_to_both_eyes(
+            model_image,
+            detection_result,
+            preserve_highlights=preserve_highlights,
+            highlight_threshold=highlight_threshold,
+            blend_mode=blend_mode,
+            opacity=opacity
+        )
+        print(f"  已叠加: {path.name}")
+        
+        if local_refiner is not None:
+            save(path.name, local_refiner.refine(composite, detection_result, reference=model_image))
+            continue
+        if refiner is None:
+            save(path.name, composite)
+            continue
+        
+        # 接缝门控在此完成（需要原图），之后原图即可释放
+        if seam_threshold is not None:
+            detection_result = refiner.gate_clean_eyes(
+                composite, model_image, detection_result, seam_threshold
+            )
+            if detection_result is None:
+                save(path.name, composite)
+                continue
+        
+        pending.append((path.name, composite, detection_result))
+        pending_eyes += sum(eye is not None for eye in (detection_result.left_eye, detection_result.right_eye))
+        # 眼睛数凑满整组时发送；单眼/双眼混合一直凑不整时，最多攒两组
+        if pending_eyes % sd_batch_size == 0 or pending_eyes >= 2 * sd_batch_size:
+            flush()
+    
+    detector.close()
+    
+    if refiner is not None:
+        flush()
+        print(f"  SD请求: {refiner.sd_calls} 次 (跳过 {refiner.eyes_skipped} 只眼，"
+              f"其中 {refiner.sd_calls_saved} 张图两眼接缝都已干净)")
+        refiner.close()
+    
+    print(f"\n完成: {written}/{len(model_paths)} 张，输出目录: {output_dir}")
+    return written
+
+
+def positive_int(value: str) -> int:
+    """argparse类型：大于0的整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要整数: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"需要大于0的整数: {value}")
+    return number
+
+
 def main():
     """命令行入口"""
     parser = argparse.ArgumentParser(
@@ -190,6 +367,12 @@ def main():
   
   # 从眼睛图片提取美瞳纹理
   python main.py --extract eye_photo.jpg lens_extracted.png
+  
+  # 批量提取目录下所有试戴图（生成 manifest.json 和复核名单）
+  python main.py --extract supplier_photos/ lenses/
+  
+  # 批量处理目录下所有模特图（SD请求合并发送）
+  python main.py --batch models/ lens.png results/ --sd-batch-size 8
         """
     )
     
@@ -199,6 +382,11 @@ def main():
         action="store_true",
         help="提取模式：从眼睛照片中提取美瞳纹理"
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="批量模式：input1为模特图目录，output为输出目录"
+    )
     
     # 输入输出
     parser.add_argument(
@@ -263,6 +451,36 @@ def main():
         action="store_true",
         help="SD融合时不保护中心纹理"
     )
+    parser.add_argument(
+        "--sd-image-codec",
+        choices=["png", "webp"],
+        default="png",
+        help="SD请求图像传输编码 (默认: png)"
+    )
+    parser.add_argument(
+        "--sd-mask-codec",
+        choices=["png", "webp", "bits"],
+        default="png",
+        help="SD请求蒙版传输编码, bits=1位黑白PNG (默认: png)"
+    )
+    parser.add_argument(
+        "--seam-threshold",
+        type=float,
+        default=None,
+        help="接缝分数低于此值的眼睛跳过SD (推荐1.0, 默认: 不跳过)"
+    )
+    parser.add_argument(
+        "--local-mode",
+        choices=["telea", "multiband", "seamless"],
+        default="telea",
+        help="SD不可用时的本地边缘修复模式 (默认: telea)"
+    )
+    parser.add_argument(
+        "--sd-batch-size",
+        type=positive_int,
+        default=4,
+        help="批量模式下每个SD请求包含的眼睛数 (默认: 4)"
+    )
     
     # 其他
     parser.add_argument(
@@ -276,9 +494,41 @@ def main():
     # 提取模式
     if args.extract:
         print("提取模式：从眼睛照片中提取美瞳纹理")
-        extract_lens_from_eye_image(args.input1, args.input2)
+        if os.path.isdir(args.input1):
+            # 目录：批量提取，input2 为素材输出目录
+            from extract_lenses import extract_lenses
+            extract_lenses(args.input1, args.input2)
+        else:
+            extract_lens_from_eye_image(args.input1, args.input2)
         return
     
+    # 批量模式
+    if args.batch:
+        output_dir = args.output if args.output != "result.jpg" else "results"
+        try:
+            replace_contact_lens_batch(
+                model_dir=args.input1,
+                lens_image_path=args.input2,
+                output_dir=output_dir,
+                use_sd_refinement=not args.no_sd,
+                sd_api_url=args.sd_url,
+                denoising_strength=args.denoise,
+                preserve_highlights=not args.no_highlight,
+                highlight_threshold=args.highlight_threshold,
+                blend_mode=args.blend,
+                opacity=args.opacity,
+                protect_center=not args.no_protect_center,
+                sd_image_codec=args.sd_image_codec,
+                sd_mask_codec=args.sd_mask_codec,
+                seam_threshold=args.seam_threshold,
+                local_mode=args.local_mode,
+                sd_batch_size=args.sd_batch_size
+            )
+        except Exception as e:
+            print(f"\n错误: {e}")
+            return 1
+        return 0
+    
     # 替换模式
     try:
         replace_contact_lens(
@@ -293,7 +543,11 @@ def main():
             blend_mode=args.blend,
             opacity=args.opacity,
             protect_center=not args.no_protect_center,
-            show_preview=args.preview
+            show_preview=args.preview,
+            sd_image_codec=args.sd_image_codec,
+            sd_mask_codec=args.sd_mask_codec,
+            seam_threshold=args.seam_threshold,
+            local_mode=args.local_mode
         )
     except Exception as e:
         print(f"\n错误: {e}")
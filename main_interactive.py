@@ -12,6 +12,9 @@ import cv2
 import numpy as np
 import os
 
+from lens_texture import clean_lens_texture, save_lens_asset
+from radial_mask import extract_quadrant_lens
+
 # ============================================
 # 全局配置
 # ============================================
@@ -206,36 +209,14 @@ def step3_extract_and_apply():
     print("\n正在提取美瞳纹理...")
     img_source = cv2.imread(INPUT_SOURCE)
     
-    max_r = max(source_top, source_bottom, source_left, source_right)
-    x1 = max(0, source_cx - max_r)
-    y1 = max(0, source_cy - max_r)
-    x2 = min(img_source.shape[1], source_cx + max_r)
-    y2 = min(img_source.shape[0], source_cy + max_r)
-    
-    cropped = img_source[y1:y2, x1:x2].copy()
-    ch, cw = cropped.shape[:2]
-    center_x = source_cx - x1
-    center_y = source_cy - y1
-    
-    # 创建Alpha蒙版
-    alpha = np.zeros((ch, cw), dtype=np.float32)
-    for y in range(ch):
-        for x in range(cw):
-            dx, dy = x - center_x, y - center_y
-            ry = source_top if dy < 0 else source_bottom
-            rx = source_left if dx < 0 else source_right
-            if rx > 0 and ry > 0:
-                dist = np.sqrt((dx / rx)**2 + (dy / ry)**2)
-                if dist <= 1:
-                    if dist > 1 - source_feather / max(rx, ry):
-                        alpha[y, x] = (1 - dist) / (source_feather / max(rx, ry))
-                    else:
-                        alpha[y, x] = 1.0
-    
-    alpha = (alpha * 255).astype(np.uint8)
-    texture = np.dstack([cropped, alpha])
-    
-    cv2.imwrite(f'{OUTPUT_DIR}/extracted_texture.png', texture)
+    texture = extract_quadrant_lens(
+        img_source, source_cx, source_cy,
+        source_top, source_bottom, source_left, source_right, source_feather
+    )
+    # 提取时一次性去除源图反光，后面直接缩放混合
+    texture, highlight = clean_lens_texture(texture)
+    
+    save_lens_asset(f'{OUTPUT_DIR}/extracted_texture.png', texture, highlight)
     print(f"  已保存: {OUTPUT_DIR}/extracted_texture.png")
     
     # 应用到目标
@@ -269,12 +250,6 @@ def step3_extract_and_apply():
     overlay_bgr = overlay_roi[:, :, :3].astype(float)
     overlay_alpha = overlay_roi[:, :, 3:4].astype(float) / 255.0
     
-    # 排除源纹理高光
-    overlay_gray = cv2.cvtColor(overlay_roi[:, :, :3], cv2.COLOR_BGR2GRAY)
-    source_highlight = (overlay_gray > 220).astype(float)
-    source_highlight = cv2.GaussianBlur(source_highlight, (5, 5), 0)[:, :, np.newaxis]
-    overlay_alpha = overlay_alpha * (1 - source_highlight * 0.7)
-    
     # 混合
     blended = overlay_alpha * overlay_bgr + (1 - overlay_alpha) * base_roi
     img_target[py1:py2, px1:px2] = np.clip(blended, 0, 255).astype(np.uint8)
@@ -2,7 +2,7 @@
 手动定位右下角眼睛 - 带预览功能
 """
 import cv2
-import numpy as np
+from recolor import CORAL_BROWN, EyeSpec, recolor_eyes
 
 # ============================================
 # 调整这些参数来定位右下角眼睛！
@@ -12,8 +12,6 @@ EYE_CY = 654      # 眼球中心Y坐标（再往下一点）
 EYE_RADIUS = 26   # 虹膜半径
 # ============================================
 
-CORAL_BROWN = (130, 155, 185)
-
 
 def create_preview(img, cx, cy, radius):
     """创建预览图，显示定位圆圈"""
@@ -36,35 +34,6 @@ def create_preview(img, cx, cy, radius):
     return crop_large
 
 
-def apply_color(image, cx, cy, radius, color, intensity=0.8, feather=8):
-    """应用颜色到指定位置"""
-    result = image.copy()
-    h, w = image.shape[:2]
-    
-    y, x = np.ogrid[:h, :w]
-    dist = np.sqrt((x - cx)**2 + (y - cy)**2)
-    
-    mask = np.zeros((h, w), dtype=np.float32)
-    inner = radius - feather
-    outer = radius + feather
-    
-    mask[dist < inner] = 1.0
-    trans = (dist >= inner) & (dist < outer)
-    if np.any(trans):
-        mask[trans] = 1.0 - (dist[trans] - inner) / (outer - inner)
-    mask *= intensity
-    
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.float32)
-    target = np.zeros((1,1,3), dtype=np.uint8)
-    target[0,0] = color
-    lab_t = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype(np.float32)[0,0]
-    
-    lab[:,:,1] = lab[:,:,1] * (1 - mask) + lab_t[1] * mask
-    lab[:,:,2] = lab[:,:,2] * (1 - mask) + lab_t[2] * mask
-    
-    return cv2.cvtColor(np.clip(lab, 0, 255).astype(np.uint8), cv2.COLOR_LAB2BGR)
-
-
 if __name__ == "__main__":
     # 读取已处理好模特双眼的图片
     img = cv2.imread('output/result_coral_brown.jpg')
@@ -81,7 +50,7 @@ if __name__ == "__main__":
     print('Check the preview to see if the circle is correctly positioned!')
     
     # 2. 应用颜色
-    result = apply_color(img, EYE_CX, EYE_CY, EYE_RADIUS, CORAL_BROWN, 0.8, 8)
+    result = recolor_eyes(img, [EyeSpec((EYE_CX, EYE_CY), EYE_RADIUS, CORAL_BROWN, 0.8, 8)])
     cv2.imwrite('output/result_final.jpg', result)
     print('[RESULT] Saved: output/result_final.jpg')
     
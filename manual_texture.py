@@ -3,6 +3,8 @@
 """
 import cv2
 import numpy as np
+from lens_texture import clean_lens_texture
+from radial_mask import extract_quadrant_lens, feather_mask
 
 # ============================================
 # 第一步：从source_eye.jpg提取完整美瞳（使用手动定位的四边配置）
@@ -27,90 +29,30 @@ SCALE_FACTOR = 1.1  # 缩放倍数（稍微放大以覆盖清除区域）
 
 
 def extract_full_lens(image_path, cx, cy, top, bottom, left, right, feather):
-    """从图片中提取四边可调的不规则形状美瞳"""
+    """从图片中提取四边可调的不规则形状美瞳（已去除源图反光）"""
     img = cv2.imread(image_path)
-    h, w = img.shape[:2]
-    
-    # 裁剪区域（使用最大距离）
-    max_r = max(top, bottom, left, right)
-    x1 = max(0, cx - max_r)
-    y1 = max(0, cy - max_r)
-    x2 = min(w, cx + max_r)
-    y2 = min(h, cy + max_r)
-    
-    cropped = img[y1:y2, x1:x2].copy()
-    ch, cw = cropped.shape[:2]
-    center_x = cx - x1
-    center_y = cy - y1
-    
-    # 创建四边可调的Alpha蒙版
-    alpha = np.zeros((ch, cw), dtype=np.float32)
-    
-    for y in range(ch):
-        for x in range(cw):
-            dx = x - center_x
-            dy = y - center_y
-            
-            # 根据位置选择对应的边距离
-            if dy < 0:  # 上半部分
-                ry = top
-            else:  # 下半部分
-                ry = bottom
-                
-            if dx < 0:  # 左半部分
-                rx = left
-            else:  # 右半部分
-                rx = right
-            
-            # 计算椭圆距离（归一化）
-            if rx > 0 and ry > 0:
-                ellipse_dist = np.sqrt((dx / rx)**2 + (dy / ry)**2)
-            else:
-                ellipse_dist = 999
-            
-            if ellipse_dist > 1:
-                alpha[y, x] = 0
-            elif ellipse_dist > 1 - feather / max(rx, ry):
-                # 边缘羽化
-                alpha[y, x] = (1 - ellipse_dist) / (feather / max(rx, ry))
-            else:
-                alpha[y, x] = 1.0
-    
-    alpha = (alpha * 255).astype(np.uint8)
-    
-    # 合并BGRA
-    result = np.dstack([cropped, alpha])
-    return result
+    texture = extract_quadrant_lens(img, cx, cy, top, bottom, left, right, feather)
+    texture, _ = clean_lens_texture(texture)
+    return texture
 
 
 def clear_iris_to_white(image, cx, cy, radius, feather=5):
     """将指定区域清除为纯白色（使用手动定位的参数）"""
     result = image.copy()
-    h, w = image.shape[:2]
-    
-    # 使用纯白色
-    pure_white = np.array([255, 255, 255], dtype=np.uint8)
     
     # 稍微缩小清除范围，避免白边
     clear_radius = int(radius * 0.85)
     
-    # 创建渐变遮罩
-    y, x = np.ogrid[:h, :w]
-    dist = np.sqrt((x - cx)**2 + (y - cy)**2)
-    
-    mask = np.zeros((h, w), dtype=np.float32)
-    inner = clear_radius - feather
-    outer = clear_radius
-    
-    # 完全覆盖内部区域
-    mask[dist < inner] = 1.0
-    transition = (dist >= inner) & (dist < outer)
-    if np.any(transition):
-        mask[transition] = 1.0 - (dist[transition] - inner) / (outer - inner)
+    # 渐变遮罩：clear_radius - feather 以内完全覆盖，到 clear_radius 降到0
+    box, mask = feather_mask(image.shape, (cx, cy), clear_radius - feather / 2, feather / 2)
+    if box is None:
+        return result
+    x1, y1, x2, y2 = box
+    mask = mask[:, :, np.newaxis]
     
-    # 应用纯白色
-    for c in range(3):
-        result[:, :, c] = (result[:, :, c] * (1 - mask) + pure_white[c] * mask).astype(np.uint8)
+    # 应用纯白色（只处理遮罩所在方框）
+    roi = result[y1:y2, x1:x2]
+    roi[:] = (roi * (1 - mask) + 255 * mask).astype(np.uint8)
     
     return result
 
@@ -179,13 +121,6 @@ def apply_texture_to_eye(base_image, texture, target_cx, target_cy, target_radiu
     else:
         target_highlight_mask = None
     
-    # 检测并排除源纹理中的高光区域（只排除非常亮的窗户反光边框）
-    overlay_gray = cv2.cvtColor(overlay_roi[:, :, :3], cv2.COLOR_BGR2GRAY)
-    source_highlight = (overlay_gray > 220).astype(float)  # 只排除非常亮的部分
-    source_highlight = cv2.GaussianBlur(source_highlight, (5, 5), 0)[:, :, np.newaxis]
-    # 在源纹理高光处部分降低透明度
-    overlay_alpha = overlay_alpha * (1 - source_highlight * 0.7)
-    
     # Alpha混合
     blended = overlay_alpha * overlay_bgr + (1 - overlay_alpha) * base_roi
     
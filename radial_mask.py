@@ -0,0 +1,189 @@
+"""
+圆形/椭圆渐变蒙版工厂
+缓存以整数像素为中心的平方距离场和按（量化）半径/羽化生成的圆盘蒙版，
+调用时只需在缓存的圆盘上切出与图像相交的部分，不再对整图求 sqrt；
+另提供四边半径可调的椭圆蒙版（手动定位提取美瞳用）
+"""
+
+import math
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# 半径与羽化的量化步长（像素）：同一档内的蒙版共用缓存
+MASK_QUANTUM = 1 / 32
+
+
+@lru_cache(maxsize=8)
+def _squared_distance_field(extent: int) -> np.ndarray:
+    """(2*extent+1)^2 的整数平方距离场，中心为 (extent, extent)"""
+    offsets = np.arange(-extent, extent + 1, dtype=np.int32)
+    field = offsets[np.newaxis, :] ** 2 + offsets[:, np.newaxis] ** 2
+    field.setflags(write=False)
+    return field
+
+
+@lru_cache(maxsize=32)
+def _disk_mask(radius_q: int, feather_q: int) -> np.ndarray:
+    """
+    量化参数对应的完整圆盘蒙版（float32，只读）
+
+    距离 <= radius-feather 为1，到 radius+feather 线性降到0；
+    查找表以整数平方距离为下标，平方距离场上取值即为蒙版，结果是精确的
+    """
+    radius = radius_q * MASK_QUANTUM
+    feather = feather_q * MASK_QUANTUM
+    extent = max(0, math.ceil(radius + feather))
+
+    dist = np.sqrt(np.arange(2 * extent * extent + 1, dtype=np.float64))
+    if feather > 0:
+        lut = np.clip(1.0 - (dist - (radius - feather)) / (2 * feather), 0, 1)
+    else:
+        lut = (dist < radius).astype(np.float64)
+
+    mask = lut.astype(np.float32)[_squared_distance_field(extent)]
+    mask.setflags(write=False)
+    return mask
+
+
+def feather_mask(
+    shape: tuple,
+    center: tuple,
+    radius: float,
+    feather: float
+) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[np.ndarray]]:
+    """
+    圆形渐变蒙版（局部）
+
+    半径 radius - feather 以内为1，到 radius + feather 线性降到0，
+    圆心取整到像素，半径/羽化按 MASK_QUANTUM 量化
+
+    Args:
+        shape: 整图尺寸
+        center: 圆心 (x, y)
+        radius: 渐变中点半径
+        feather: 渐变半宽
+
+    Returns:
+        ((x1, y1, x2, y2), mask)，圆完全在图外时返回 (None, None)；
+        mask 为缓存的只读视图，需要修改时先 copy()
+    """
+    h, w = shape[:2]
+    disk = _disk_mask(round(radius / MASK_QUANTUM), round(max(0.0, feather) / MASK_QUANTUM))
+    extent = disk.shape[0] // 2
+
+    cx, cy = int(round(center[0])), int(round(center[1]))
+    x1, y1 = max(0, cx - extent), max(0, cy - extent)
+    x2, y2 = min(w, cx + extent + 1), min(h, cy + extent + 1)
+    if x1 >= x2 or y1 >= y2:
+        return None, None
+
+    ox, oy = cx - extent, cy - extent
+    return (x1, y1, x2, y2), disk[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+
+
+def circular_alpha(
+    height: int,
+    width: int,
+    center: Tuple[int, int],
+    inner_radius: float,
+    outer_radius: float
+) -> np.ndarray:
+    """
+    圆形Alpha通道：inner_radius 以内为255，到 outer_radius 线性降到0
+
+    Returns:
+        (height, width) uint8 蒙版
+    """
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    box, mask = feather_mask(
+        (height, width), center,
+        (inner_radius + outer_radius) / 2, (outer_radius - inner_radius) / 2
+    )
+    if box is not None:
+        x1, y1, x2, y2 = box
+        alpha[y1:y2, x1:x2] = (mask * 255 + 0.5).astype(np.uint8)
+    return alpha
+
+
+def quadrant_ellipse_alpha(
+    height: int,
+    width: int,
+    center: Tuple[int, int],
+    top: int,
+    bottom: int,
+    left: int,
+    right: int,
+    feather: int
+) -> np.ndarray:
+    """
+    四边半径可调的椭圆Alpha蒙版
+
+    每个象限用各自的 (左/右, 上/下) 半径计算归一化椭圆距离 d，
+    d > 1 为0，1 - feather/max(rx, ry) 以内为255，其间线性过渡
+
+    Args:
+        height, width: 蒙版尺寸
+        center: 椭圆中心 (x, y)
+        top, bottom, left, right: 中心到四边的距离
+        feather: 边缘羽化宽度（像素）
+
+    Returns:
+        (height, width) uint8 蒙版
+    """
+    cx, cy = center
+    dy = np.arange(height, dtype=np.float64)[:, np.newaxis] - cy
+    dx = np.arange(width, dtype=np.float64)[np.newaxis, :] - cx
+
+    # 根据位置选择对应的边距离
+    ry = np.where(dy < 0, top, bottom).astype(np.float64)
+    rx = np.where(dx < 0, left, right).astype(np.float64)
+    valid = (rx > 0) & (ry > 0)
+    ry, rx = np.where(ry > 0, ry, 1), np.where(rx > 0, rx, 1)
+
+    dist = np.sqrt((dx / rx) ** 2 + (dy / ry) ** 2)
+    edge = feather / np.maximum(rx, ry)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ramp = (1 - dist) / edge
+    alpha = np.where(dist > 1, 0.0, np.where(dist > 1 - edge, ramp, 1.0))
+    alpha = np.where(valid, alpha, 0.0).astype(np.float32)
+
+    return (alpha * 255).astype(np.uint8)
+
+
+def extract_quadrant_lens(
+    image: np.ndarray,
+    cx: int,
+    cy: int,
+    top: int,
+    bottom: int,
+    left: int,
+    right: int,
+    feather: int
+) -> np.ndarray:
+    """
+    按四边距离裁剪美瞳区域并生成椭圆Alpha
+
+    Returns:
+        BGRA 纹理（裁剪范围为中心外扩最大边距离，超出图像的部分被截掉）
+    """
+    h, w = image.shape[:2]
+
+    # 裁剪区域（使用最大距离）
+    max_r = max(top, bottom, left, right)
+    x1 = max(0, cx - max_r)
+    y1 = max(0, cy - max_r)
+    x2 = min(w, cx + max_r)
+    y2 = min(h, cy + max_r)
+
+    cropped = image[y1:y2, x1:x2]
+    ch, cw = cropped.shape[:2]
+    alpha = quadrant_ellipse_alpha(
+        ch, cw, (cx - x1, cy - y1), top, bottom, left, right, feather
+    )
+
+    # 合并BGRA
+    return np.dstack([cropped, alpha])
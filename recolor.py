@@ -0,0 +1,202 @@
+"""
+虹膜改色引擎 - 按眼睛参数列表一次性完成LAB色度混合
+只在各眼睛方框的并集内做颜色空间转换，其余像素保持原值
+"""
+
+import argparse
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from radial_mask import feather_mask
+
+
+# 粉珊棕 (BGR格式)：暖棕色带粉调
+CORAL_BROWN = (130, 155, 185)
+
+
+@dataclass
+class EyeSpec:
+    """单只眼睛的改色参数"""
+    center: Tuple[int, int]                 # 虹膜中心 (x, y)
+    radius: float                           # 虹膜半径
+    color: Tuple[int, int, int] = CORAL_BROWN  # 目标颜色 (BGR)
+    intensity: float = 0.5                  # 色度混合强度 (0-1)
+    feather: int = 18                       # 边缘渐变半宽
+
+
+def _merge_boxes(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """把相交的方框合并成外接框，直到互不相交"""
+    merged = list(boxes)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    merged[i] = (min(a[0], b[0]), min(a[1], b[1]),
+                                 max(a[2], b[2]), max(a[3], b[3]))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def recolor_eyes(image: np.ndarray, specs: Sequence[EyeSpec]) -> np.ndarray:
+    """
+    对多只眼睛做LAB色度混合（保留L亮度，只混合a/b）
+
+    相交的眼睛方框合并后只转换一次LAB，多只眼按列表顺序叠加混合
+
+    Args:
+        image: BGR图像
+        specs: 眼睛参数列表
+
+    Returns:
+        改色后的图像（蒙版覆盖不到的像素与原图一致）
+    """
+    result = image.copy()
+
+    eyes = []
+    for spec in specs:
+        box, mask = feather_mask(image.shape, spec.center, spec.radius, spec.feather)
+        if box is not None:
+            eyes.append((spec, box, mask))
+
+    for gx1, gy1, gx2, gy2 in _merge_boxes([box for _, box, _ in eyes]):
+        lab = cv2.cvtColor(image[gy1:gy2, gx1:gx2], cv2.COLOR_BGR2LAB).astype(np.float32)
+        covered = np.zeros(lab.shape[:2], dtype=bool)
+
+        for spec, (x1, y1, x2, y2), mask in eyes:
+            if not (gx1 <= x1 and x2 <= gx2 and gy1 <= y1 and y2 <= gy2):
+                continue
+            target = cv2.cvtColor(np.uint8([[spec.color]]), cv2.COLOR_BGR2LAB)[0, 0].astype(np.float32)
+
+            region = lab[y1 - gy1:y2 - gy1, x1 - gx1:x2 - gx1]
+            blend = (mask * spec.intensity)[:, :, np.newaxis]
+            region[:, :, 1:] = region[:, :, 1:] * (1 - blend) + target[1:] * blend
+            covered[y1 - gy1:y2 - gy1, x1 - gx1:x2 - gx1] |= mask > 0
+
+        blended = cv2.cvtColor(np.clip(lab, 0, 255).astype(np.uint8), cv2.COLOR_LAB2BGR)
+        result[gy1:gy2, gx1:gx2][covered] = blended[covered]
+
+    return result
+
+
+def specs_from_detection(
+    detection_result,
+    color: Tuple[int, int, int] = CORAL_BROWN,
+    intensity: float = 0.5,
+    feather: int = 18,
+    radius_scale: float = 1.1
+) -> List[EyeSpec]:
+    """由眼球检测结果生成双眼参数（半径稍微扩大以覆盖虹膜边缘）"""
+    specs = []
+    for eye_data in [detection_result.left_eye, detection_result.right_eye]:
+        if eye_data is None:
+            continue
+        specs.append(EyeSpec(
+            eye_data.center_px, eye_data.radius * radius_scale,
+            color, intensity, feather
+        ))
+    return specs
+
+
+def load_specs(
+    path: str,
+    color: Tuple[int, int, int] = CORAL_BROWN,
+    intensity: float = 0.5,
+    feather: int = 18
+) -> List[EyeSpec]:
+    """
+    从JSON读取眼睛参数
+
+    格式为列表，每项 {"center": [x, y], "radius": r, "color": [b, g, r],
+    "intensity": 0.8, "feather": 8}，color/intensity/feather 可省略（用传入的默认值）
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+
+    return [
+        EyeSpec(
+            tuple(int(v) for v in item['center']),
+            float(item['radius']),
+            tuple(int(v) for v in item.get('color', color)),
+            float(item.get('intensity', intensity)),
+            int(item.get('feather', feather))
+        )
+        for item in items
+    ]
+
+
+def _parse_color(text: str) -> Tuple[int, int, int]:
+    """解析 "B,G,R" 颜色参数"""
+    values = tuple(int(v) for v in text.split(','))
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError(f"颜色格式应为 B,G,R: {text}")
+    return values
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="虹膜改色 - 按眼睛参数做LAB色度混合",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  # 自动检测双眼
+  python recolor.py input/model.jpg output/result_coral_brown.jpg --detect
+
+  # 按JSON中的坐标处理（例如右下角眼睛特写）
+  python recolor.py output/result_coral_brown.jpg output/result_final.jpg --specs eyes.json
+        """
+    )
+    parser.add_argument("input", help="输入图片路径")
+    parser.add_argument("output", help="输出图片路径")
+    parser.add_argument("--specs", help="眼睛参数JSON文件")
+    parser.add_argument("--detect", action="store_true", help="用眼球检测结果作为眼睛参数")
+    parser.add_argument("--color", type=_parse_color, default=CORAL_BROWN,
+                        help="默认目标颜色 B,G,R (默认: 130,155,185)")
+    parser.add_argument("--intensity", type=float, default=0.5, help="默认混合强度 (默认: 0.5)")
+    parser.add_argument("--feather", type=int, default=18, help="默认边缘渐变半宽 (默认: 18)")
+    parser.add_argument("--radius-scale", type=float, default=1.1,
+                        help="检测半径放大倍数 (默认: 1.1)")
+    args = parser.parse_args(argv)
+
+    if not args.specs and not args.detect:
+        parser.error("需要指定 --specs 或 --detect")
+
+    image = cv2.imread(args.input)
+    if image is None:
+        raise ValueError(f"无法读取图片: {args.input}")
+
+    specs = []
+    if args.detect:
+        from iris_detector import IrisDetector
+
+        detector = IrisDetector()
+        result = detector.detect(image)
+        detector.close()
+        if not result.success:
+            raise ValueError("未检测到人脸")
+        specs += specs_from_detection(
+            result, args.color, args.intensity, args.feather, args.radius_scale
+        )
+    if args.specs:
+        specs += load_specs(args.specs, args.color, args.intensity, args.feather)
+
+    for spec in specs:
+        print(f"Processing eye at {spec.center}, r={spec.radius:.1f}")
+
+    output = recolor_eyes(image, specs)
+    cv2.imwrite(args.output, output)
+    print(f"[DONE] Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+圈选区域的几何处理
+手绘折线用 Douglas-Peucker 简化；圆形模式画出的带豁口圆弧可以识别出来，
+只保存 (圆心, 半径, 豁口角度)，读取时再还原成点列
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# 折线简化容差（原图像素）
+SIMPLIFY_TOLERANCE = 1.0
+
+# 识别圆弧时允许的最大偏差（像素，含点坐标取整的半个像素）
+ARC_TOLERANCE = 1.5
+
+# 圆形模式圆弧的分段数（点数为分段数+1）
+ARC_SEGMENTS = 60
+
+# 简化后一个区域至少保留的点数
+MIN_REGION_POINTS = 3
+
+
+def _arc_xy(center, radius, gap_angle, segments):
+    """圆弧上各点的浮点坐标，(segments+1, 2)"""
+    gap_half = gap_angle / 2
+    start_deg = -90 + gap_half  # 从右上开始
+    end_deg = -90 - gap_half + 360  # 到左上结束
+    a = np.radians(start_deg + (end_deg - start_deg) * np.arange(segments + 1) / segments)
+    return np.column_stack([center[0] + radius * np.cos(a), center[1] + radius * np.sin(a)])
+
+
+def arc_points(
+    center: Tuple[float, float],
+    radius: float,
+    gap_angle: float,
+    segments: int = ARC_SEGMENTS
+) -> List[List[int]]:
+    """
+    生成上方留豁口的圆弧点列（圆形模式）
+
+    Args:
+        center: 圆心 (x, y)
+        radius: 半径
+        gap_angle: 上方豁口角度（度）
+        segments: 分段数
+
+    Returns:
+        [[x, y], ...]，从右上开始顺时针到左上，共 segments+1 个点
+    """
+    return _arc_xy(center, radius, gap_angle, segments).astype(int).tolist()
+
+
+def fit_arc(points, tolerance: float = ARC_TOLERANCE) -> Optional[Tuple[float, float, float, float]]:
+    """
+    判断点列是否为 arc_points 生成的圆弧（允许平移和缩放后的取整误差）
+
+    Returns:
+        (cx, cy, radius, gap_angle)，不是圆弧时返回None
+    """
+    if len(points) != ARC_SEGMENTS + 1:
+        return None
+    pts = np.asarray(points, dtype=np.float64)
+
+    # 代数最小二乘圆拟合（点坐标是向下取整的，补半个像素）
+    x, y = pts[:, 0] + 0.5, pts[:, 1] + 0.5
+    a = np.column_stack([x, y, np.ones_like(x)])
+    sol, *_ = np.linalg.lstsq(a, x ** 2 + y ** 2, rcond=None)
+    cx, cy = sol[0] / 2, sol[1] / 2
+    r2 = sol[2] + cx ** 2 + cy ** 2
+    if r2 <= 0:
+        return None
+    radius = math.sqrt(r2)
+
+    # 第 i 个点的角度 = -90 + gap/2 + i*(360-gap)/n，对 gap 做最小二乘
+    n = ARC_SEGMENTS
+    i = np.arange(n + 1)
+    angles = np.degrees(np.unwrap(np.arctan2(y - cy, x - cx)))
+    angles += 360 * math.ceil((-90 - angles[0]) / 360)  # 起点角度落在 [-90, 270)
+    weight = 0.5 - i / n
+    gap = float(np.dot(weight, angles + 90 - 360 * i / n) / np.dot(weight, weight))
+    if not 0 <= gap < 360:
+        return None
+
+    # 与拟合圆弧的最大偏差（在取整前的连续坐标上比较）
+    rebuilt = _arc_xy((cx, cy), radius, gap, n)
+    if np.abs(rebuilt - np.column_stack([x, y])).max() > tolerance:
+        return None
+    return cx, cy, radius, gap
+
+
+def _segment_distance(pts: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """各点到线段 ab 的距离（不是到直线，折返的笔画也能保住）"""
+    ab = b - a
+    length2 = float(ab @ ab)
+    if length2 == 0:
+        return np.hypot(*(pts - a).T)
+    t = np.clip((pts - a) @ ab / length2, 0, 1)
+    return np.hypot(*(pts - a - t[:, np.newaxis] * ab).T)
+
+
+def simplify_polyline(points, tolerance: float = SIMPLIFY_TOLERANCE) -> List[List[int]]:
+    """
+    Douglas-Peucker 简化开放折线（保留首尾点，豁口位置不变）
+
+    Args:
+        points: [[x, y], ...]
+        tolerance: 原点列到简化后折线的最大距离（像素）
+
+    Returns:
+        简化后的点列（点数不少于 MIN_REGION_POINTS，点太少时原样返回）
+    """
+    if len(points) <= MIN_REGION_POINTS:
+        return [list(p) for p in points]
+    pts = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # 用栈代替递归，长笔画也不会超出递归深度
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dist = _segment_distance(pts[first + 1:last], pts[first], pts[last])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = first + 1 + i
+            keep[mid] = True
+            stack.append((first, mid))
+            stack.append((mid, last))
+
+    if keep.sum() < MIN_REGION_POINTS:
+        # 近似直线的区域，均匀保留几个点
+        keep[np.linspace(0, len(pts) - 1, MIN_REGION_POINTS).round().astype(int)] = True
+    return np.asarray(points)[keep].astype(int).tolist()
+
+
+def simplify_regions(regions, tolerance: float = SIMPLIFY_TOLERANCE):
+    """对多个区域逐个简化；圆形模式的圆弧保持原样（保存时按参数存储）"""
+    return [region if fit_arc(region) else simplify_polyline(region, tolerance)
+            for region in regions]
@@ -0,0 +1,141 @@
+"""
+后台渲染队列
+生成结果在工作线程中依次执行，界面线程通过 root.after 轮询进度并回调完成结果，
+处理期间主窗口保持响应，可以继续圈选下一张模特图排队；
+没有任务时停止轮询，提交任务时重新开始
+"""
+
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+@dataclass
+class RenderJob:
+    """一个后台任务及其进度/状态"""
+    job_id: int
+    label: str
+    task: Callable[["RenderJob"], Any]            # 在工作线程中执行，参数为任务本身
+    on_done: Callable[["RenderJob"], None]        # 在界面线程中回调
+    status: str = "queued"                        # queued / running / done / cancelled / failed
+    progress: float = 0.0                         # 0-1
+    result: Any = None
+    error: Optional[BaseException] = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def cancel(self):
+        """请求取消（排队中的任务不再执行，运行中的任务在下次报告进度时停止）"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, progress: float):
+        """工作线程中报告进度；已取消时抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, progress))
+
+
+class RenderWorker:
+    """单工作线程的任务队列，回调统一在Tk界面线程执行（submit 也应在界面线程调用）"""
+
+    def __init__(self, root, on_update: Optional[Callable[[], None]] = None, poll_ms: int = 50):
+        """
+        Args:
+            root: Tk根窗口（用于 root.after 轮询）
+            on_update: 每次轮询时在界面线程调用（刷新进度条等），任务全部完成后再调用一次
+            poll_ms: 轮询间隔（毫秒）
+        """
+        self.root = root
+        self.on_update = on_update
+        self.poll_ms = poll_ms
+        self.current: Optional[RenderJob] = None
+        self._pending = queue.Queue()
+        self._finished = queue.Queue()
+        self._queued = 0
+        self._next_id = 1
+        self._active = 0  # 已提交但完成回调尚未分发的任务数（只在界面线程中修改）
+        self._polling = False
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def queued(self) -> int:
+        """排队中（尚未开始）的任务数"""
+        return self._queued
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None or self._queued > 0
+
+    def submit(self, label: str, task, on_done) -> RenderJob:
+        """提交任务，返回任务对象"""
+        with self._lock:
+            job = RenderJob(self._next_id, label, task, on_done)
+            self._next_id += 1
+            self._queued += 1
+        self._active += 1
+        self._pending.put(job)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return job
+
+    def cancel_current(self) -> Optional[RenderJob]:
+        """取消正在运行的任务"""
+        job = self.current
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _run(self):
+        while True:
+            job = self._pending.get()
+            # 先登记为当前任务再减少排队数，界面轮询不会看到短暂的空闲
+            self.current = job
+            with self._lock:
+                self._queued -= 1
+            if job.cancelled:
+                job.status = "cancelled"
+                self.current = None
+                self._finished.put(job)
+                continue
+
+            job.status = "running"
+            try:
+                job.result = job.task(job)
+                job.progress = 1.0
+                job.status = "done"
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.error = e
+                job.status = "failed"
+            self.current = None
+            self._finished.put(job)
+
+    def _poll(self):
+        """界面线程：分发完成回调并刷新进度，全部任务的回调都分发后停止轮询"""
+        while True:
+            try:
+                job = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._active -= 1
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"[ERROR] 任务回调失败: {e}")
+        if self.on_update is not None:
+            self.on_update()
+        if self._active > 0:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
@@ -7,19 +7,57 @@ import cv2
 import numpy as np
 import requests
 import base64
-from typing import Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Iterable, List, Optional, Tuple
 from io import BytesIO
 
-from iris_detector import EyeDetectionResult
+from iris_detector import EyeData, EyeDetectionResult
+
+
+@dataclass
+class SeamMetrics:
+    """单只眼睛的接缝质量（基于叠加残差 = 合成图 - 原图）"""
+    gradient_energy: float      # 环带内残差亮度梯度均值
+    color_discontinuity: float  # 残差径向剖面相邻1px环间的最大色差 (LAB ΔE)
+    score: float                # 综合分数，越大接缝越明显
+
+
+@dataclass
+class MaskROI:
+    """局部蒙版：mask 左上角位于整图 (x, y) 处"""
+    x: int
+    y: int
+    mask: np.ndarray
+    
+    @property
+    def slices(self) -> Tuple[slice, slice]:
+        """对应整图上的 (行, 列) 切片"""
+        h, w = self.mask.shape[:2]
+        return slice(self.y, self.y + h), slice(self.x, self.x + w)
 
 
 class SDInpaintingRefiner:
     """使用Stable Diffusion Inpainting进行边缘融合"""
     
+    # 传输编码: 名称 -> (扩展名, imencode参数)
+    # png       - OpenCV默认参数（已是速度优先: 级别1 + SUB滤波 + RLE）
+    #             注意: 显式指定压缩级别（包括级别0不压缩）会关闭这组速度优化，
+    #             实测并不更快、体积更大，因此不提供其他PNG级别
+    # webp      - 无损WebP（quality>100 即无损），体积最小但编码慢
+    # bits      - 1位黑白PNG，仅用于蒙版（先按127二值化，软边交给mask_blur）
+    PAYLOAD_CODECS = {
+        'png': ('.png', []),
+        'webp': ('.webp', [cv2.IMWRITE_WEBP_QUALITY, 101]),
+        'bits': ('.png', [cv2.IMWRITE_PNG_BILEVEL, 1]),
+    }
+    
     def __init__(
         self, 
         api_url: str = "http://127.0.0.1:7860",
-        timeout: int = 120
+        timeout: int = 120,
+        image_codec: str = "png",
+        mask_codec: str = "png"
     ):
         """
         初始化SD Inpainting
@@ -27,10 +65,27 @@ class SDInpaintingRefiner:
         Args:
             api_url: Stable Diffusion WebUI API地址
             timeout: API请求超时时间（秒）
+            image_codec: 图像传输编码 ("png", "webp")
+            mask_codec: 蒙版传输编码 ("png", "webp", "bits")
         """
         self.api_url = api_url.rstrip('/')
         self.timeout = timeout
         
+        if image_codec not in self.PAYLOAD_CODECS or image_codec == 'bits':
+            raise ValueError(f"不支持的图像编码: {image_codec}")
+        if mask_codec not in self.PAYLOAD_CODECS:
+            raise ValueError(f"不支持的蒙版编码: {mask_codec}")
+        self.image_codec = image_codec
+        self.mask_codec = mask_codec
+        
+        # 单线程编码器：编码下一张图时可与当前HTTP请求重叠
+        self._encoder = ThreadPoolExecutor(max_workers=1)
+        
+        # 接缝门控统计
+        self.sd_calls = 0        # 实际发出的SD请求数
+        self.sd_calls_saved = 0  # 因接缝已干净而跳过的请求数
+        self.eyes_skipped = 0    # 因接缝已干净而排除出蒙版的眼睛数
+        
         # 默认提示词 - 专门针对眼睛融合优化
         self.default_prompt = (
             "extremely realistic eyes, wet texture, sharp focus, "
@@ -76,14 +131,34 @@ class SDInpaintingRefiner:
         Returns:
             蒙版图像（白色为重绘区域）
         """
-        h, w = image.shape[:2]
-        mask = np.zeros((h, w), dtype=np.uint8)
+        rois = self.generate_edge_mask_rois(
+            image.shape, detection_result, expand_pixels,
+            edge_width, protect_center_ratio
+        )
+        return compose_mask(rois, image.shape)
+    
+    def generate_edge_mask_rois(
+        self,
+        image_shape: Tuple[int, ...],
+        detection_result: EyeDetectionResult,
+        expand_pixels: int = 5,
+        edge_width: int = 15,
+        protect_center_ratio: float = 0.65
+    ) -> List[MaskROI]:
+        """
+        按眼睛生成局部环形蒙版，参数同 generate_edge_mask
+        
+        只在每只眼的外扩方框内绘制和模糊，方框留足模糊核半径，
+        拼回整图后与整图绘制再模糊的结果逐像素一致（两眼蒙版不重叠时）
         
+        Returns:
+            MaskROI 列表（白色为重绘区域）
+        """
+        rois = []
         for eye_data in [detection_result.left_eye, detection_result.right_eye]:
             if eye_data is None:
                 continue
             
-            center = eye_data.center_px
             radius = eye_data.radius
             
             # 外圈半径
@@ -92,16 +167,117 @@ class SDInpaintingRefiner:
             # 内圈半径（保护区域）
             inner_radius = int(radius * protect_center_ratio)
             
-            # 绘制外圈（白色）
-            cv2.circle(mask, center, outer_radius, 255, -1)
+            roi = _disk_roi(
+                image_shape, eye_data.center_px, outer_radius, inner_radius, ksize=7
+            )
+            if roi is not None:
+                rois.append(roi)
+        
+        return rois
+    
+    # 综合分数的归一化基准（经验值）：score≥1 大致对应羽化不足3px的可见硬边
+    SEAM_GRADIENT_REF = 6.0
+    SEAM_COLOR_REF = 20.0
+    
+    def measure_seam(
+        self,
+        image: np.ndarray,
+        reference: np.ndarray,
+        eye_data: EyeData,
+        expand_pixels: int = 5,
+        protect_center_ratio: float = 0.65
+    ) -> SeamMetrics:
+        """
+        在 generate_edge_mask 对应的环带上度量叠加接缝
+        
+        只在眼睛外接框内计算。度量的是叠加残差（合成图 - 原图），
+        因此虹膜与眼白之间天然的边界不计入分数。
+        
+        Args:
+            image: 已贴上美瞳的图像
+            reference: 贴美瞳前的原图（与image同尺寸）
+            eye_data: 眼睛数据
+            expand_pixels: 外边缘扩展像素
+            protect_center_ratio: 保护中心区域比例
             
-            # 扣除内圈（黑色）- 保护中心纹理
-            cv2.circle(mask, center, inner_radius, 0, -1)
+        Returns:
+            SeamMetrics，score < 1 大致表示接缝已不可见
+        """
+        cx, cy = eye_data.center_px
+        radius = eye_data.radius
+        outer_radius = int(radius + expand_pixels)
+        inner_radius = int(radius * protect_center_ratio)
+        
+        # Sobel需要1px边界
+        box = _eye_box(eye_data.center_px, outer_radius + 2, image.shape)
+        if box is None:
+            return SeamMetrics(0.0, 0.0, 0.0)
+        x1, y1, x2, y2 = box
+        
+        lab = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2LAB).astype(np.float32)
+        lab -= cv2.cvtColor(reference[y1:y2, x1:x2], cv2.COLOR_BGR2LAB).astype(np.float32)
+        
+        y_coords, x_coords = np.ogrid[y1 - cy:y2 - cy, x1 - cx:x2 - cx]
+        dist = np.sqrt(x_coords ** 2 + y_coords ** 2)
+        ring = (dist >= inner_radius) & (dist < outer_radius)
+        if not np.any(ring):
+            return SeamMetrics(0.0, 0.0, 0.0)
+        
+        # 梯度能量（Sobel 3x3 除以8得到每像素差值量级）
+        gx = cv2.Sobel(lab[:, :, 0], cv2.CV_32F, 1, 0, ksize=3) / 8
+        gy = cv2.Sobel(lab[:, :, 0], cv2.CV_32F, 0, 1, ksize=3) / 8
+        gradient_energy = float(np.sqrt(gx ** 2 + gy ** 2)[ring].mean())
+        
+        # 径向剖面：按1px环分箱求均值，取相邻环最大色差
+        bins = dist[ring].astype(np.int32) - inner_radius
+        n_bins = int(bins.max()) + 1
+        counts = np.maximum(np.bincount(bins, minlength=n_bins), 1)
+        ring_lab = lab[ring]
+        profile = np.stack([
+            np.bincount(bins, ring_lab[:, k], n_bins) / counts for k in range(3)
+        ], axis=1)
+        if n_bins > 1:
+            color_discontinuity = float(np.linalg.norm(np.diff(profile, axis=0), axis=1).max())
+        else:
+            color_discontinuity = 0.0
+        
+        score = 0.5 * (gradient_energy / self.SEAM_GRADIENT_REF +
+                       color_discontinuity / self.SEAM_COLOR_REF)
+        return SeamMetrics(gradient_energy, color_discontinuity, score)
+    
+    def gate_clean_eyes(
+        self,
+        image: np.ndarray,
+        reference: np.ndarray,
+        detection_result: EyeDetectionResult,
+        seam_threshold: float,
+        expand_pixels: int = 5,
+        protect_center_ratio: float = 0.65
+    ) -> Optional[EyeDetectionResult]:
+        """
+        去掉接缝已干净的眼睛
         
-        # 高斯模糊使边缘过渡更自然
-        mask = cv2.GaussianBlur(mask, (7, 7), 0)
+        Returns:
+            只含需要SD处理的眼睛的检测结果；两只眼都干净时返回None
+        """
+        eyes = {}
+        for key in ('left_eye', 'right_eye'):
+            eye_data = getattr(detection_result, key)
+            if eye_data is None:
+                continue
+            metrics = self.measure_seam(
+                image, reference, eye_data, expand_pixels, protect_center_ratio
+            )
+            if metrics.score < seam_threshold:
+                print(f"    接缝已干净 (score={metrics.score:.2f})，跳过SD: {eye_data.center_px}")
+                eyes[key] = None
+                self.eyes_skipped += 1
         
-        return mask
+        gated = replace(detection_result, **eyes)
+        if gated.left_eye is None and gated.right_eye is None:
+            self.sd_calls_saved += 1
+            return None
+        return gated
     
     def generate_full_eye_mask(
         self,
@@ -120,34 +296,73 @@ class SDInpaintingRefiner:
         Returns:
             蒙版图像
         """
-        h, w = image.shape[:2]
-        mask = np.zeros((h, w), dtype=np.uint8)
-        
+        rois = self.generate_full_eye_mask_rois(
+            image.shape, detection_result, expand_pixels
+        )
+        return compose_mask(rois, image.shape)
+    
+    def generate_full_eye_mask_rois(
+        self,
+        image_shape: Tuple[int, ...],
+        detection_result: EyeDetectionResult,
+        expand_pixels: int = 5
+    ) -> List[MaskROI]:
+        """按眼睛生成局部完整眼球蒙版，参数同 generate_full_eye_mask"""
+        rois = []
         for eye_data in [detection_result.left_eye, detection_result.right_eye]:
             if eye_data is None:
                 continue
             
             radius = int(eye_data.radius + expand_pixels)
-            cv2.circle(mask, eye_data.center_px, radius, 255, -1)
+            # 轻微模糊边缘
+            roi = _disk_roi(image_shape, eye_data.center_px, radius, None, ksize=5)
+            if roi is not None:
+                rois.append(roi)
         
-        # 轻微模糊边缘
-        mask = cv2.GaussianBlur(mask, (5, 5), 0)
-        
-        return mask
+        return rois
     
-    def _image_to_base64(self, image: np.ndarray) -> str:
-        """将OpenCV图像转换为base64字符串"""
-        success, buffer = cv2.imencode('.png', image)
+    def _image_to_base64(self, image: np.ndarray, codec: str = "png") -> str:
+        """将OpenCV图像按指定编码转换为base64字符串"""
+        ext, params = self.PAYLOAD_CODECS[codec]
+        if codec == 'bits':
+            _, image = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY)
+        success, buffer = cv2.imencode(ext, image, params)
         if not success:
             raise ValueError("图像编码失败")
         return base64.b64encode(buffer).decode('utf-8')
     
     def _base64_to_image(self, base64_str: str) -> np.ndarray:
-        """将base64字符串转换为OpenCV图像"""
+        """将base64字符串转换为OpenCV图像（PNG/WebP均可）"""
         img_data = base64.b64decode(base64_str)
         img_array = np.frombuffer(img_data, dtype=np.uint8)
         return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
     
+    def _encode_payload(
+        self,
+        image: np.ndarray,
+        mask: np.ndarray
+    ) -> Tuple[str, str]:
+        """编码图像和蒙版，返回 (image_b64, mask_b64)"""
+        return (
+            self._image_to_base64(image, self.image_codec),
+            self._image_to_base64(mask, self.mask_codec)
+        )
+    
+    def encode_payload(self, image: np.ndarray, mask: np.ndarray) -> Future:
+        """
+        在后台线程中编码图像和蒙版
+        
+        可在上一个请求等待SD返回时提前调用，结果传给 refine_with_api(encoded=...)
+        
+        Returns:
+            Future，结果为 (image_b64, mask_b64)
+        """
+        return self._encoder.submit(self._encode_payload, image, mask)
+    
+    def close(self):
+        """释放编码线程"""
+        self._encoder.shutdown(wait=False)
+    
     def refine_with_api(
         self,
         image: np.ndarray,
@@ -157,7 +372,8 @@ class SDInpaintingRefiner:
         negative_prompt: Optional[str] = None,
         steps: int = 25,
         cfg_scale: float = 7.0,
-        sampler_name: str = "DPM++ 2M Karras"
+        sampler_name: str = "DPM++ 2M Karras",
+        encoded: Optional[Future] = None
     ) -> np.ndarray:
         """
         使用Automatic1111 WebUI API进行Inpainting
@@ -171,33 +387,71 @@ class SDInpaintingRefiner:
             steps: 采样步数
             cfg_scale: CFG强度
             sampler_name: 采样器名称
+            encoded: encode_payload() 返回的Future（已提前编码时传入）
             
         Returns:
             处理后的图像
         """
+        if encoded is None:
+            encoded = self.encode_payload(image, mask)
+        image_b64, mask_b64 = encoded.result()
+        self.sd_calls += 1
+        
+        # 准备API请求
+        payload = self._img2img_payload(
+            [image_b64], mask_b64, image.shape[1], image.shape[0],
+            denoising_strength, prompt, negative_prompt,
+            steps, cfg_scale, sampler_name
+        )
+        
+        images = self._post_img2img(payload)
+        if images:
+            return self._base64_to_image(images[0])
+        return image
+    
+    def _img2img_payload(
+        self,
+        init_images: List[str],
+        mask_b64: str,
+        width: int,
+        height: int,
+        denoising_strength: float = 0.35,
+        prompt: Optional[str] = None,
+        negative_prompt: Optional[str] = None,
+        steps: int = 25,
+        cfg_scale: float = 7.0,
+        sampler_name: str = "DPM++ 2M Karras"
+    ) -> dict:
+        """构造img2img请求参数"""
         if prompt is None:
             prompt = self.default_prompt
         if negative_prompt is None:
             negative_prompt = self.default_negative_prompt
         
-        # 准备API请求
-        payload = {
-            "init_images": [self._image_to_base64(image)],
-            "mask": self._image_to_base64(mask),
+        return {
+            "init_images": init_images,
+            "mask": mask_b64,
             "prompt": prompt,
             "negative_prompt": negative_prompt,
             "denoising_strength": denoising_strength,
             "sampler_name": sampler_name,
             "steps": steps,
             "cfg_scale": cfg_scale,
-            "width": image.shape[1],
-            "height": image.shape[0],
+            "width": width,
+            "height": height,
             "mask_blur": 4,
             "inpainting_fill": 1,  # 1 = original content
             "inpaint_full_res": True,
             "inpaint_full_res_padding": 32,
         }
+    
+    def _post_img2img(self, payload: dict) -> List[str]:
+        """
+        发送img2img请求
         
+        Returns:
+            返回的base64图像列表；失败时为空列表
+        """
         try:
             print(f"    正在调用SD API ({self.api_url})...")
             response = requests.post(
@@ -210,23 +464,23 @@ class SDInpaintingRefiner:
             result = response.json()
             if 'images' in result and len(result['images']) > 0:
                 print("    SD处理完成")
-                return self._base64_to_image(result['images'][0])
+                return result['images']
             else:
                 print("    警告: API未返回图像")
-                return image
+                return []
                 
         except requests.exceptions.ConnectionError:
             print(f"    错误: 无法连接到SD WebUI API ({self.api_url})")
             print("    请确保Stable Diffusion WebUI已启动并开启了API (--api 参数)")
-            return image
+            return []
             
         except requests.exceptions.Timeout:
             print(f"    错误: API请求超时 ({self.timeout}秒)")
-            return image
+            return []
             
         except requests.exceptions.RequestException as e:
             print(f"    API调用失败: {e}")
-            return image
+            return []
     
     def refine(
         self,
@@ -235,7 +489,9 @@ class SDInpaintingRefiner:
         denoising_strength: float = 0.35,
         expand_pixels: int = 5,
         protect_center: bool = True,
-        protect_center_ratio: float = 0.65
+        protect_center_ratio: float = 0.65,
+        reference: Optional[np.ndarray] = None,
+        seam_threshold: Optional[float] = None
     ) -> np.ndarray:
         """
         完整的融合流程
@@ -247,102 +503,544 @@ class SDInpaintingRefiner:
             expand_pixels: 蒙版外扩像素
             protect_center: 是否保护中心纹理（只处理边缘）
             protect_center_ratio: 保护中心区域比例
+            reference: 贴美瞳前的原图（接缝门控需要）
+            seam_threshold: 接缝分数阈值，低于此值的眼睛不送SD；None=不门控
             
         Returns:
             融合后的图像
         """
+        # 接缝门控：两只眼都干净则整个SD请求都省掉
+        if seam_threshold is not None and reference is not None:
+            detection_result = self.gate_clean_eyes(
+                image, reference, detection_result, seam_threshold,
+                expand_pixels, protect_center_ratio
+            )
+            if detection_result is None:
+                return image
+        
         # 检查API可用性
         if not self.check_api_available():
             print("    警告: SD WebUI API不可用，跳过融合步骤")
             return image
         
-        # 生成蒙版
+        mask = self._make_mask(
+            image, detection_result, expand_pixels,
+            protect_center, protect_center_ratio
+        )
+        
+        # 调用SD Inpainting
+        result = self.refine_with_api(image, mask, denoising_strength)
+        
+        return result
+    
+    def refine_many(
+        self,
+        items: Iterable[Tuple[np.ndarray, EyeDetectionResult]],
+        denoising_strength: float = 0.35,
+        expand_pixels: int = 5,
+        protect_center: bool = True,
+        protect_center_ratio: float = 0.65,
+        references: Optional[List[np.ndarray]] = None,
+        seam_threshold: Optional[float] = None
+    ) -> List[np.ndarray]:
+        """
+        依次融合多张图片，下一张的编码与当前请求重叠进行
+        
+        Args:
+            items: (已贴美瞳图像, 检测结果) 序列
+            references: 与items一一对应的原图（接缝门控需要）
+            其余参数同 refine()
+            
+        Returns:
+            融合后的图像列表（顺序与输入一致）
+        """
+        items = list(items)
+        results = [image for image, _ in items]
+        
+        # 接缝门控：只保留仍需SD处理的图片
+        todo = []
+        for i, (image, detection_result) in enumerate(items):
+            if seam_threshold is not None and references is not None:
+                detection_result = self.gate_clean_eyes(
+                    image, references[i], detection_result, seam_threshold,
+                    expand_pixels, protect_center_ratio
+                )
+                if detection_result is None:
+                    continue
+            todo.append((i, image, detection_result))
+        
+        if not todo:
+            return results
+        
+        if not self.check_api_available():
+            print("    警告: SD WebUI API不可用，跳过融合步骤")
+            return results
+        
+        def submit(index):
+            _, image, detection_result = todo[index]
+            mask = self._make_mask(
+                image, detection_result, expand_pixels,
+                protect_center, protect_center_ratio
+            )
+            return mask, self.encode_payload(image, mask)
+        
+        pending = submit(0)
+        for n, (i, image, _) in enumerate(todo):
+            mask, encoded = pending
+            if n + 1 < len(todo):
+                pending = submit(n + 1)
+            results[i] = self.refine_with_api(
+                image, mask, denoising_strength, encoded=encoded
+            )
+        
+        return results
+    
+    def refine_batch(
+        self,
+        items: Iterable[Tuple[np.ndarray, EyeDetectionResult]],
+        batch_size: int = 4,
+        canvas_size: int = 512,
+        context_scale: float = 2.0,
+        denoising_strength: float = 0.35,
+        expand_pixels: int = 5,
+        protect_center: bool = True,
+        protect_center_ratio: float = 0.65,
+        references: Optional[List[np.ndarray]] = None,
+        seam_threshold: Optional[float] = None
+    ) -> List[np.ndarray]:
+        """
+        批量模式：把多张图片的眼睛裁剪归一化到同一画布，合并成一个请求
+        
+        每只眼按 半径*context_scale 裁成正方形并缩放到 canvas_size，
+        这样所有裁剪图中虹膜位置和大小一致，可共用同一张蒙版，
+        以 batch_size 张为一组通过 init_images 一次发送。
+        返回的裁剪图缩放回原尺寸，按蒙版羽化贴回各自的原图。
+        
+        Args:
+            items: (已贴美瞳图像, 检测结果) 序列
+            batch_size: 每个请求最多包含的眼睛裁剪数
+            canvas_size: 归一化画布边长（像素）
+            context_scale: 裁剪半边长 / 虹膜半径
+            references: 与items一一对应的原图（接缝门控需要）
+            其余参数同 refine()
+            
+        Returns:
+            融合后的图像列表（顺序与输入一致）
+        """
+        items = list(items)
+        results = [image.copy() for image, _ in items]
+        
+        # 收集需要处理的眼睛: (图片序号, 眼睛数据, 裁剪半边长, 画布裁剪图, 缩放比例)
+        crops = []
+        for i, (image, detection_result) in enumerate(items):
+            if seam_threshold is not None and references is not None:
+                detection_result = self.gate_clean_eyes(
+                    image, references[i], detection_result, seam_threshold,
+                    expand_pixels, protect_center_ratio
+                )
+                if detection_result is None:
+                    continue
+            for eye_data in [detection_result.left_eye, detection_result.right_eye]:
+                if eye_data is None:
+                    continue
+                half = max(8, int(round(eye_data.radius * context_scale)))
+                crop = self._crop_square(image, eye_data.center_px, half)
+                crop = cv2.resize(crop, (canvas_size, canvas_size), interpolation=cv2.INTER_AREA)
+                scale = canvas_size / (2 * half + 1)
+                crops.append((i, eye_data, half, crop, scale))
+        
+        if not crops:
+            return results
+        
+        if not self.check_api_available():
+            print("    警告: SD WebUI API不可用，跳过融合步骤")
+            return results
+        
+        groups = [crops[k:k + batch_size] for k in range(0, len(crops), batch_size)]
+        
+        def submit(group):
+            mask = self._canvas_mask(
+                canvas_size, group, expand_pixels, protect_center, protect_center_ratio
+            )
+            mask_future = self._encoder.submit(self._image_to_base64, mask, self.mask_codec)
+            crop_futures = [
+                self._encoder.submit(self._image_to_base64, crop, self.image_codec)
+                for _, _, _, crop, _ in group
+            ]
+            return mask, mask_future, crop_futures
+        
+        pending = submit(groups[0])
+        for n, group in enumerate(groups):
+            mask, mask_future, crop_futures = pending
+            # 下一组的编码与本组请求重叠
+            if n + 1 < len(groups):
+                pending = submit(groups[n + 1])
+            
+            payload = self._img2img_payload(
+                [f.result() for f in crop_futures], mask_future.result(),
+                canvas_size, canvas_size, denoising_strength
+            )
+            payload["batch_size"] = len(group)
+            payload["inpaint_full_res"] = False
+            self.sd_calls += 1
+            
+            returned = self._post_img2img(payload)
+            if len(returned) < len(group):
+                print(f"    警告: 返回 {len(returned)} 张，期望 {len(group)} 张，本组跳过")
+                continue
+            
+            alpha = mask.astype(np.float32) / 255.0
+            for (i, eye_data, half, _, _), b64 in zip(group, returned):
+                size = 2 * half + 1
+                refined = cv2.resize(
+                    self._base64_to_image(b64), (size, size), interpolation=cv2.INTER_CUBIC
+                )
+                crop_alpha = cv2.resize(alpha, (size, size), interpolation=cv2.INTER_LINEAR)
+                self._paste_crop(results[i], refined, crop_alpha, eye_data.center_px, half)
+        
+        return results
+    
+    def _canvas_mask(
+        self,
+        canvas_size: int,
+        group: list,
+        expand_pixels: int,
+        protect_center: bool,
+        protect_center_ratio: float
+    ) -> np.ndarray:
+        """
+        生成画布上的共用蒙版
+        
+        不同裁剪图的缩放比例不同，expand_pixels 按组内平均缩放换算到画布像素
+        """
+        center = (canvas_size // 2, canvas_size // 2)
+        radius = float(np.mean([eye.radius * scale for _, eye, _, _, scale in group]))
+        expand = expand_pixels * float(np.mean([scale for *_, scale in group]))
+        
+        mask = np.zeros((canvas_size, canvas_size), dtype=np.uint8)
+        cv2.circle(mask, center, int(radius + expand), 255, -1)
         if protect_center:
-            mask = self.generate_edge_mask(
+            cv2.circle(mask, center, int(radius * protect_center_ratio), 0, -1)
+        return cv2.GaussianBlur(mask, (7, 7), 0)
+    
+    def _crop_square(
+        self,
+        image: np.ndarray,
+        center: Tuple[int, int],
+        half: int
+    ) -> np.ndarray:
+        """以center为中心裁剪 (2*half+1) 见方的区域，超出边界部分镜像填充"""
+        h, w = image.shape[:2]
+        cx, cy = center
+        x1, y1 = cx - half, cy - half
+        x2, y2 = cx + half + 1, cy + half + 1
+        crop = image[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+        top, left = max(0, -y1), max(0, -x1)
+        bottom, right = max(0, y2 - h), max(0, x2 - w)
+        if top or left or bottom or right:
+            border = cv2.BORDER_REFLECT_101 if min(crop.shape[:2]) > 1 else cv2.BORDER_REPLICATE
+            crop = cv2.copyMakeBorder(crop, top, bottom, left, right, border)
+        return crop
+    
+    def _paste_crop(
+        self,
+        image: np.ndarray,
+        crop: np.ndarray,
+        alpha: np.ndarray,
+        center: Tuple[int, int],
+        half: int
+    ):
+        """按alpha把裁剪图贴回原图（裁剪框超出边界的部分丢弃）"""
+        h, w = image.shape[:2]
+        cx, cy = center
+        x1, y1 = cx - half, cy - half
+        ox1, oy1 = max(0, -x1), max(0, -y1)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, cx + half + 1), min(h, cy + half + 1)
+        if x1 >= x2 or y1 >= y2:
+            return
+        ox2, oy2 = ox1 + (x2 - x1), oy1 + (y2 - y1)
+        
+        a = alpha[oy1:oy2, ox1:ox2, np.newaxis]
+        roi = image[y1:y2, x1:x2].astype(np.float32)
+        blended = a * crop[oy1:oy2, ox1:ox2].astype(np.float32) + (1 - a) * roi
+        image[y1:y2, x1:x2] = np.clip(blended, 0, 255).astype(np.uint8)
+    
+    def _make_mask(
+        self,
+        image: np.ndarray,
+        detection_result: EyeDetectionResult,
+        expand_pixels: int,
+        protect_center: bool,
+        protect_center_ratio: float
+    ) -> np.ndarray:
+        """按 protect_center 选择环形蒙版或完整眼球蒙版"""
+        if protect_center:
+            return self.generate_edge_mask(
                 image, 
                 detection_result, 
                 expand_pixels,
                 protect_center_ratio=protect_center_ratio
             )
-        else:
-            mask = self.generate_full_eye_mask(
-                image, 
-                detection_result, 
-                expand_pixels
-            )
-        
-        # 调用SD Inpainting
-        result = self.refine_with_api(image, mask, denoising_strength)
-        
-        return result
+        return self.generate_full_eye_mask(
+            image, 
+            detection_result, 
+            expand_pixels
+        )
     
     def preview_mask(
         self,
         image: np.ndarray,
-        mask: np.ndarray
+        mask
     ) -> np.ndarray:
         """
         预览蒙版覆盖效果（用于调试）
         
         Args:
             image: 原始图像
-            mask: 蒙版
+            mask: 整图蒙版，或 generate_*_rois 返回的 MaskROI 列表
             
         Returns:
             带蒙版叠加的预览图
         """
         preview = image.copy()
         
-        # 创建红色蒙版叠加
-        red_overlay = np.zeros_like(preview)
-        red_overlay[:, :, 2] = mask  # 红色通道
+        if isinstance(mask, np.ndarray):
+            x, y, w, h = cv2.boundingRect(mask)
+            rois = [MaskROI(x, y, mask[y:y + h, x:x + w])] if w and h else []
+        else:
+            rois = mask
         
-        # 混合
+        # 只在蒙版非零的方框内给红色通道叠加 0.5*mask，其余像素不变
         alpha = 0.5
-        preview = cv2.addWeighted(preview, 1, red_overlay, alpha, 0)
+        for roi in rois:
+            red = preview[roi.slices][:, :, 2]
+            preview[roi.slices][:, :, 2] = cv2.addWeighted(
+                np.ascontiguousarray(red), 1, roi.mask, alpha, 0
+            )
         
         return preview
 
 
 class LocalInpaintRefiner:
     """
-    本地Inpainting处理器 (不依赖SD API)
-    使用OpenCV的inpaint函数进行简单修复
+    本地边缘修复处理器 (不依赖SD API)
+    
+    只在每只眼睛的外接框内处理，支持三种模式：
+    - telea:     OpenCV inpaint (Telea) 修复边缘细环
+    - multiband: 拉普拉斯金字塔多频段融合（合成图 -> 原图）
+    - seamless:  cv2.seamlessClone 泊松融合（合成图 -> 原图），只处理中心外的边缘环
     """
     
-    def __init__(self):
-        pass
+    MODES = ('telea', 'multiband', 'seamless')
+    
+    def __init__(self, mode: str = "telea"):
+        """
+        Args:
+            mode: 修复模式 ("telea", "multiband", "seamless")
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的本地修复模式: {mode}")
+        self.mode = mode
     
     def refine(
         self,
         image: np.ndarray,
         detection_result: EyeDetectionResult,
         expand_pixels: int = 3,
-        inpaint_radius: int = 3
+        inpaint_radius: int = 3,
+        reference: Optional[np.ndarray] = None,
+        pyramid_levels: int = 4,
+        protect_center_ratio: float = 0.65
     ) -> np.ndarray:
         """
-        使用OpenCV inpaint进行简单边缘修复
+        本地边缘修复
         
         注意: 效果不如SD Inpainting，但不需要额外依赖
+        
+        Args:
+            image: 已贴上美瞳的图像
+            detection_result: 眼球检测结果
+            expand_pixels: 边缘环相对虹膜半径的外扩像素
+            inpaint_radius: Telea修复半径
+            reference: 贴美瞳前的原图（multiband/seamless需要，缺省时退回telea）
+            pyramid_levels: multiband金字塔最大层数
+            protect_center_ratio: seamless保持不动的中心半径比例
+            
+        Returns:
+            修复后的图像
         """
-        h, w = image.shape[:2]
-        mask = np.zeros((h, w), dtype=np.uint8)
+        mode = self.mode
+        if mode != 'telea' and reference is None:
+            print(f"    警告: {mode} 模式需要原图，改用telea")
+            mode = 'telea'
+        
+        result = image.copy()
         
-        # 只在边缘画细环
         for eye_data in [detection_result.left_eye, detection_result.right_eye]:
             if eye_data is None:
                 continue
             
-            radius = int(eye_data.radius)
-            # 画细环
-            cv2.circle(mask, eye_data.center_px, radius + expand_pixels, 255, 3)
-        
-        # 使用Telea算法修复
-        result = cv2.inpaint(image, mask, inpaint_radius, cv2.INPAINT_TELEA)
+            edge_radius = int(eye_data.radius) + expand_pixels
+            
+            if mode == 'telea':
+                # 细环宽3px，Telea只读取修复半径内的像素，外扩这么多即与全图结果一致
+                pad = edge_radius + 2 + inpaint_radius + 1
+            else:
+                # 融合区域向外留出一段过渡带
+                pad = int(edge_radius * 1.5) + 2
+            
+            box = _eye_box(eye_data.center_px, pad, image.shape)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            local_center = (eye_data.center_px[0] - x1, eye_data.center_px[1] - y1)
+            roi_mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            
+            if mode == 'telea':
+                cv2.circle(roi_mask, local_center, edge_radius, 255, 3)
+                result[y1:y2, x1:x2] = cv2.inpaint(
+                    result[y1:y2, x1:x2], roi_mask, inpaint_radius, cv2.INPAINT_TELEA
+                )
+            elif mode == 'multiband':
+                cv2.circle(roi_mask, local_center, edge_radius, 255, -1)
+                # 最低频层的尺度不超过半径的1/4，避免原图颜色渗入虹膜中心
+                levels = min(pyramid_levels, max(1, int(np.log2(max(2, edge_radius // 4)))))
+                result[y1:y2, x1:x2] = _multiband_blend(
+                    result[y1:y2, x1:x2], reference[y1:y2, x1:x2],
+                    roi_mask, levels
+                )
+            else:
+                # 只克隆中心外的边缘环：目标图先换上合成图的中心，
+                # 泊松方程的边界外侧是原图、内侧是美瞳中心，整盘克隆会把中心整体偏色
+                inner_radius = int(eye_data.radius * protect_center_ratio)
+                center_mask = np.zeros_like(roi_mask)
+                cv2.circle(center_mask, local_center, inner_radius, 255, -1)
+                cv2.circle(roi_mask, local_center, edge_radius, 255, -1)
+                roi_mask[center_mask > 0] = 0
+                # seamlessClone要求蒙版不贴边
+                roi_mask[[0, -1], :] = 0
+                roi_mask[:, [0, -1]] = 0
+                mx, my, mw, mh = cv2.boundingRect(roi_mask)
+                if mw == 0 or mh == 0:
+                    continue
+                target = reference[y1:y2, x1:x2].copy()
+                target[center_mask > 0] = result[y1:y2, x1:x2][center_mask > 0]
+                cloned = cv2.seamlessClone(
+                    result[y1:y2, x1:x2], target,
+                    roi_mask, (mx + mw // 2, my + mh // 2), cv2.NORMAL_CLONE
+                )
+                # 求解器在整个外接框上迭代，中心按合成图原样写回
+                cloned[center_mask > 0] = result[y1:y2, x1:x2][center_mask > 0]
+                result[y1:y2, x1:x2] = cloned
         
         return result
 
 
+def _eye_box(
+    center: Tuple[int, int],
+    extent: int,
+    shape: Tuple[int, ...]
+) -> Optional[Tuple[int, int, int, int]]:
+    """以center为中心、半边长extent的方框，裁剪到图像范围内；为空时返回None"""
+    h, w = shape[:2]
+    cx, cy = center
+    x1, y1 = max(0, cx - extent), max(0, cy - extent)
+    x2, y2 = min(w, cx + extent + 1), min(h, cy + extent + 1)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2
+
+
+def _disk_roi(
+    image_shape: Tuple[int, ...],
+    center: Tuple[int, int],
+    outer_radius: int,
+    inner_radius: Optional[int],
+    ksize: int
+) -> Optional[MaskROI]:
+    """
+    在局部方框内绘制（环形）圆盘并高斯模糊
+    
+    方框比外圈多留 ksize 像素，保证模糊核在框内看到的都是零；
+    贴着图像边界的一侧与整图模糊同样按反射边界处理
+    """
+    box = _eye_box(center, outer_radius + ksize, image_shape)
+    if box is None:
+        return None
+    x1, y1, x2, y2 = box
+    
+    mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+    local = (center[0] - x1, center[1] - y1)
+    cv2.circle(mask, local, outer_radius, 255, -1)
+    if inner_radius is not None:
+        cv2.circle(mask, local, inner_radius, 0, -1)
+    
+    return MaskROI(x1, y1, cv2.GaussianBlur(mask, (ksize, ksize), 0))
+
+
+def compose_mask(rois: Iterable[MaskROI], image_shape: Tuple[int, ...]) -> np.ndarray:
+    """把局部蒙版拼成整图蒙版（重叠处取最大值），仅在调用方确实需要整图时使用"""
+    mask = np.zeros(image_shape[:2], dtype=np.uint8)
+    for roi in rois:
+        np.maximum(mask[roi.slices], roi.mask, out=mask[roi.slices])
+    return mask
+
+
+def _multiband_blend(
+    foreground: np.ndarray,
+    background: np.ndarray,
+    mask: np.ndarray,
+    levels: int = 4
+) -> np.ndarray:
+    """
+    拉普拉斯金字塔多频段融合
+    
+    低频在大范围内平滑过渡，高频只在蒙版边界附近切换，
+    既消除色差接缝又不模糊纹理。
+    
+    Args:
+        foreground: 前景 (蒙版白色区域)
+        background: 背景
+        mask: uint8蒙版
+        levels: 最大层数（按尺寸自动减少）
+        
+    Returns:
+        融合结果 (uint8)
+    """
+    h, w = mask.shape[:2]
+    levels = max(1, min(levels, int(np.log2(max(2, min(h, w)))) - 2))
+    
+    fg = foreground.astype(np.float32)
+    bg = background.astype(np.float32)
+    weight = mask.astype(np.float32) / 255.0
+    
+    gauss_fg, gauss_bg, gauss_w = [fg], [bg], [weight]
+    for _ in range(levels):
+        gauss_fg.append(cv2.pyrDown(gauss_fg[-1]))
+        gauss_bg.append(cv2.pyrDown(gauss_bg[-1]))
+        gauss_w.append(cv2.pyrDown(gauss_w[-1]))
+    
+    # 从最低频开始逐层叠加
+    blended = None
+    for i in range(levels, -1, -1):
+        wi = gauss_w[i][:, :, np.newaxis]
+        if i == levels:
+            band_fg, band_bg = gauss_fg[i], gauss_bg[i]
+        else:
+            size = (gauss_fg[i].shape[1], gauss_fg[i].shape[0])
+            band_fg = gauss_fg[i] - cv2.pyrUp(gauss_fg[i + 1], dstsize=size)
+            band_bg = gauss_bg[i] - cv2.pyrUp(gauss_bg[i + 1], dstsize=size)
+        band = wi * band_fg + (1 - wi) * band_bg
+        if blended is None:
+            blended = band
+        else:
+            size = (band.shape[1], band.shape[0])
+            blended = cv2.pyrUp(blended, dstsize=size) + band
+    
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+
 if __name__ == "__main__":
     import sys
     from iris_detector import IrisDetector
@@ -381,10 +1079,11 @@ if __name__ == "__main__":
     refiner = SDInpaintingRefiner()
     
     # 生成边缘蒙版
-    edge_mask = refiner.generate_edge_mask(image, result)
+    edge_rois = refiner.generate_edge_mask_rois(image.shape, result)
+    edge_mask = compose_mask(edge_rois, image.shape)
     
     # 预览
-    preview = refiner.preview_mask(image, edge_mask)
+    preview = refiner.preview_mask(image, edge_rois)
     
     cv2.imshow("Edge Mask Preview (red = inpaint area)", preview)
     cv2.imshow("Edge Mask", edge_mask)
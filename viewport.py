@@ -0,0 +1,328 @@
+"""
+画笔圈选窗口的视口渲染
+图片加载后在后台线程构建金字塔，视口从最接近当前缩放的金字塔层裁剪可见区域重采样，
+相邻两层按缩放比例插值混合（平滑缩放）；叠加层由调用方在屏幕坐标上绘制，
+只有输入事件（或金字塔新层完成）把视口标记为 dirty 时才需要重绘；
+LivePreview 在圈选时把纹理实时合成到屏幕画布上，只处理各区域可见的矩形
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+
+class ImagePyramid:
+    """后台线程逐层构建的 2 倍降采样金字塔，levels[0] 为原图"""
+
+    def __init__(self, image: np.ndarray, min_size: int = 256):
+        """
+        Args:
+            image: 原图（BGR）
+            min_size: 最顶层短边不小于此尺寸
+        """
+        self.image = image
+        self.min_size = min_size
+        self.levels = [image]
+        self.done = threading.Event()
+        self._listeners = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._build, daemon=True).start()
+
+    def _build(self):
+        level = self.image
+        while min(level.shape[:2]) // 2 >= self.min_size:
+            h, w = level.shape[:2]
+            # 整数倍缩小走 INTER_AREA 快速路径
+            level = cv2.resize(level, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+            self.levels.append(level)
+            self._notify()
+        with self._lock:
+            self.done.set()
+            self._listeners.clear()
+
+    def _notify(self):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """每完成一层调用一次 listener（在后台线程中调用；构建完成后不再调用）"""
+        with self._lock:
+            if not self.done.is_set():
+                self._listeners.append(listener)
+
+    def level_scale(self, index: int) -> float:
+        """第 index 层相对原图的缩放比例"""
+        return self.levels[index].shape[1] / self.image.shape[1]
+
+
+class Viewport:
+    """图片视口：屏幕坐标 = 原图坐标 * scale + offset"""
+
+    def __init__(
+        self,
+        image: np.ndarray,
+        width: int,
+        height: int,
+        pyramid: Optional[ImagePyramid] = None,
+        background=(40, 40, 40)
+    ):
+        """
+        Args:
+            image: 原图（BGR）
+            width, height: 画布（屏幕）尺寸
+            pyramid: 该图的金字塔（None则现场开始构建）
+            background: 图片以外区域的颜色
+        """
+        self.image = image
+        self.width = width
+        self.height = height
+        self.background = background
+        self.dirty = True
+
+        self.pyramid = pyramid if pyramid is not None else ImagePyramid(image)
+        # 新的金字塔层完成后重绘，换用更合适的层
+        self.pyramid.add_listener(self._on_level)
+
+        self._base = None  # ((scale, offset_x, offset_y, 层数), 底图画布)
+        self.fit()
+
+    def _on_level(self):
+        self.dirty = True
+
+    def fit(self):
+        """缩放到填满画布并回到左上角"""
+        h, w = self.image.shape[:2]
+        self.scale = min(self.width / w, self.height / h)
+        self.offset_x, self.offset_y = 0, 0
+        self.dirty = True
+
+    def zoom(self, delta: float, min_scale: float = 0.2, max_scale: float = 10.0):
+        """缩放比例加减 delta（限制在 [min_scale, max_scale]）"""
+        self.scale = min(max_scale, max(min_scale, self.scale + delta))
+        self.dirty = True
+
+    def pan(self, offset_x: int, offset_y: int):
+        """设置图片左上角在屏幕上的位置"""
+        self.offset_x, self.offset_y = int(offset_x), int(offset_y)
+        self.dirty = True
+
+    def to_image(self, x: int, y: int):
+        """屏幕坐标 -> 原图坐标"""
+        return int((x - self.offset_x) / self.scale), int((y - self.offset_y) / self.scale)
+
+    def to_screen(self, points) -> np.ndarray:
+        """原图坐标点列 -> 屏幕坐标 int32 点列"""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        pts = pts * self.scale + (self.offset_x, self.offset_y)
+        return np.round(pts).astype(np.int32)
+
+    @property
+    def state(self):
+        """决定底图内容的视口状态（缩放、平移、可用金字塔层数）"""
+        return (self.scale, self.offset_x, self.offset_y, len(self.pyramid.levels))
+
+    def render(self) -> np.ndarray:
+        """
+        返回当前视口的底图画布（副本，可直接在上面绘制叠加层）
+
+        缩放、平移和可用金字塔层数不变时复用上次的底图
+        """
+        key = self.state
+        if self._base is None or self._base[0] != key:
+            self._base = (key, self._render_base())
+        return self._base[1].copy()
+
+    def _resample(self, index: int, rect) -> Optional[np.ndarray]:
+        """把金字塔第 index 层中对应屏幕矩形 rect 的部分重采样到屏幕尺寸"""
+        level = self.pyramid.levels[index]
+        lh, lw = level.shape[:2]
+        x1, y1, x2, y2 = rect
+        px, py = self.offset_x, self.offset_y
+        # 该层到屏幕的放大倍数
+        r = self.scale / self.pyramid.level_scale(index)
+
+        lx1, ly1 = int((x1 - px) / r), int((y1 - py) / r)
+        lx2 = min(lw, math.ceil((x2 - px) / r) + 1)
+        ly2 = min(lh, math.ceil((y2 - py) / r) + 1)
+        if lx1 >= lx2 or ly1 >= ly2:
+            return None
+        window = cv2.resize(
+            level[ly1:ly2, lx1:lx2],
+            (max(1, round((lx2 - lx1) * r)), max(1, round((ly2 - ly1) * r)))
+        )
+
+        # 重采样后窗口左上角在屏幕上位于 (px + lx1*r, py + ly1*r)，不足处用背景补齐
+        ox, oy = round(x1 - px - lx1 * r), round(y1 - py - ly1 * r)
+        out = window[oy:oy + (y2 - y1), ox:ox + (x2 - x1)]
+        if out.shape[:2] != (y2 - y1, x2 - x1):
+            padded = np.empty((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+            cv2.rectangle(padded, (0, 0), (x2 - x1, y2 - y1), self.background, -1)
+            padded[:out.shape[0], :out.shape[1]] = out
+            out = padded
+        return out
+
+    def _render_base(self) -> np.ndarray:
+        """从金字塔裁剪可见区域重采样，生成画布大小的底图（耗时只与屏幕尺寸有关）"""
+        canvas = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        cv2.rectangle(canvas, (0, 0), (self.width, self.height), self.background, -1)
+
+        h, w = self.image.shape[:2]
+        s = self.scale
+        px, py = self.offset_x, self.offset_y
+
+        # 图片在屏幕上的可见范围
+        x1, y1 = max(0, px), max(0, py)
+        x2 = min(self.width, px + max(1, int(w * s)))
+        y2 = min(self.height, py + max(1, int(h * s)))
+        if x1 >= x2 or y1 >= y2:
+            return canvas
+        rect = (x1, y1, x2, y2)
+
+        # 缩小时取比当前缩放精细的一层和粗糙的一层，按对数距离插值混合
+        depth = math.log2(1 / s) if s < 1 else 0.0
+        available = len(self.pyramid.levels) - 1
+        fine = min(int(depth), available)
+        coarse = min(fine + 1, available)
+        t = depth - int(depth) if coarse > fine and fine == int(depth) else 0.0
+
+        view = self._resample(fine, rect)
+        if view is None:
+            return canvas
+        if t > 0:
+            coarse_view = self._resample(coarse, rect)
+            if coarse_view is not None:
+                view = cv2.addWeighted(view, 1 - t, coarse_view, t, 0)
+        canvas[y1:y2, x1:x2] = view
+        return canvas
+
+
+class LivePreview:
+    """
+    圈选模特图时的实时合成预览（近似最终结果，画在屏幕画布上）
+
+    每个区域的纹理和羽化Alpha在预览分辨率（缩放比例，最高为原图分辨率）下生成一次，
+    按区域相对外接矩形的点列缓存：平移视图、移动区域只需把缓存的图层缩放到屏幕，
+    只有新画/缩放的区域需要重新生成；
+    除最后一个区域（正在画/移动/缩放的区域）以外的合成画面按视口状态缓存，
+    编辑时每帧只重新合成这一个区域所在的矩形
+    """
+
+    def __init__(self, texture: np.ndarray, feather: int = 15, max_layers: int = 32):
+        """
+        Args:
+            texture: 带羽化Alpha的BGRA纹理（眼部图提取）
+            feather: 目标蒙版羽化半径（原图像素）
+            max_layers: 缓存的区域图层数上限
+        """
+        self.texture = texture
+        self.feather = feather
+        self.max_layers = max_layers
+        self._layers = OrderedDict()  # (相对点列, 外接矩形尺寸, 预览比例) -> 图层（见 _layer）
+        self._static = None  # ((视口状态, 其余区域点列), 合成了其余区域的画布)
+        self.frame_ms = 0.0  # 上一帧的合成耗时
+
+    def _layer(self, pts: np.ndarray, w: int, h: int, p: float) -> np.ndarray:
+        """
+        区域在预览分辨率下的 uint8 图层：前三通道为乘以合并 Alpha 后的纹理（缩放插值时边缘不发黑），
+        第四通道为 255 - Alpha（混合时直接作为底图的权重）
+        """
+        key = (pts.tobytes(), w, h, p)
+        layer = self._layers.get(key)
+        if layer is not None:
+            self._layers.move_to_end(key)
+            return layer
+
+        pw, ph = max(1, round(w * p)), max(1, round(h * p))
+        tex = cv2.resize(self.texture, (pw, ph), interpolation=cv2.INTER_AREA)
+        mask = np.zeros((ph, pw), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.round(pts * p).astype(np.int32)], 255)
+        # 与生成结果相同的羽化，半径按预览比例缩小
+        r = max(1, round(self.feather * p))
+        alpha = cv2.GaussianBlur(mask.astype(np.float32), (r * 2 + 1, r * 2 + 1), 0)
+        if alpha.max() > 0:
+            alpha /= alpha.max()
+        alpha *= tex[:, :, 3].astype(np.float32) / 255.0
+        bgr = tex[:, :, :3].astype(np.float32) * alpha[:, :, np.newaxis]
+        # uint8 图层：缩放和混合都走 OpenCV 的 8 位快速路径
+        layer = np.dstack([bgr, (1 - alpha) * 255]).round().astype(np.uint8)
+
+        self._layers[key] = layer
+        if len(self._layers) > self.max_layers:
+            self._layers.popitem(last=False)
+        return layer
+
+    @staticmethod
+    def _resample(layer, kx, ky, dx, dy, width, height) -> Optional[np.ndarray]:
+        """
+        把图层放大 (kx, ky) 倍后、从 (dx, dy) 开始的 width x height 部分
+        （只缩放可见的窗口，超出图层的部分为透明）
+        """
+        lh, lw = layer.shape[:2]
+        u1, v1 = max(0, int(dx / kx)), max(0, int(dy / ky))
+        u2 = min(lw, math.ceil((dx + width) / kx) + 1)
+        v2 = min(lh, math.ceil((dy + height) / ky) + 1)
+        if u1 >= u2 or v1 >= v2:
+            return None
+        window = cv2.resize(layer[v1:v2, u1:u2],
+                            (max(1, round((u2 - u1) * kx)), max(1, round((v2 - v1) * ky))))
+        ox, oy = max(0, round(dx - u1 * kx)), max(0, round(dy - v1 * ky))
+        out = window[oy:oy + height, ox:ox + width]
+        if out.shape[:2] != (height, width):
+            padded = np.zeros((height, width, 4), dtype=np.uint8)
+            padded[:, :, 3] = 255
+            padded[:out.shape[0], :out.shape[1]] = out
+            out = padded
+        return out
+
+    def render(self, view: Viewport, regions) -> np.ndarray:
+        """
+        返回合成了预览的视口画布（代替 view.render()，可直接在上面绘制叠加层）
+
+        Args:
+            view: 当前视口
+            regions: 原图坐标的区域点列（调用方过滤掉点数不足的区域），最后一个视为正在编辑
+        """
+        start = time.perf_counter()
+        key = (view.state, tuple(np.asarray(r, dtype=np.int32).tobytes() for r in regions[:-1]))
+        if self._static is None or self._static[0] != key:
+            canvas = view.render()
+            self._composite(canvas, view, regions[:-1])
+            self._static = (key, canvas)
+        canvas = self._static[1].copy()
+        self._composite(canvas, view, regions[-1:])
+        self.frame_ms = (time.perf_counter() - start) * 1000
+        return canvas
+
+    def _composite(self, canvas: np.ndarray, view: Viewport, regions):
+        """把各区域的预览合成到画布上（原地修改）"""
+        s = view.scale
+        p = min(s, 1.0)  # 缩小显示时直接按屏幕分辨率生成，放大时最多到原图分辨率
+        height, width = canvas.shape[:2]
+        for region in regions:
+            pts = np.asarray(region, dtype=np.int32).reshape(-1, 2)
+            x, y, w, h = cv2.boundingRect(pts)
+            # 外接矩形在屏幕上的可见部分，不可见的区域跳过
+            left, top = x * s + view.offset_x, y * s + view.offset_y
+            x1, y1 = max(0, math.floor(left)), max(0, math.floor(top))
+            x2 = min(width, math.ceil(left + w * s))
+            y2 = min(height, math.ceil(top + h * s))
+            if x1 >= x2 or y1 >= y2:
+                continue
+
+            layer = self._layer(pts - (x, y), w, h, p)
+            warped = self._resample(layer, w * s / layer.shape[1], h * s / layer.shape[0],
+                                    x1 - left, y1 - top, x2 - x1, y2 - y1)
+            if warped is None:
+                continue
+            # 画面 = 预乘纹理 + 底图 * (1 - Alpha)
+            inverse = cv2.cvtColor(cv2.extractChannel(warped, 3), cv2.COLOR_GRAY2BGR)
+            roi = canvas[y1:y2, x1:x2]
+            roi[:] = cv2.add(cv2.cvtColor(warped, cv2.COLOR_BGRA2BGR),
+                             cv2.multiply(roi, inverse, scale=1 / 255))